@@ -0,0 +1,44 @@
+"""Microbenchmark the server ACK path: `build_ack` + encode + frame vs `AckBuilder`.
+
+    python benchmarks/bench_ack.py [--iterations 200000]
+"""
+
+import argparse
+import timeit
+
+from fastmllp.ack import AckBuilder, build_ack
+from fastmllp.mllp import frame
+
+PAYLOAD = (
+    b"MSH|^~\\&|LAB|HOSP|EHR|HOSP|20240101120000||ORU^R01^ORU_R01|MSG00001|P|2.5.1\r"
+    b"PID|1||123456^^^HOSP^MR||DOE^JANE||19700101|F\r"
+    b"OBR|1||555|CBC^Complete Blood Count\r"
+    b"OBX|1|NM|WBC||7.2|10*3/uL|4.0-11.0|N|||F\r"
+)
+
+
+def legacy_ack(payload: bytes) -> bytes:
+    message = payload.decode("utf-8", errors="replace")
+    return frame(build_ack(message).encode("utf-8", errors="replace"))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200000)
+    args = parser.parse_args()
+
+    builder = AckBuilder()
+    results = {}
+    for name, func in (
+        ("build_ack", lambda: legacy_ack(PAYLOAD)),
+        ("AckBuilder", lambda: builder.build(PAYLOAD)),
+    ):
+        seconds = min(timeit.repeat(func, number=args.iterations, repeat=3))
+        results[name] = seconds
+        per_call = seconds / args.iterations * 1_000_000
+        print(f"{name:<12} {per_call:>7.2f} us/ack {args.iterations / seconds:>10.0f} acks/s")
+    print(f"speedup      {results['build_ack'] / results['AckBuilder']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
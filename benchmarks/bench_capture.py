@@ -0,0 +1,96 @@
+"""Compare recording received frames with `CaptureRecorder` against `--log-message` logging.
+
+Each case records `--messages` ORU messages as the server would, `--batch`
+frames per read. The logging cases decode every payload and pass it to
+`log_event`, writing text to a file or JSON through the log queue; the capture
+cases queue each read's frames with `CaptureRecorder.record`, raw and with
+gzip compression. "caller us" is the time spent on the connection thread per
+frame; "total ms" includes draining the log queue or capture writer to disk.
+
+    python benchmarks/bench_capture.py [--messages 200000] [--batch 8] [--dir /var/tmp]
+"""
+
+import argparse
+import logging as std_logging
+import os
+import tempfile
+import time
+
+from fastmllp.capture import CaptureRecorder
+from fastmllp.hl7 import decode_message
+from fastmllp.logging import configure_logging, log_event, stop_queue_listener
+
+MESSAGE = (
+    b"MSH|^~\\&|LAB|HOSP|EHR|HOSP|20240101120000||ORU^R01|MSG%08d|P|2.5.1\r"
+    b"PID|1||123456^^^HOSP^MR||DOE^JANE||19700101|F\r"
+    b"OBX|1|NM|WBC^White cells||7.2|10*3/uL|4.0-11.0|N|||F\r"
+)
+
+
+def reads(messages: int, batch: int) -> list[list[bytes]]:
+    payloads = [MESSAGE % index for index in range(messages)]
+    return [payloads[start : start + batch] for start in range(0, messages, batch)]
+
+
+def time_logging(batches: list[list[bytes]], path: str, log_format: str, queued: bool) -> tuple:
+    logger = std_logging.getLogger("fastmllp")
+    logger.handlers.clear()
+    with open(path, "w") as stream:
+        logger = configure_logging("info", log_format=log_format, log_queue=queued, stream=stream)
+        start = time.perf_counter()
+        for conn_id, frames in enumerate(batches):
+            for payload in frames:
+                log_event(
+                    logger,
+                    std_logging.INFO,
+                    "message_received",
+                    conn_id=conn_id % 64,
+                    length=len(payload),
+                    message=decode_message(payload, "utf-8"),
+                )
+        caller = time.perf_counter() - start
+        stop_queue_listener()
+        total = time.perf_counter() - start
+    logger.handlers.clear()
+    return caller, total, os.path.getsize(path)
+
+
+def time_capture(batches: list[list[bytes]], directory: str, compress: bool) -> tuple:
+    start = time.perf_counter()
+    with CaptureRecorder(directory, compress=compress) as recorder:
+        for conn_id, frames in enumerate(batches):
+            recorder.record(frames, conn_id % 64, f"10.0.0.{conn_id % 64}:40000")
+        caller = time.perf_counter() - start
+    total = time.perf_counter() - start
+    assert recorder.dropped == 0
+    size = sum(entry.stat().st_size for entry in os.scandir(directory))
+    return caller, total, size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=200_000)
+    parser.add_argument("--batch", type=int, default=8)
+    parser.add_argument("--dir", default=None, help="Directory for the output files")
+    args = parser.parse_args()
+
+    batches = reads(args.messages, args.batch)
+    print(f"{args.messages} frames of {len(MESSAGE % 0)} bytes, {args.batch} per read")
+    print(f"{'':<24} {'caller us':>10} {'total ms':>9} {'MB':>7}")
+    with tempfile.TemporaryDirectory(dir=args.dir) as directory:
+        cases = (
+            ("log_event text", time_logging, ("text.log", "text", False)),
+            ("log_event json queue", time_logging, ("json.log", "json", True)),
+            ("capture", time_capture, ("raw", False)),
+            ("capture gzip", time_capture, ("gzip", True)),
+        )
+        for name, func, (target, *options) in cases:
+            caller, total, size = func(batches, os.path.join(directory, target), *options)
+            print(
+                f"{name:<24} {caller / args.messages * 1e6:>10.2f} {total * 1000:>9.1f} "
+                f"{size / 1e6:>7.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
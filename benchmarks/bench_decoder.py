@@ -0,0 +1,72 @@
+"""Compare `unframe_stream` re-scanning with the incremental `MLLPDecoder`.
+
+A single large frame is delivered in small chunks, as it would be from
+`recv(4096)`. The re-scanning loop grows quadratically with the frame size; the
+decoder should grow linearly.
+
+    python benchmarks/bench_decoder.py [--chunk 4096] [--sizes 1,2,4,8]
+"""
+
+import argparse
+import time
+from collections.abc import Callable
+
+from fastmllp.mllp import MLLPDecoder, frame, unframe_stream
+
+
+def make_stream(size: int) -> bytes:
+    header = b"MSH|^~\\&|LAB|F|EHR|F|20240101120000||ORU^R01|1|P|2.5\r"
+    body = b"OBX|1|ED|PDF||" + b"A" * max(size - len(header) - 15, 0) + b"\r"
+    return frame(header + body)
+
+
+def chunks(data: bytes, chunk_size: int) -> list[bytes]:
+    return [data[index:index + chunk_size] for index in range(0, len(data), chunk_size)]
+
+
+def run_unframe_stream(pieces: list[bytes]) -> int:
+    buffer = b""
+    count = 0
+    for chunk in pieces:
+        buffer += chunk
+        frames, buffer = unframe_stream(buffer)
+        count += len(frames)
+    return count
+
+
+def run_decoder(pieces: list[bytes]) -> int:
+    decoder = MLLPDecoder()
+    count = 0
+    for chunk in pieces:
+        for _ in decoder.feed(chunk):
+            count += 1
+    return count
+
+
+def timed(func: Callable[[list[bytes]], int], pieces: list[bytes]) -> float:
+    start = time.perf_counter()
+    count = func(pieces)
+    elapsed = time.perf_counter() - start
+    assert count == 1
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunk", type=int, default=4096)
+    parser.add_argument("--sizes", default="1,2,4,8", help="Frame sizes in MiB")
+    args = parser.parse_args()
+
+    print(f"{'size':>8} {'chunks':>8} {'unframe_stream':>16} {'MLLPDecoder':>14} {'speedup':>8}")
+    for mib in (int(value) for value in args.sizes.split(",")):
+        pieces = chunks(make_stream(mib * 1024 * 1024), args.chunk)
+        legacy = timed(run_unframe_stream, pieces)
+        decoder = timed(run_decoder, pieces)
+        print(
+            f"{mib:>6}Mi {len(pieces):>8} {legacy * 1000:>14.1f}ms "
+            f"{decoder * 1000:>12.1f}ms {legacy / decoder:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Compare reading a large MLLP capture with `iter_frames` against `read()` and decoding.
+
+Writes a capture of `--messages` framed ORU messages to a temporary file.
+"read + decode" loads the whole file and feeds it to `MLLPDecoder`, as
+callers did before `iter_frames`; the other rows map the file and walk its
+frames, scan it into an offset index, and read one frame from the middle
+with the persisted index. Peak heap is measured with tracemalloc, which does not
+count mapped file pages.
+
+    python benchmarks/bench_frames.py [--messages 200000]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from fastmllp.mllp import INDEX_SUFFIX, FrameFile, MLLPDecoder, frame, iter_frames
+
+MESSAGE = (
+    b"MSH|^~\\&|LAB|HOSP|EHR|HOSP|20240101120000||ORU^R01|MSG%08d|P|2.5.1\r"
+    b"PID|1||123456^^^HOSP^MR||DOE^JANE||19700101|F\r"
+    b"OBX|1|NM|WBC^White cells||7.2|10*3/uL|4.0-11.0|N|||F\r"
+)
+
+
+def read_and_decode(path: str) -> int:
+    with open(path, "rb") as handle:
+        frames = list(MLLPDecoder().feed(handle.read()))
+    return sum(map(len, frames))
+
+
+def walk_frames(path: str) -> int:
+    return sum(len(payload) for payload in iter_frames(path))
+
+
+def build_index(path: str) -> int:
+    if os.path.exists(path + INDEX_SUFFIX):
+        os.remove(path + INDEX_SUFFIX)
+    with FrameFile(path, index=True) as frame_file:
+        return len(frame_file)
+
+
+def middle_frame(path: str) -> int:
+    with FrameFile(path, index=True) as frame_file:
+        return len(bytes(frame_file[len(frame_file) // 2]))
+
+
+def measure(func, path: str) -> tuple[float, int]:
+    """Time one call, then trace a second one, since tracing slows allocations."""
+    start = time.perf_counter()
+    func(path)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    func(path)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=200_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "capture.mllp")
+        with open(path, "wb") as handle:
+            for index in range(args.messages):
+                handle.write(frame(MESSAGE % index))
+        assert read_and_decode(path) == walk_frames(path)
+        print(f"{os.path.getsize(path) / 1e6:.0f} MB, {args.messages} frames")
+        print(f"{'':<22} {'ms':>8} {'peak heap MB':>13}")
+        cases = (
+            ("read + decode", read_and_decode),
+            ("iter_frames", walk_frames),
+            ("build index", build_index),
+            ("indexed random read", middle_frame),
+        )
+        for name, func in cases:
+            elapsed, peak = measure(func, path)
+            print(f"{name:<22} {elapsed * 1000:>8.1f} {peak / 1e6:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
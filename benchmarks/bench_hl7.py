@@ -0,0 +1,58 @@
+"""Compare reading one field with `HL7Message` against splitting the whole message.
+
+The message is an ORU with `--segments` OBX segments. "full parse" splits
+every segment into fields and components, as consumers did before
+`HL7Message`; the other rows index the message and read PID-3.1, or walk
+every OBX-5.
+
+    python benchmarks/bench_hl7.py [--segments 2000] [--iterations 200]
+"""
+
+import argparse
+import timeit
+
+from fastmllp.hl7 import HL7Message
+
+
+def build_message(segments: int) -> bytes:
+    lines = [
+        b"MSH|^~\\&|LAB|HOSP|EHR|HOSP|20240101120000||ORU^R01^ORU_R01|MSG00001|P|2.5.1",
+        b"PID|1||123456^^^HOSP^MR||DOE^JANE||19700101|F",
+        b"OBR|1||555|CBC^Complete Blood Count",
+    ]
+    for index in range(segments):
+        lines.append(b"OBX|%d|NM|WBC^White cells||7.2|10*3/uL|4.0-11.0|N|||F" % index)
+    return b"\r".join(lines) + b"\r"
+
+
+def full_parse(payload: bytes) -> str:
+    text = payload.decode("utf-8")
+    parsed = [
+        [field.split("^") for field in segment.split("|")]
+        for segment in text.split("\r")
+        if segment
+    ]
+    return parsed[1][3][0]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--segments", type=int, default=2000)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    payload = build_message(args.segments)
+    assert HL7Message(payload)["PID-3.1"] == full_parse(payload) == "123456"
+    cases = (
+        ("full parse", lambda: full_parse(payload)),
+        ("HL7Message PID-3.1", lambda: HL7Message(payload)["PID-3.1"]),
+        ("HL7Message all OBX-5", lambda: [s[5] for s in HL7Message(payload).segments("OBX")]),
+    )
+    print(f"{len(payload)} bytes, {args.segments + 3} segments")
+    for name, func in cases:
+        seconds = min(timeit.repeat(func, number=args.iterations, repeat=3))
+        print(f"{name:<22} {seconds / args.iterations * 1_000_000:>10.1f} us/message")
+
+
+if __name__ == "__main__":
+    main()
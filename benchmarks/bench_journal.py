@@ -0,0 +1,101 @@
+"""Measure journal throughput: fsync per message versus group commit.
+
+The journal section appends messages from several threads, first syncing each
+message on its own (one thread) and then letting threads share fsyncs, with
+and without a commit window. The end-to-end section runs `fastmllp bench`
+against a threaded server without a journal and with one.
+
+    python benchmarks/bench_journal.py [--messages 2000] [--threads 16] [--dir /var/tmp]
+"""
+
+import argparse
+import multiprocessing
+import socket
+import tempfile
+import threading
+import time
+
+from fastmllp.bench import run_bench
+from fastmllp.journal import Journal
+from fastmllp.logging import configure_logging
+from fastmllp.metrics import ServerMetrics
+from fastmllp.server import serve
+
+PAYLOAD = b"MSH|^~\\&|S|F|R|RF|||ADT^A01|1|P|2.3\rPID|1||123\r" * 8
+
+
+def time_appends(directory: str, messages: int, threads: int, commit_window: float) -> dict:
+    metrics = ServerMetrics()
+    per_thread = messages // threads
+    with Journal(directory, commit_window=commit_window, metrics=metrics) as journal:
+
+        def work() -> None:
+            for _ in range(per_thread):
+                journal.append(PAYLOAD)
+
+        workers = [threading.Thread(target=work) for _ in range(threads)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+    return {
+        "rate": per_thread * threads / elapsed,
+        "fsyncs": metrics.journal_fsyncs.value(),
+    }
+
+
+def run_server(port: int, journal_dir: str | None) -> None:
+    configure_logging("warning")
+    serve("127.0.0.1", port, timeout=60.0, journal_dir=journal_dir)
+
+
+def bench_server(journal_dir: str | None, messages: int) -> float:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    process = multiprocessing.Process(target=run_server, args=(port, journal_dir), daemon=True)
+    process.start()
+    try:
+        deadline = time.time() + 5
+        while time.time() < deadline:
+            try:
+                with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                    break
+            except OSError:
+                time.sleep(0.05)
+        report = run_bench("127.0.0.1", port, connections=16, window=8, count=messages)
+        return report["throughput"]
+    finally:
+        process.terminate()
+        process.join(timeout=2)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--dir", default=None, help="Directory on the disk to measure")
+    args = parser.parse_args()
+
+    cases = [
+        ("fsync per message", 1, 0.0),
+        (f"group commit x{args.threads}", args.threads, 0.0),
+        (f"group commit x{args.threads}, 2ms", args.threads, 0.002),
+    ]
+    print(f"{'journal':<28} {'msg/s':>10} {'fsyncs':>8}")
+    for name, threads, window in cases:
+        with tempfile.TemporaryDirectory(dir=args.dir) as directory:
+            result = time_appends(directory, args.messages, threads, window)
+        print(f"{name:<28} {result['rate']:>10.0f} {result['fsyncs']:>8.0f}")
+
+    print()
+    print(f"{'server':<28} {'msg/s':>10}")
+    print(f"{'no journal':<28} {bench_server(None, args.messages * 5):>10.0f}")
+    with tempfile.TemporaryDirectory(dir=args.dir) as directory:
+        print(f"{'journal':<28} {bench_server(directory, args.messages * 5):>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
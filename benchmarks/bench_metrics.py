@@ -0,0 +1,132 @@
+"""Measure the cost of server metrics: per-update micro timings and end-to-end throughput.
+
+The micro section times one update of a bare attribute, a lock-protected
+counter, and the sharded `Counter` / `Histogram` from `fastmllp.metrics`, single
+threaded and with several threads updating at once. The end-to-end section runs
+`fastmllp bench` against a threaded server with real metrics and with no-op
+metrics.
+
+    python benchmarks/bench_metrics.py [--updates 1000000] [--threads 8] [--messages 20000]
+"""
+
+import argparse
+import multiprocessing
+import socket
+import threading
+import time
+from collections.abc import Callable
+
+from fastmllp.bench import run_bench
+from fastmllp.logging import configure_logging
+from fastmllp.metrics import LATENCY_BUCKETS, Counter, Histogram, ServerMetrics
+from fastmllp.server import serve
+
+
+class LockedCounter:
+    def __init__(self) -> None:
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def inc(self, amount: int = 1) -> None:
+        with self.lock:
+            self.value += amount
+
+
+class BareCounter:
+    def __init__(self) -> None:
+        self.value = 0
+
+    def inc(self, amount: int = 1) -> None:
+        self.value += amount
+
+
+class NoopMetric:
+    def inc(self, amount: float = 1) -> None:
+        pass
+
+    def dec(self, amount: float = 1) -> None:
+        pass
+
+    def observe(self, value: float) -> None:
+        pass
+
+
+class NoopServerMetrics(ServerMetrics):
+    def __init__(self) -> None:
+        super().__init__()
+        for name in list(vars(self)):
+            if name != "registry":
+                setattr(self, name, NoopMetric())
+
+
+def time_updates(update: Callable[[], None], updates: int, threads: int) -> float:
+    per_thread = updates // threads
+
+    def work() -> None:
+        for _ in range(per_thread):
+            update()
+
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return (time.perf_counter() - start) / (per_thread * threads) * 1e9
+
+
+def run_server(port: int, noop: bool) -> None:
+    configure_logging("warning")
+    metrics = NoopServerMetrics() if noop else ServerMetrics()
+    serve("127.0.0.1", port, timeout=60.0, metrics=metrics)
+
+
+def bench_server(noop: bool, messages: int) -> float:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    process = multiprocessing.Process(target=run_server, args=(port, noop), daemon=True)
+    process.start()
+    try:
+        deadline = time.time() + 5
+        while time.time() < deadline:
+            try:
+                with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                    break
+            except OSError:
+                time.sleep(0.05)
+        report = run_bench("127.0.0.1", port, connections=4, window=16, count=messages)
+        return report["throughput"]
+    finally:
+        process.terminate()
+        process.join(timeout=2)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--updates", type=int, default=1_000_000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--messages", type=int, default=20000)
+    args = parser.parse_args()
+
+    histogram = Histogram("bench_seconds", "", LATENCY_BUCKETS)
+    cases = [
+        ("bare attribute +=", BareCounter().inc),
+        ("locked counter", LockedCounter().inc),
+        ("sharded Counter.inc", Counter("bench_total", "").inc),
+        ("Histogram.observe", lambda: histogram.observe(0.003)),
+    ]
+    print(f"{'update':<22} {'1 thread':>10} {f'{args.threads} threads':>11}")
+    for name, update in cases:
+        single = time_updates(update, args.updates, 1)
+        multi = time_updates(update, args.updates, args.threads)
+        print(f"{name:<22} {single:>8.0f}ns {multi:>9.0f}ns")
+
+    print()
+    print(f"{'server metrics':<22} {'msg/s':>10}")
+    for name, noop in (("no-op", True), ("enabled", False), ("no-op (again)", True)):
+        print(f"{name:<22} {bench_server(noop, args.messages):>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Compare stop-and-wait and pipelined sends against a local fastmllp server.
+
+An optional `--delay` adds simulated one-way latency to every server read so the
+effect of the in-flight window on a high-RTT link is visible on loopback.
+
+    python benchmarks/bench_pipeline.py [--messages 5000] [--windows 1,8,32] [--delay 0.0]
+"""
+
+import argparse
+import multiprocessing
+import socket
+import time
+
+from fastmllp.client import MLLPClient
+from fastmllp.logging import configure_logging
+from fastmllp.server import serve
+
+
+def run_server(port: int, delay: float) -> None:
+    configure_logging("warning")
+    if delay:
+        original_recv_into = socket.socket.recv_into
+
+        def delayed_recv_into(self: socket.socket, *args: object) -> int:
+            received = original_recv_into(self, *args)
+            time.sleep(delay)
+            return received
+
+        socket.socket.recv_into = delayed_recv_into
+    serve("127.0.0.1", port, timeout=60.0)
+
+
+def wait_for_port(port: int) -> None:
+    deadline = time.time() + 5
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError("server did not start")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--windows", default="1,8,32")
+    parser.add_argument("--delay", type=float, default=0.0, help="Server read delay in seconds")
+    args = parser.parse_args()
+
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    process = multiprocessing.Process(target=run_server, args=(port, args.delay), daemon=True)
+    process.start()
+    try:
+        wait_for_port(port)
+        messages = [
+            f"MSH|^~\\&|S|F|R|RF|20240101120000||ADT^A01|{index}|P|2.3\rPID|1||{index}"
+            for index in range(args.messages)
+        ]
+        print(f"{'window':>6} {'messages':>9} {'seconds':>8} {'msg/s':>9}")
+        with MLLPClient(timeout=30.0) as client:
+            for window in (int(value) for value in args.windows.split(",")):
+                start = time.perf_counter()
+                count = sum(1 for _ in client.send_many(messages, "127.0.0.1", port, window=window))
+                elapsed = time.perf_counter() - start
+                print(f"{window:>6} {count:>9} {elapsed:>8.2f} {count / elapsed:>9.0f}")
+    finally:
+        process.terminate()
+        process.join(timeout=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Compare receive-path allocations: `recv` + bytes concatenation vs `recv_into`.
+
+Framed messages are streamed over a socket pair and read back with the original
+`recv(4096)` / `unframe_stream` loop and with the preallocated `recv_into` /
+`MLLPDecoder` loop used by the server. `tracemalloc` reports the bytes
+allocated while handling each read (summed and divided per message) and the
+peak; timings come from a separate untraced run.
+
+    python benchmarks/bench_recv.py [--messages 20000] [--size 2048] [--recv-buffer 65536]
+"""
+
+import argparse
+import socket
+import threading
+import time
+import tracemalloc
+from collections.abc import Callable
+
+from fastmllp.mllp import MLLPDecoder, frame, unframe_stream
+
+
+def make_message(index: int, size: int) -> bytes:
+    header = f"MSH|^~\\&|S|F|R|RF|20240101120000||ADT^A01|{index}|P|2.3\r".encode()
+    return header + b"X" * max(size - len(header), 0)
+
+
+def send_all(sock: socket.socket, data: bytes) -> None:
+    sock.sendall(data)
+    sock.shutdown(socket.SHUT_WR)
+
+
+class AllocationMeter:
+    def __init__(self) -> None:
+        self.reads = 0
+        self.allocated = 0
+
+    def start_read(self) -> int:
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        return current
+
+    def end_read(self, before: int) -> None:
+        _, peak = tracemalloc.get_traced_memory()
+        self.reads += 1
+        self.allocated += max(peak - before, 0)
+
+
+class UntracedMeter(AllocationMeter):
+    def start_read(self) -> int:
+        return 0
+
+    def end_read(self, before: int) -> None:
+        self.reads += 1
+
+
+def read_legacy(sock: socket.socket, meter: AllocationMeter, recv_buffer: int) -> int:
+    buffer = b""
+    count = 0
+    while True:
+        before = meter.start_read()
+        chunk = sock.recv(recv_buffer)
+        if not chunk:
+            meter.end_read(before)
+            return count
+        buffer += chunk
+        frames, buffer = unframe_stream(buffer)
+        count += len(frames)
+        del frames, chunk
+        meter.end_read(before)
+
+
+def read_recv_into(sock: socket.socket, meter: AllocationMeter, recv_buffer: int) -> int:
+    decoder = MLLPDecoder()
+    read_buffer = bytearray(recv_buffer)
+    read_view = memoryview(read_buffer)
+    count = 0
+    while True:
+        before = meter.start_read()
+        received = sock.recv_into(read_buffer)
+        if not received:
+            meter.end_read(before)
+            return count
+        for _ in decoder.feed(read_view[:received]):
+            count += 1
+        meter.end_read(before)
+
+
+def run(
+    reader: Callable[[socket.socket, AllocationMeter, int], int],
+    data: bytes,
+    messages: int,
+    recv_buffer: int,
+    *,
+    traced: bool,
+) -> tuple[AllocationMeter, int, float]:
+    left, right = socket.socketpair()
+    writer = threading.Thread(target=send_all, args=(left, data), daemon=True)
+    meter = AllocationMeter() if traced else UntracedMeter()
+    if traced:
+        tracemalloc.start()
+    start = time.perf_counter()
+    writer.start()
+    count = reader(right, meter, recv_buffer)
+    elapsed = time.perf_counter() - start
+    peak = 0
+    if traced:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    writer.join()
+    left.close()
+    right.close()
+    assert count == messages
+    return meter, peak, elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--size", type=int, default=2048)
+    parser.add_argument("--recv-buffer", type=int, default=65536)
+    args = parser.parse_args()
+
+    data = b"".join(frame(make_message(index, args.size)) for index in range(args.messages))
+    print(f"{len(data) / 1024 / 1024:.1f} MiB in {args.messages} frames")
+    print(f"{'path':<24} {'reads':>7} {'alloc/msg':>10} {'peak':>9} {'untraced time':>14}")
+    for name, reader, recv_buffer in (
+        ("recv(4096) + bytes", read_legacy, 4096),
+        ("recv_into(4096)", read_recv_into, 4096),
+        (f"recv_into({args.recv_buffer})", read_recv_into, args.recv_buffer),
+    ):
+        meter, peak, _ = run(reader, data, args.messages, recv_buffer, traced=True)
+        _, _, elapsed = run(reader, data, args.messages, recv_buffer, traced=False)
+        print(
+            f"{name:<24} {meter.reads:>7} {meter.allocated / args.messages:>9.0f}B "
+            f"{peak / 1024:>7.0f}Ki {elapsed * 1000:>12.0f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""Compare full and resumed TLS handshakes, for sizing TLS terminators.
+
+Creates a throwaway CA and server certificate with the `openssl` command,
+with RSA-2048 or P-256 keys (`--key`); the server's signature is most of
+the cost a resumed handshake saves, so RSA shows the larger gap. The
+handshake section runs client and server in one thread over memory
+BIOs and reports the CPU time each side spends per handshake, full versus
+resumed from a session ticket. The server section sends one message per
+connection, as many partners do, to `serve()` in plain TCP, TLS with a full
+handshake every time, and TLS resuming the previous session.
+
+    python benchmarks/bench_tls.py [--key rsa|ec] [--handshakes 500] [--messages 1000]
+"""
+
+import argparse
+import multiprocessing
+import os
+import socket
+import ssl
+import subprocess
+import tempfile
+import time
+
+from fastmllp.client import MLLPClient
+from fastmllp.logging import configure_logging
+from fastmllp.server import serve
+from fastmllp.tls import ServerTLS, SessionCache, client_context, server_context
+
+KEY_OPTIONS = {
+    "rsa": ["-algorithm", "RSA", "-pkeyopt", "rsa_keygen_bits:2048"],
+    "ec": ["-algorithm", "EC", "-pkeyopt", "ec_paramgen_curve:P-256"],
+}
+
+PAYLOAD = b"MSH|^~\\&|LAB|HOSP|EHR|HOSP|20240101120000||ORU^R01|MSG00001|P|2.5.1\rPID|1\r"
+
+
+def openssl(*args: str) -> None:
+    subprocess.run(["openssl", *args], check=True, capture_output=True)
+
+
+def make_certificates(directory: str, key_type: str) -> tuple[str, str, str]:
+    """Write a self-signed CA and a localhost certificate it signs; return their paths."""
+    ca_key, ca_cert = os.path.join(directory, "ca.key"), os.path.join(directory, "ca.pem")
+    key, cert = os.path.join(directory, "server.key"), os.path.join(directory, "server.pem")
+    csr, extensions = os.path.join(directory, "server.csr"), os.path.join(directory, "san.ext")
+    with open(extensions, "w") as handle:
+        handle.write("subjectAltName=DNS:localhost,IP:127.0.0.1\n")
+    for path in (ca_key, key):
+        openssl("genpkey", *KEY_OPTIONS[key_type], "-out", path)
+    openssl("req", "-x509", "-new", "-key", ca_key, "-subj", "/CN=bench CA", "-out", ca_cert)
+    openssl("req", "-new", "-key", key, "-subj", "/CN=localhost", "-out", csr)
+    signing = ["-CA", ca_cert, "-CAkey", ca_key, "-CAcreateserial", "-extfile", extensions]
+    openssl("x509", "-req", "-in", csr, *signing, "-out", cert)
+    return ca_cert, cert, key
+
+
+def step(ssl_object: ssl.SSLObject, method: str) -> float:
+    """Run one handshake or read step and return the seconds it took."""
+    start = time.perf_counter()
+    try:
+        getattr(ssl_object, method)()
+    except ssl.SSLWantReadError:
+        pass
+    return time.perf_counter() - start
+
+
+def handshake(
+    server: ssl.SSLContext, client: ssl.SSLContext, session: ssl.SSLSession | None
+) -> tuple[float, float, ssl.SSLObject]:
+    """Handshake over memory BIOs; return server and client seconds and the client end."""
+    client_in, client_out, server_in, server_out = (ssl.MemoryBIO() for _ in range(4))
+    client_end = client.wrap_bio(
+        client_in, client_out, server_hostname="localhost", session=session
+    )
+    server_end = server.wrap_bio(server_in, server_out, server_side=True)
+    server_time = client_time = 0.0
+    for _ in range(4):
+        client_time += step(client_end, "do_handshake")
+        server_in.write(client_out.read())
+        server_time += step(server_end, "do_handshake")
+        client_in.write(server_out.read())
+    # TLS 1.3 session tickets follow the handshake; reading processes them.
+    client_time += step(client_end, "read")
+    return server_time, client_time, client_end
+
+
+def bench_handshakes(
+    server: ssl.SSLContext, client: ssl.SSLContext, count: int, resume: bool
+) -> tuple[float, float, int]:
+    _, _, first = handshake(server, client, None)
+    session = first.session
+    server_total = client_total = 0.0
+    resumed = 0
+    for _ in range(count):
+        server_time, client_time, end = handshake(server, client, session if resume else None)
+        server_total += server_time
+        client_total += client_time
+        resumed += end.session_reused
+    return server_total / count, client_total / count, resumed
+
+
+def run_server(port: int, tls: ServerTLS | None) -> None:
+    # Errors only: the readiness probe is logged as a failed handshake.
+    configure_logging("error")
+    serve("127.0.0.1", port, timeout=10.0, tls=tls)
+
+
+def free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def wait_for_port(port: int) -> None:
+    deadline = time.time() + 5
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return
+        except OSError:
+            time.sleep(0.05)
+
+
+def bench_server(
+    tls: ServerTLS | None, context: ssl.SSLContext | None, messages: int, resume: bool
+) -> float:
+    port = free_port()
+    process = multiprocessing.Process(target=run_server, args=(port, tls), daemon=True)
+    process.start()
+    try:
+        wait_for_port(port)
+        sessions = SessionCache()
+        start = time.perf_counter()
+        for _ in range(messages):
+            # No idle connections are kept, so every message opens a new connection.
+            with MLLPClient(
+                timeout=10.0,
+                idle_timeout=0.0,
+                ssl_context=context,
+                sessions=sessions if resume else SessionCache(),
+            ) as client:
+                client.send_bytes(PAYLOAD, "127.0.0.1", port)
+        return messages / (time.perf_counter() - start)
+    finally:
+        process.terminate()
+        process.join(timeout=2)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--key", choices=sorted(KEY_OPTIONS), default="rsa")
+    parser.add_argument("--handshakes", type=int, default=500)
+    parser.add_argument("--messages", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        ca_cert, cert, key = make_certificates(directory, args.key)
+        server = server_context(cert, key)
+        client = client_context(cafile=ca_cert)
+
+        print(f"{'handshake CPU':<22} {'server us':>10} {'client us':>10} {'resumed':>8}")
+        for name, resume in (("full", False), ("resumed", True)):
+            server_time, client_time, resumed = bench_handshakes(
+                server, client, args.handshakes, resume
+            )
+            print(
+                f"{name:<22} {server_time * 1e6:>10.0f} {client_time * 1e6:>10.0f} "
+                f"{resumed:>8}"
+            )
+
+        print()
+        print(f"{'connection per message':<22} {'msg/s':>10}")
+        tls = ServerTLS(cert, key, reload_interval=0.0)
+        cases = (
+            ("plain TCP", None, None, False),
+            ("TLS full handshake", tls, client, False),
+            ("TLS resumed", tls, client, True),
+        )
+        for name, server_tls, context, resume in cases:
+            rate = bench_server(server_tls, context, args.messages, resume)
+            print(f"{name:<22} {rate:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
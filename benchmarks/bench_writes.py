@@ -0,0 +1,161 @@
+"""Measure ACK write coalescing: syscalls and throughput with pipelined clients.
+
+The socket section writes batches of ACK frames over a socketpair, one
+`sendall` per frame versus one gathered `send_buffers` per batch, counting
+the write calls. The server section runs `fastmllp bench` with pipelined
+connections against each engine and reports ACKs per socket write from the
+server's `fastmllp_ack_writes_total`. The client section times
+`MLLPClient.send_many`, which frames each window with one gathered write.
+
+    python benchmarks/bench_writes.py [--messages 20000] [--window 16]
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import socket
+import threading
+import time
+
+from fastmllp.ack import AckBuilder
+from fastmllp.bench import run_bench
+from fastmllp.client import MLLPClient
+from fastmllp.logging import configure_logging
+from fastmllp.mllp import send_buffers
+from fastmllp.server import serve, serve_async
+
+PAYLOAD = b"MSH|^~\\&|LAB|HOSP|EHR|HOSP|20240101120000||ORU^R01|MSG00001|P|2.5.1\rPID|1\r"
+
+
+class CountingSocket:
+    """Forward writes to a socket and count the calls."""
+
+    def __init__(self, sock: socket.socket) -> None:
+        self.sock = sock
+        self.calls = 0
+
+    def sendall(self, data: bytes) -> None:
+        self.calls += 1
+        self.sock.sendall(data)
+
+    def sendmsg(self, buffers: list) -> int:
+        self.calls += 1
+        return self.sock.sendmsg(buffers)
+
+
+def drain(sock: socket.socket) -> None:
+    while sock.recv(1 << 20):
+        pass
+
+
+def time_writes(batches: int, batch_size: int, gathered: bool) -> tuple[float, int]:
+    acks = [AckBuilder().build(PAYLOAD) for _ in range(batch_size)]
+    left, right = socket.socketpair()
+    reader = threading.Thread(target=drain, args=(right,), daemon=True)
+    reader.start()
+    counting = CountingSocket(left)
+    start = time.perf_counter()
+    for _ in range(batches):
+        if gathered:
+            send_buffers(counting, acks)
+        else:
+            for ack in acks:
+                counting.sendall(ack)
+    elapsed = time.perf_counter() - start
+    left.close()
+    reader.join()
+    right.close()
+    return batches * batch_size / elapsed, counting.calls
+
+
+def run_server(port: int, engine: str, snapshots: multiprocessing.Queue) -> None:
+    configure_logging("warning")
+    options = {"timeout": 60.0, "stats_callback": snapshots.put, "stats_interval": 0.2}
+    if engine == "asyncio":
+        asyncio.run(serve_async("127.0.0.1", port, **options))
+    else:
+        serve("127.0.0.1", port, **options)
+
+
+def free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def wait_for_port(port: int) -> None:
+    deadline = time.time() + 5
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return
+        except OSError:
+            time.sleep(0.05)
+
+
+def bench_server(engine: str, messages: int, window: int) -> tuple[float, float]:
+    port = free_port()
+    snapshots: multiprocessing.Queue = multiprocessing.Queue()
+    process = multiprocessing.Process(
+        target=run_server, args=(port, engine, snapshots), daemon=True
+    )
+    process.start()
+    try:
+        wait_for_port(port)
+        report = run_bench("127.0.0.1", port, connections=8, window=window, count=messages)
+        snapshot = snapshots.get(timeout=5)
+        while snapshot["fastmllp_frames_received_total"] < report["acked"]:
+            snapshot = snapshots.get(timeout=5)
+        writes = max(snapshot["fastmllp_ack_writes_total"], 1)
+        return report["throughput"], snapshot["fastmllp_frames_received_total"] / writes
+    finally:
+        process.terminate()
+        process.join(timeout=2)
+
+
+def bench_client(messages: int, window: int) -> float:
+    port = free_port()
+    snapshots: multiprocessing.Queue = multiprocessing.Queue()
+    process = multiprocessing.Process(
+        target=run_server, args=(port, "threaded", snapshots), daemon=True
+    )
+    process.start()
+    try:
+        wait_for_port(port)
+        start = time.perf_counter()
+        with MLLPClient(timeout=10.0) as client:
+            payloads = (PAYLOAD for _ in range(messages))
+            for _ in client.send_many(payloads, "127.0.0.1", port, window=window):
+                pass
+        return messages / (time.perf_counter() - start)
+    finally:
+        process.terminate()
+        process.join(timeout=2)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--window", type=int, default=16)
+    args = parser.parse_args()
+
+    batches = args.messages // args.window
+    print(f"{'socket writes':<28} {'acks/s':>10} {'calls':>8}")
+    for name, gathered in (("sendall per ACK", False), ("send_buffers per batch", True)):
+        rate, calls = time_writes(batches, args.window, gathered)
+        print(f"{name:<28} {rate:>10.0f} {calls:>8}")
+
+    print()
+    print(f"{'server, window ' + str(args.window):<28} {'msg/s':>10} {'acks/write':>11}")
+    for engine in ("threaded", "asyncio"):
+        rate, per_write = bench_server(engine, args.messages, args.window)
+        print(f"{engine:<28} {rate:>10.0f} {per_write:>11.1f}")
+
+    print()
+    print(f"{'client send_many':<28} {'msg/s':>10}")
+    for window in (1, args.window):
+        print(f"{'window ' + str(window):<28} {bench_client(args.messages // 4, window):>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,81 @@
 from importlib.metadata import PackageNotFoundError, version
 
-from .ack import build_ack
-from .client import send
-from .hl7 import parse_msh
-from .mllp import frame, unframe_stream
-from .server import serve
+from .ack import AckBuilder, build_ack
+from .capture import (
+    CaptureError,
+    CaptureRecord,
+    CaptureRecorder,
+    CaptureWriter,
+    iter_capture,
+    merge_captures,
+)
+from .client import MLLPClient, send
+from .dedupe import DedupeCache
+from .handler import load_handler
+from .hl7 import (
+    HL7Message,
+    HL7Segment,
+    decode_message,
+    iter_messages,
+    parse_msa,
+    parse_msh,
+    parse_msh_bytes,
+)
+from .journal import Journal, JournalError, iter_journal
+from .limits import AdmissionControl
+from .metrics import ClientMetrics, MetricsRegistry, ServerMetrics, start_metrics_server
+from .mllp import FrameFile, FrameTooLargeError, MLLPDecoder, frame, iter_frames, unframe_stream
+from .proxy import ForwardingPool, serve_proxy
+from .server import serve, serve_async
+from .spool import SpoolFullError, SpoolingSender
+from .supervisor import serve_workers
+from .tls import ServerTLS, SessionCache, client_context, server_context
 
 __all__ = [
+    "AckBuilder",
+    "AdmissionControl",
+    "CaptureError",
+    "CaptureRecord",
+    "CaptureRecorder",
+    "CaptureWriter",
+    "ClientMetrics",
+    "DedupeCache",
+    "ForwardingPool",
+    "FrameFile",
+    "FrameTooLargeError",
+    "HL7Message",
+    "HL7Segment",
+    "Journal",
+    "JournalError",
+    "MLLPClient",
+    "MLLPDecoder",
+    "MetricsRegistry",
+    "ServerMetrics",
+    "ServerTLS",
+    "SessionCache",
+    "SpoolFullError",
+    "SpoolingSender",
     "__version__",
     "build_ack",
+    "client_context",
+    "decode_message",
     "frame",
+    "iter_capture",
+    "iter_frames",
+    "iter_journal",
+    "iter_messages",
+    "load_handler",
+    "merge_captures",
+    "parse_msa",
     "parse_msh",
+    "parse_msh_bytes",
     "send",
     "serve",
+    "serve_async",
+    "serve_proxy",
+    "serve_workers",
+    "server_context",
+    "start_metrics_server",
     "unframe_stream",
 ]
 
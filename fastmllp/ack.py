@@ -1,7 +1,18 @@
 import datetime as dt
+import itertools
+import os
+import secrets
+import time
 import uuid
 
-from .hl7 import DEFAULT_ENCODING_CHARS, DEFAULT_FIELD_SEP, parse_msh
+from .hl7 import DEFAULT_ENCODING_CHARS, DEFAULT_FIELD_SEP, is_ascii_compatible, parse_msh
+from .mllp import FRAME_END, START_BLOCK, frame
+
+FIELD_SEP_BYTES = DEFAULT_FIELD_SEP.encode("ascii")
+ENCODING_CHARS_BYTES = DEFAULT_ENCODING_CHARS.encode("ascii")
+# Generated control IDs keep the 32-hex-digit shape of `uuid4().hex`.
+CONTROL_ID_PREFIX_BYTES = 6
+CONTROL_ID_COUNTER_FORMAT = b"%020x"
 
 
 def build_ack(message: str, *, ack_code: str = "AA") -> str:
@@ -51,3 +62,107 @@ def build_ack(message: str, *, ack_code: str = "AA") -> str:
     msa_fields = ["MSA", ack_code, msa_control_id]
 
     return field_sep.join(msh_fields) + "\r" + field_sep.join(msa_fields) + "\r"
+
+
+def new_control_id_prefix() -> bytes:
+    return secrets.token_hex(CONTROL_ID_PREFIX_BYTES).encode("ascii")
+
+
+_control_id_prefix = new_control_id_prefix()
+_control_id_counter = itertools.count(1)
+
+
+def _reset_control_ids() -> None:
+    global _control_id_prefix, _control_id_counter
+    _control_id_prefix = new_control_id_prefix()
+    _control_id_counter = itertools.count(1)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_control_ids)
+
+
+def next_control_id_bytes() -> bytes:
+    """Return a unique 32-hex-digit control ID (random per-process prefix + counter)."""
+    return _control_id_prefix + CONTROL_ID_COUNTER_FORMAT % next(_control_id_counter)
+
+
+def next_control_id() -> str:
+    return next_control_id_bytes().decode("ascii")
+
+
+class AckBuilder:
+    """Build framed ACK bytes straight from inbound payload bytes.
+
+    Produces the same fields as `build_ack`, but reads the MSH segment without
+    decoding the payload, formats the timestamp once per second, and uses
+    `next_control_id_bytes` instead of `uuid4`. Field bytes are copied verbatim, so
+    encodings that are not ASCII-compatible fall back to `build_ack`.
+    """
+
+    def __init__(self, encoding: str = "utf-8") -> None:
+        self.encoding = encoding
+        self.ascii_compatible = is_ascii_compatible(encoding)
+        self._timestamp: tuple[int, bytes] = (-1, b"")
+
+    def timestamp(self) -> bytes:
+        now = int(time.time())
+        cached = self._timestamp
+        if cached[0] == now:
+            return cached[1]
+        formatted = time.strftime("%Y%m%d%H%M%S", time.gmtime(now)).encode("ascii")
+        self._timestamp = (now, formatted)
+        return formatted
+
+    def build(self, payload: bytes, *, ack_code: str = "AA") -> bytes:
+        """Return the MLLP-framed ACK for `payload`."""
+        if not self.ascii_compatible:
+            message = payload.decode(self.encoding, errors="replace")
+            ack = build_ack(message, ack_code=ack_code)
+            return frame(ack.encode(self.encoding, errors="replace"))
+
+        field_sep = FIELD_SEP_BYTES
+        encoding_chars = ENCODING_CHARS_BYTES
+        parts: list[bytes] = []
+        if payload[:3] == b"MSH" and len(payload) >= 4 and payload[3] < 0x80:
+            field_sep = payload[3:4]
+            end = payload.find(b"\r")
+            parts = (payload if end == -1 else payload[:end]).split(field_sep)
+            if len(parts) > 1 and len(parts[1]) == 4:
+                encoding_chars = parts[1]
+        count = len(parts)
+
+        ack_type = b"ACK"
+        if count > 8 and parts[8]:
+            components = parts[8].split(encoding_chars[:1])
+            if len(components) > 1 and components[1]:
+                ack_type = b"ACK" + encoding_chars[:1] + components[1]
+
+        ack_control_id = next_control_id_bytes()
+        msa_control_id = (parts[9] if count > 9 else b"") or ack_control_id
+
+        return b"".join(
+            (
+                START_BLOCK,
+                field_sep.join(
+                    (
+                        b"MSH",
+                        encoding_chars,
+                        (parts[4] if count > 4 else b"") or b"FASTMLLP",
+                        (parts[5] if count > 5 else b"") or b"FASTMLLP",
+                        (parts[2] if count > 2 else b"") or b"UNKNOWN",
+                        (parts[3] if count > 3 else b"") or b"UNKNOWN",
+                        self.timestamp(),
+                        b"",
+                        ack_type,
+                        ack_control_id,
+                        (parts[10] if count > 10 else b"") or b"P",
+                        (parts[11] if count > 11 else b"") or b"2.3",
+                    )
+                ),
+                b"\r",
+                field_sep.join((b"MSA", ack_code.encode("ascii"), msa_control_id)),
+                b"\r",
+                FRAME_END,
+            )
+        )
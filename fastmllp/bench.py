@@ -0,0 +1,376 @@
+import collections
+import itertools
+import socket
+import ssl
+import threading
+import time
+
+from .hl7 import parse_msa
+from .mllp import MLLPDecoder, frame
+
+PERCENTILES = (50.0, 90.0, 99.0, 99.9)
+
+
+class Histogram:
+    """HDR-style log-linear histogram of non-negative integer values.
+
+    Values below `2 ** sub_bucket_bits` are counted exactly; larger values
+    share buckets whose width grows with magnitude, keeping the relative error
+    under `2 ** (1 - sub_bucket_bits)` at any scale with a few KiB of counters.
+    """
+
+    def __init__(self, sub_bucket_bits: int = 8) -> None:
+        self.sub_bucket_bits = sub_bucket_bits
+        self.counts: list[int] = []
+        self.total = 0
+        self.minimum = 0
+        self.maximum = 0
+        self.sum = 0
+
+    def bucket_index(self, value: int) -> int:
+        bits = self.sub_bucket_bits
+        if value < (1 << bits):
+            return value
+        shift = value.bit_length() - bits
+        return (shift << (bits - 1)) + (value >> shift)
+
+    def bucket_value(self, index: int) -> int:
+        """Return the highest value counted in bucket `index`."""
+        bits = self.sub_bucket_bits
+        if index < (1 << bits):
+            return index
+        shift = (index >> (bits - 1)) - 1
+        sub_bucket = index - (shift << (bits - 1))
+        return ((sub_bucket + 1) << shift) - 1
+
+    def record(self, value: int) -> None:
+        value = max(int(value), 0)
+        index = self.bucket_index(value)
+        if index >= len(self.counts):
+            self.counts.extend([0] * (index + 1 - len(self.counts)))
+        self.counts[index] += 1
+        if not self.total or value < self.minimum:
+            self.minimum = value
+        if value > self.maximum:
+            self.maximum = value
+        self.total += 1
+        self.sum += value
+
+    def merge(self, other: "Histogram") -> None:
+        if other.sub_bucket_bits != self.sub_bucket_bits:
+            raise ValueError("cannot merge histograms with different precision")
+        if len(other.counts) > len(self.counts):
+            self.counts.extend([0] * (len(other.counts) - len(self.counts)))
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+        if other.total and (not self.total or other.minimum < self.minimum):
+            self.minimum = other.minimum
+        self.maximum = max(self.maximum, other.maximum)
+        self.total += other.total
+        self.sum += other.sum
+
+    def percentile(self, percent: float) -> int:
+        if not self.total:
+            return 0
+        target = max(1, int(self.total * percent / 100.0 + 0.5))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(self.bucket_value(index), self.maximum)
+        return self.maximum
+
+    def mean(self) -> float:
+        return self.sum / self.total if self.total else 0.0
+
+
+def parse_mix(value: str) -> list[tuple[str, int]]:
+    """Parse a message mix such as `ADT^A01:70,ORU^R01:30` into weighted types."""
+    mix: list[tuple[str, int]] = []
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        message_type, _, weight = item.partition(":")
+        weight_value = int(weight) if weight else 1
+        if weight_value <= 0:
+            raise ValueError(f"invalid weight in message mix: {item}")
+        mix.append((message_type.strip(), weight_value))
+    if not mix:
+        raise ValueError("message mix is empty")
+    return mix
+
+
+def build_message(message_type: str, control_id: str, size: int) -> bytes:
+    """Build a synthetic HL7 message of roughly `size` bytes that `parse_msh` accepts."""
+    msh = (
+        f"MSH|^~\\&|FASTMLLP|BENCH|TARGET|BENCH|20240101120000||{message_type}|"
+        f"{control_id}|P|2.5\r"
+    )
+    pid = "PID|1||12345^^^BENCH||DOE^JANE||19700101|F\r"
+    message = (msh + pid).encode("ascii")
+    index = 1
+    while len(message) < size:
+        padding = max(size - len(message) - 20, 1)
+        obx = f"OBX|{index}|TX|||".encode("ascii") + b"X" * min(padding, 4096) + b"\r"
+        message += obx
+        index += 1
+    return message
+
+
+def message_cycle(mix: list[tuple[str, int]]) -> list[str]:
+    """Expand a weighted mix into a deterministic, interleaved sequence of types."""
+    total = sum(weight for _, weight in mix)
+    sequence: list[str] = []
+    credit = {message_type: 0 for message_type, _ in mix}
+    for _ in range(total):
+        for message_type, weight in mix:
+            credit[message_type] += weight
+        chosen = max(mix, key=lambda item: credit[item[0]])[0]
+        credit[chosen] -= total
+        sequence.append(chosen)
+    return sequence
+
+
+class Worker(threading.Thread):
+    """Drive one connection with up to `window` messages in flight."""
+
+    def __init__(
+        self,
+        worker_id: int,
+        host: str,
+        port: int,
+        *,
+        window: int,
+        budget: int | None,
+        deadline: float | None,
+        interval: float,
+        templates: list[tuple[str, int]],
+        size: int,
+        timeout: float,
+        encoding: str,
+        ssl_context: ssl.SSLContext | None = None,
+        server_hostname: str | None = None,
+    ) -> None:
+        super().__init__(daemon=True)
+        self.worker_id = worker_id
+        self.host = host
+        self.port = port
+        self.window = window
+        self.budget = budget
+        self.deadline = deadline
+        self.interval = interval
+        self.types = message_cycle(templates)
+        self.size = size
+        self.timeout = timeout
+        self.encoding = encoding
+        self.ssl_context = ssl_context
+        self.server_hostname = server_hostname or host
+        self.histogram = Histogram()
+        self.sent = 0
+        self.acked = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.nacks = 0
+        self.inflight: collections.OrderedDict[str, float] = collections.OrderedDict()
+        self._sequence = itertools.count(1)
+        self._templates: dict[str, tuple[bytes, bytes]] = {}
+
+    def framed_message(self, control_id: str) -> bytes:
+        message_type = self.types[self.sent % len(self.types)]
+        template = self._templates.get(message_type)
+        if template is None:
+            head, _, tail = frame(build_message(message_type, "\0", self.size)).partition(b"\0")
+            template = self._templates[message_type] = (head, tail)
+        head, tail = template
+        return head + control_id.encode("ascii") + tail
+
+    def finished_sending(self, now: float) -> bool:
+        if self.budget is not None and self.sent >= self.budget:
+            return True
+        return self.deadline is not None and now >= self.deadline
+
+    def run(self) -> None:
+        failing_since = None
+        while True:
+            now = time.monotonic()
+            if self.finished_sending(now):
+                return
+            try:
+                with self.connect() as sock:
+                    failing_since = None
+                    # Returns once sending is finished, or after an ACK timeout to reconnect.
+                    self.drive(sock)
+            except OSError:
+                self.errors += 1 + len(self.inflight)
+                self.inflight.clear()
+                if failing_since is None:
+                    failing_since = now
+                elif now - failing_since > self.timeout:
+                    return
+                time.sleep(0.1)
+
+    def connect(self) -> socket.socket:
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        if self.ssl_context is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock = self.ssl_context.wrap_socket(sock, server_hostname=self.server_hostname)
+        return sock
+
+    def drive(self, sock: socket.socket) -> None:
+        decoder = MLLPDecoder()
+        inflight = self.inflight
+        next_send = time.monotonic()
+        while True:
+            now = time.monotonic()
+            sending_done = self.finished_sending(now)
+            if sending_done and not inflight:
+                return
+            if not sending_done and len(inflight) < self.window and now >= next_send:
+                control_id = f"B{self.worker_id}-{next(self._sequence)}"
+                sock.settimeout(self.timeout)
+                sock.sendall(self.framed_message(control_id))
+                # Paced runs measure from the scheduled send time, so a stalled
+                # target cannot hide queueing delay (coordinated omission).
+                inflight[control_id] = next_send if self.interval else now
+                self.sent += 1
+                if self.interval:
+                    next_send += self.interval
+                continue
+
+            wait = self.timeout
+            if not sending_done and len(inflight) < self.window:
+                wait = max(next_send - now, 0.0)
+            if not inflight:
+                time.sleep(wait)
+                continue
+            oldest = next(iter(inflight.values()))
+            sock.settimeout(max(min(wait, oldest + self.timeout - now), 0.0001))
+            try:
+                chunk = sock.recv(65536)
+            except TimeoutError:
+                if time.monotonic() - oldest >= self.timeout:
+                    self.timeouts += len(inflight)
+                    inflight.clear()
+                    return
+                continue
+            if not chunk:
+                raise ConnectionError("connection closed by target")
+            received_at = time.monotonic()
+            for ack in decoder.feed(chunk):
+                msa = parse_msa(ack.decode(self.encoding, errors="replace"))
+                started = inflight.pop(msa["control_id"], None)
+                if started is None:
+                    self.errors += 1
+                    continue
+                self.acked += 1
+                if msa["ack_code"] not in ("AA", "CA"):
+                    self.nacks += 1
+                self.histogram.record(int((received_at - started) * 1_000_000))
+
+
+def run_bench(
+    host: str,
+    port: int,
+    *,
+    connections: int = 1,
+    window: int = 1,
+    duration: float | None = 10.0,
+    count: int | None = None,
+    rate: float = 0.0,
+    size: int = 512,
+    mix: str = "ADT^A01",
+    timeout: float = 10.0,
+    encoding: str = "utf-8",
+    ssl_context: ssl.SSLContext | None = None,
+    server_hostname: str | None = None,
+) -> dict:
+    """Drive an MLLP target and return throughput and ACK latency statistics.
+
+    Runs `connections` connections with up to `window` messages in flight each,
+    until `count` messages are sent or `duration` seconds pass. A positive
+    `rate` paces sends to that many messages per second across all connections.
+    With `ssl_context` connections use TLS, verified against `server_hostname`
+    or `host`.
+    """
+    if connections <= 0 or window <= 0:
+        raise ValueError("connections and window must be positive")
+    if count is None and duration is None:
+        raise ValueError("either count or duration is required")
+    templates = parse_mix(mix)
+    interval = connections / rate if rate > 0 else 0.0
+
+    start = time.monotonic()
+    deadline = start + duration if duration is not None and count is None else None
+    workers = []
+    for worker_id in range(connections):
+        budget = None
+        if count is not None:
+            budget = count // connections + (1 if worker_id < count % connections else 0)
+        workers.append(
+            Worker(
+                worker_id,
+                host,
+                port,
+                window=window,
+                budget=budget,
+                deadline=deadline,
+                interval=interval,
+                templates=templates,
+                size=size,
+                timeout=timeout,
+                encoding=encoding,
+                ssl_context=ssl_context,
+                server_hostname=server_hostname,
+            )
+        )
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = max(time.monotonic() - start, 1e-9)
+
+    histogram = Histogram()
+    for worker in workers:
+        histogram.merge(worker.histogram)
+    acked = sum(worker.acked for worker in workers)
+    return {
+        "target": f"{host}:{port}",
+        "connections": connections,
+        "window": window,
+        "size": size,
+        "mix": mix,
+        "target_rate": rate,
+        "elapsed": elapsed,
+        "sent": sum(worker.sent for worker in workers),
+        "acked": acked,
+        "nacks": sum(worker.nacks for worker in workers),
+        "errors": sum(worker.errors for worker in workers),
+        "timeouts": sum(worker.timeouts for worker in workers),
+        "throughput": acked / elapsed,
+        "latency_ms": latency_summary(histogram),
+    }
+
+
+def latency_summary(histogram: Histogram) -> dict:
+    """Return min, mean, `PERCENTILES` and max of a microsecond histogram in milliseconds."""
+    return {
+        "min": histogram.minimum / 1000,
+        "mean": histogram.mean() / 1000,
+        **{f"p{percent:g}": histogram.percentile(percent) / 1000 for percent in PERCENTILES},
+        "max": histogram.maximum / 1000,
+    }
+
+
+def format_report(report: dict) -> str:
+    latency = report["latency_ms"]
+    target_rate = f"{report['target_rate']:g} msg/s" if report["target_rate"] else "max"
+    lines = [
+        f"target      {report['target']}  connections={report['connections']} "
+        f"window={report['window']} size={report['size']} rate={target_rate}",
+        f"messages    sent={report['sent']} acked={report['acked']} nacks={report['nacks']} "
+        f"errors={report['errors']} timeouts={report['timeouts']}",
+        f"throughput  {report['throughput']:.1f} msg/s over {report['elapsed']:.2f}s",
+        "latency ms  " + " ".join(f"{key}={value:.3f}" for key, value in latency.items()),
+    ]
+    return "\n".join(lines) + "\n"
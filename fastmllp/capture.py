@@ -0,0 +1,377 @@
+import gzip
+import heapq
+import logging as std_logging
+import os
+import queue
+import shutil
+import struct
+import threading
+import time
+import zlib
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from typing import BinaryIO, NamedTuple
+
+from .logging import log_event
+from .metrics import ServerMetrics
+from .mllp import iter_frames
+
+CAPTURE_MAGIC = b"FMLLPC1\n"
+GZIP_MAGIC = b"\x1f\x8b"
+# Each record is a big-endian receive time (Unix seconds), connection number, peer
+# address length, payload length and CRC-32 of peer and payload, then the peer
+# address ("host:port", UTF-8) and the payload.
+RECORD_HEADER = struct.Struct(">dQHII")
+SEGMENT_SUFFIX = ".capture"
+COMPRESSED_SUFFIX = ".gz"
+DEFAULT_SEGMENT_SIZE = 64 * 1024 * 1024
+DEFAULT_SEGMENT_SECONDS = 3600.0
+# Frames queued for the writer beyond this many bytes are dropped, not buffered.
+DEFAULT_MAX_PENDING = 64 * 1024 * 1024
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+
+class CaptureError(ValueError):
+    """Raised when a capture file is malformed or a record is corrupt."""
+
+
+class CaptureRecord(NamedTuple):
+    timestamp: float | None
+    connection: int
+    payload: bytes
+    peer: str = ""
+
+
+def pack_record(timestamp: float, connection: int, peer: bytes, payload: bytes) -> bytes:
+    crc = zlib.crc32(payload, zlib.crc32(peer))
+    return RECORD_HEADER.pack(timestamp, connection, len(peer), len(payload), crc)
+
+
+class CaptureWriter:
+    """Append timestamped frames to a capture file.
+
+    Records carry the time a frame was received, a number identifying the
+    connection it arrived on and the peer address, so `fastmllp replay` can
+    reproduce both the timing and the per-connection ordering of the original
+    traffic.
+    """
+
+    def __init__(self, path: str | os.PathLike) -> None:
+        self.path = os.fspath(path)
+        self._handle = open(self.path, "ab")
+        if self._handle.tell() == 0:
+            self._handle.write(CAPTURE_MAGIC)
+
+    def write(
+        self,
+        payload: bytes,
+        *,
+        connection: int = 0,
+        timestamp: float | None = None,
+        peer: str = "",
+    ) -> None:
+        if timestamp is None:
+            timestamp = time.time()
+        peer_bytes = peer.encode("utf-8")
+        self._handle.write(pack_record(timestamp, connection, peer_bytes, payload))
+        self._handle.write(peer_bytes)
+        self._handle.write(payload)
+
+    def flush(self) -> None:
+        self._handle.flush()
+
+    def close(self) -> None:
+        self._handle.close()
+
+    def __enter__(self) -> "CaptureWriter":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
+class CaptureRecorder:
+    """Record received frames into rotating capture segments from a background thread.
+
+    `record` only queues the frames, so connection threads never wait on disk:
+    a writer thread packs each queued batch and appends it to the current
+    segment with one large buffered write. Segments are named
+    `<index>.capture` and rotate after `segment_size` bytes or, when positive,
+    `segment_seconds` seconds. With `compress`, closed segments are gzipped to
+    `<index>.capture.gz` by a second thread. When more than `max_pending`
+    payload bytes are waiting for the writer, new frames are dropped and
+    counted instead of growing the queue.
+    """
+
+    def __init__(
+        self,
+        directory: str | os.PathLike,
+        *,
+        segment_size: int = DEFAULT_SEGMENT_SIZE,
+        segment_seconds: float = DEFAULT_SEGMENT_SECONDS,
+        compress: bool = False,
+        max_pending: int = DEFAULT_MAX_PENDING,
+        metrics: ServerMetrics | None = None,
+    ) -> None:
+        if segment_size <= len(CAPTURE_MAGIC):
+            raise ValueError("segment_size is too small")
+        if segment_seconds < 0:
+            raise ValueError("segment_seconds must not be negative")
+        self.directory = Path(directory)
+        self.segment_size = segment_size
+        self.segment_seconds = segment_seconds
+        self.compress = compress
+        self.max_pending = max_pending
+        self.metrics = metrics
+        self.dropped = 0
+        self._logger = std_logging.getLogger("fastmllp")
+        self.directory.mkdir(parents=True, exist_ok=True)
+        existing = capture_segments(self.directory)
+        self._next_index = int(existing[-1].name.split(".")[0]) + 1 if existing else 1
+        self._cond = threading.Condition()
+        self._pending: list[tuple[float, int, str, bytes]] = []
+        self._pending_bytes = 0
+        self._closing = False
+        self._handle: BinaryIO | None = None
+        self._path: Path | None = None
+        self._size = 0
+        self._opened_at = 0.0
+        self._compress_queue: queue.SimpleQueue[Path | None] = queue.SimpleQueue()
+        self._writer = threading.Thread(target=self._run, name="fastmllp-capture", daemon=True)
+        self._writer.start()
+        self._compressor = None
+        if compress:
+            self._compressor = threading.Thread(
+                target=self._compress_segments, name="fastmllp-capture-gzip", daemon=True
+            )
+            self._compressor.start()
+
+    def record(self, payloads: Iterable[bytes], connection: int, peer: str = "") -> None:
+        """Queue the frames completed by one read on `connection` from `peer`."""
+        timestamp = time.time()
+        with self._cond:
+            if self._closing:
+                return
+            was_empty = not self._pending
+            for payload in payloads:
+                if self._pending_bytes + len(payload) > self.max_pending:
+                    self.dropped += 1
+                    if self.metrics is not None:
+                        self.metrics.capture_dropped.inc()
+                    continue
+                self._pending.append((timestamp, connection, peer, payload))
+                self._pending_bytes += len(payload)
+            if was_empty and self._pending:
+                self._cond.notify()
+
+    def close(self) -> None:
+        """Write the queued frames, close the current segment and finish compressing."""
+        with self._cond:
+            self._closing = True
+            self._cond.notify()
+        self._writer.join()
+        if self._compressor is not None:
+            self._compress_queue.put(None)
+            self._compressor.join()
+
+    def __enter__(self) -> "CaptureRecorder":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if not self._pending and not self._closing:
+                    self._cond.wait(self._time_to_rotation())
+                batch, self._pending = self._pending, []
+                self._pending_bytes = 0
+                closing = self._closing
+            try:
+                if batch:
+                    self._write_batch(batch)
+                if closing or self._segment_expired():
+                    self._close_segment()
+            except OSError as exc:
+                self._fail(exc, len(batch))
+            if closing:
+                return
+
+    def _write_batch(self, batch: list[tuple[float, int, str, bytes]]) -> None:
+        buffer = bytearray()
+        for timestamp, connection, peer, payload in batch:
+            peer_bytes = peer.encode("utf-8")
+            length = RECORD_HEADER.size + len(peer_bytes) + len(payload)
+            if self._handle is None:
+                self._open_segment()
+            filled = self._size + len(buffer)
+            if filled + length > self.segment_size and filled > len(CAPTURE_MAGIC):
+                self._handle.write(buffer)
+                self._size = filled
+                buffer.clear()
+                self._close_segment()
+                self._open_segment()
+            buffer += pack_record(timestamp, connection, peer_bytes, payload)
+            buffer += peer_bytes
+            buffer += payload
+        self._handle.write(buffer)
+        self._handle.flush()
+        self._size += len(buffer)
+        if self.metrics is not None:
+            self.metrics.capture_frames.inc(len(batch))
+            self.metrics.capture_bytes.inc(sum(len(item[3]) for item in batch))
+
+    def _open_segment(self) -> None:
+        while True:
+            path = self.directory / f"{self._next_index:010d}{SEGMENT_SUFFIX}"
+            self._next_index += 1
+            try:
+                handle = open(path, "xb", buffering=WRITE_BUFFER_SIZE)
+            except FileExistsError:
+                # Left by another recorder, or already compressed; never append to it.
+                continue
+            break
+        handle.write(CAPTURE_MAGIC)
+        self._handle = handle
+        self._path = path
+        self._size = len(CAPTURE_MAGIC)
+        self._opened_at = time.monotonic()
+
+    def _close_segment(self) -> None:
+        handle, path = self._handle, self._path
+        if handle is None:
+            return
+        self._handle = self._path = None
+        handle.close()
+        if self.metrics is not None:
+            self.metrics.capture_segments.inc()
+        if self._compressor is not None:
+            self._compress_queue.put(path)
+
+    def _segment_expired(self) -> bool:
+        if self._handle is None or self.segment_seconds <= 0:
+            return False
+        return time.monotonic() - self._opened_at >= self.segment_seconds
+
+    def _time_to_rotation(self) -> float | None:
+        if self._handle is None or self.segment_seconds <= 0:
+            return None
+        return max(self._opened_at + self.segment_seconds - time.monotonic(), 0.0)
+
+    def _fail(self, exc: OSError, lost: int) -> None:
+        self.dropped += lost
+        if self.metrics is not None:
+            self.metrics.capture_dropped.inc(lost)
+        log_event(self._logger, std_logging.ERROR, "capture_error", error=str(exc), dropped=lost)
+        # Start a fresh segment with the next batch rather than writing after a torn record.
+        handle, self._handle, self._path = self._handle, None, None
+        if handle is not None:
+            try:
+                handle.close()
+            except OSError:
+                pass
+
+    def _compress_segments(self) -> None:
+        while True:
+            path = self._compress_queue.get()
+            if path is None:
+                return
+            try:
+                compress_segment(path)
+            except OSError as exc:
+                log_event(
+                    self._logger,
+                    std_logging.ERROR,
+                    "capture_compress_error",
+                    segment=str(path),
+                    error=str(exc),
+                )
+
+
+def compress_segment(path: str | os.PathLike) -> Path:
+    """Gzip a closed capture segment next to itself, then remove the original."""
+    path = Path(path)
+    target = path.with_name(path.name + COMPRESSED_SUFFIX)
+    temporary = target.with_name(target.name + ".tmp")
+    with open(path, "rb") as source, gzip.open(temporary, "wb", compresslevel=6) as output:
+        shutil.copyfileobj(source, output, WRITE_BUFFER_SIZE)
+    os.replace(temporary, target)
+    os.remove(path)
+    return target
+
+
+def capture_segments(directory: str | os.PathLike) -> list[Path]:
+    """Return the capture segments in `directory`, oldest first.
+
+    A segment present both raw and compressed is listed once, as the raw file,
+    since its compression has not finished.
+    """
+    segments: dict[str, Path] = {}
+    for path in Path(directory).iterdir():
+        name = path.name
+        if name.endswith(SEGMENT_SUFFIX + COMPRESSED_SUFFIX):
+            segments.setdefault(name.removesuffix(COMPRESSED_SUFFIX), path)
+        elif name.endswith(SEGMENT_SUFFIX):
+            segments[name] = path
+    return [segments[name] for name in sorted(segments)]
+
+
+def iter_capture(path: str | os.PathLike) -> Iterator[CaptureRecord]:
+    """Yield the records of a capture file or directory in the order they were written.
+
+    A directory is read segment by segment, as written by `CaptureRecorder`;
+    gzipped files are decompressed while reading. A file without the capture
+    header is read as plain MLLP frames or MSH-delimited messages (see
+    `mllp.iter_frames`); its records have no timestamp and connection 0. A
+    torn record at the end of a capture is ignored. Raises `CaptureError` for
+    a record whose CRC does not match.
+    """
+    if os.path.isdir(path):
+        for segment in capture_segments(path):
+            yield from iter_capture(segment)
+        return
+    with open(path, "rb") as handle:
+        if handle.read(len(GZIP_MAGIC)) == GZIP_MAGIC:
+            handle.seek(0)
+            with gzip.GzipFile(fileobj=handle) as compressed:
+                if compressed.read(len(CAPTURE_MAGIC)) != CAPTURE_MAGIC:
+                    raise CaptureError(f"not a capture file: {path}")
+                yield from iter_records(compressed, path)
+            return
+        handle.seek(0)
+        is_capture = handle.read(len(CAPTURE_MAGIC)) == CAPTURE_MAGIC
+        if is_capture:
+            yield from iter_records(handle, path)
+    if not is_capture:
+        for payload in iter_frames(path):
+            yield CaptureRecord(None, 0, bytes(payload))
+
+
+def merge_captures(paths: Iterable[str | os.PathLike]) -> Iterator[CaptureRecord]:
+    """Yield the records of several captures merged by timestamp.
+
+    Each capture is read in order, as by `iter_capture`, so records with equal
+    or missing timestamps keep the order of `paths`.
+    """
+    streams = [iter_capture(path) for path in paths]
+    if len(streams) == 1:
+        return streams[0]
+    return heapq.merge(*streams, key=lambda record: record.timestamp or 0.0)
+
+
+def iter_records(handle: BinaryIO, path: str | os.PathLike) -> Iterator[CaptureRecord]:
+    offset = len(CAPTURE_MAGIC)
+    while True:
+        header = handle.read(RECORD_HEADER.size)
+        if len(header) < RECORD_HEADER.size:
+            return
+        timestamp, connection, peer_length, length, crc = RECORD_HEADER.unpack(header)
+        peer = handle.read(peer_length)
+        payload = handle.read(length)
+        if len(peer) < peer_length or len(payload) < length:
+            return
+        if zlib.crc32(payload, zlib.crc32(peer)) != crc:
+            raise CaptureError(f"CRC mismatch in {path} at offset {offset}")
+        yield CaptureRecord(timestamp, connection, payload, peer.decode("utf-8", "replace"))
+        offset += RECORD_HEADER.size + peer_length + length
@@ -1,11 +1,257 @@
 import argparse
+import asyncio
+import collections
+import glob
+import io
+import json
+import os
+import ssl
 import sys
+import time
+from collections.abc import Iterator
 
 from . import __version__
-from .client import send
-from .config import load_config, resolve_client_config, resolve_server_config
+from .bench import format_report, run_bench
+from .capture import CaptureRecord, merge_captures
+from .client import MLLPClient, send
+from .config import (
+    LIMIT_KEYS,
+    LOG_FORMATS,
+    PROXY_ACK_MODES,
+    SERVER_ENGINES,
+    SERVER_HANDLER_MODES,
+    SERVER_OVERLOAD_POLICIES,
+    load_config,
+    parse_address,
+    resolve_client_config,
+    resolve_proxy_config,
+    resolve_server_config,
+)
+from .handler import load_handler
+from .hl7 import iter_messages, parse_msa, parse_msh_bytes
+from .journal import JournalRecord, iter_journal
 from .logging import configure_logging
-from .server import serve
+from .metrics import ServerMetrics, start_metrics_server
+from .mllp import FrameFile
+from .proxy import serve_proxy
+from .replay import format_replay_report, parse_speed, run_replay
+from .server import serve, serve_async
+from .supervisor import serve_workers
+from .tls import ServerTLS, client_context
+
+
+def add_client_tls_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--tls",
+        action=argparse.BooleanOptionalAction,
+        default=None,
+        help="Connect with TLS, trusting the system CAs unless --tls-ca is given",
+    )
+    parser.add_argument("--tls-ca", default=None, help="CA bundle to verify the server against")
+    parser.add_argument(
+        "--tls-cert", default=None, help="Client certificate chain (PEM) for mutual TLS"
+    )
+    parser.add_argument("--tls-key", default=None, help="Private key for --tls-cert")
+    parser.add_argument("--tls-ciphers", default=None, help="OpenSSL cipher list for TLS 1.2")
+    parser.add_argument(
+        "--tls-server-name",
+        default=None,
+        help="Host name to verify the server certificate against (default: --host)",
+    )
+    parser.add_argument(
+        "--tls-verify",
+        action=argparse.BooleanOptionalAction,
+        default=None,
+        help="Verify the server certificate (--no-tls-verify is for testing only)",
+    )
+
+
+def add_server_arguments(parser: argparse.ArgumentParser, *, handler: bool = True) -> None:
+    parser.add_argument("--host", default=None)
+    parser.add_argument("--port", type=int, default=None)
+    parser.add_argument("--timeout", type=float, default=None)
+    parser.add_argument("--encoding", default=None)
+    parser.add_argument("--max-size", type=int, default=None)
+    parser.add_argument(
+        "--engine",
+        choices=SERVER_ENGINES,
+        default=None,
+        help="Connection engine (threaded or asyncio)",
+    )
+    parser.add_argument(
+        "--recv-buffer",
+        type=int,
+        default=None,
+        help="Per-connection socket read size in bytes",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=None,
+        help="Serve Prometheus metrics at /metrics on this port",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of server processes sharing the port",
+    )
+    parser.add_argument(
+        "--max-connections",
+        type=int,
+        default=None,
+        help="Concurrent connections per threaded server process",
+    )
+    parser.add_argument(
+        "--overload",
+        choices=SERVER_OVERLOAD_POLICIES,
+        default=None,
+        help="At the connection limit: wait to accept, or accept and close",
+    )
+    parser.add_argument(
+        "--backlog",
+        type=int,
+        default=None,
+        help="Listen backlog for pending connections",
+    )
+    if handler:
+        parser.add_argument(
+            "--handler",
+            default=None,
+            help="Message handler as module:function, returning AA, AE or AR",
+        )
+        parser.add_argument(
+            "--handler-mode",
+            choices=SERVER_HANDLER_MODES,
+            default=None,
+            help="Run the handler inline or on a thread or process pool",
+        )
+        parser.add_argument(
+            "--handler-workers",
+            type=int,
+            default=None,
+            help="Handler pool size (default: executor default)",
+        )
+        parser.add_argument(
+            "--max-in-flight",
+            type=int,
+            default=None,
+            help="Frames per connection awaiting a pooled handler",
+        )
+    parser.add_argument(
+        "--journal-dir",
+        default=None,
+        help="Journal every frame to this directory and fsync before ACKing",
+    )
+    parser.add_argument(
+        "--journal-segment-size",
+        type=int,
+        default=None,
+        help="Journal segment size in bytes before rotating",
+    )
+    parser.add_argument(
+        "--journal-commit-window",
+        type=float,
+        default=None,
+        help="Seconds to wait for more frames before each journal fsync",
+    )
+    parser.add_argument(
+        "--capture",
+        dest="capture_dir",
+        metavar="DIR",
+        default=None,
+        help="Record every received frame to rotating capture files in this directory",
+    )
+    parser.add_argument(
+        "--capture-segment-size",
+        type=int,
+        default=None,
+        help="Capture file size in bytes before rotating",
+    )
+    parser.add_argument(
+        "--capture-segment-seconds",
+        type=float,
+        default=None,
+        help="Seconds before rotating a capture file (0 rotates by size only)",
+    )
+    parser.add_argument(
+        "--capture-compress",
+        action=argparse.BooleanOptionalAction,
+        default=None,
+        help="Gzip capture files once they are rotated",
+    )
+    parser.add_argument(
+        "--dedupe",
+        action=argparse.BooleanOptionalAction,
+        default=None,
+        help="Re-ACK recently seen MSH-10 control IDs without calling the handler",
+    )
+    parser.add_argument(
+        "--dedupe-ttl",
+        type=float,
+        default=None,
+        help="Seconds a control ID is remembered",
+    )
+    parser.add_argument(
+        "--dedupe-capacity",
+        type=int,
+        default=None,
+        help="Control IDs remembered per server process",
+    )
+    parser.add_argument(
+        "--dedupe-max-bytes",
+        type=int,
+        default=None,
+        help="Approximate memory ceiling of the dedupe cache in bytes",
+    )
+    parser.add_argument(
+        "--limit-rate",
+        type=float,
+        default=None,
+        help="Frames per second accepted from each peer before its reads are slowed (0: off)",
+    )
+    parser.add_argument(
+        "--limit-burst",
+        type=float,
+        default=None,
+        help="Frames a peer may send at once above --limit-rate (default: one second's worth)",
+    )
+    parser.add_argument(
+        "--limit-key",
+        choices=LIMIT_KEYS,
+        default=None,
+        help="Rate limit per source IP (peer) or per MSH-3/MSH-4 sending app and facility",
+    )
+    parser.add_argument(
+        "--tls-cert", default=None, help="Serve TLS with this certificate chain (PEM)"
+    )
+    parser.add_argument(
+        "--tls-key", default=None, help="Private key for --tls-cert (default: in the cert file)"
+    )
+    parser.add_argument(
+        "--tls-ca", default=None, help="CA bundle to verify client certificates against"
+    )
+    parser.add_argument(
+        "--tls-require-client-cert",
+        action=argparse.BooleanOptionalAction,
+        default=None,
+        help="Require a client certificate signed by --tls-ca (mutual TLS)",
+    )
+    parser.add_argument(
+        "--tls-ciphers", default=None, help="OpenSSL cipher list for TLS 1.2"
+    )
+    parser.add_argument(
+        "--tls-session-tickets",
+        action=argparse.BooleanOptionalAction,
+        default=None,
+        help="Resume sessions with tickets rather than the server session cache",
+    )
+    parser.add_argument(
+        "--tls-reload-interval",
+        type=float,
+        default=None,
+        help="Seconds between checks for a renewed certificate (0 disables reloading)",
+    )
 
 
 def build_parser() -> argparse.ArgumentParser:
@@ -22,27 +268,184 @@ def build_parser() -> argparse.ArgumentParser:
         default=None,
         help="Log raw HL7 payloads",
     )
+    parser.add_argument(
+        "--log-format",
+        choices=LOG_FORMATS,
+        default=None,
+        help="Log line format (text or json)",
+    )
+    parser.add_argument(
+        "--log-queue",
+        action=argparse.BooleanOptionalAction,
+        default=None,
+        help="Write logs from a background thread",
+    )
 
     subparsers = parser.add_subparsers(dest="command", required=True)
 
     server_parser = subparsers.add_parser("server", help="Run MLLP server")
-    server_parser.add_argument("--host", default=None)
-    server_parser.add_argument("--port", type=int, default=None)
-    server_parser.add_argument("--timeout", type=float, default=None)
-    server_parser.add_argument("--encoding", default=None)
-    server_parser.add_argument("--max-size", type=int, default=None)
+    add_server_arguments(server_parser)
 
-    send_parser = subparsers.add_parser("send", help="Send one HL7 message")
+    proxy_parser = subparsers.add_parser(
+        "proxy", help="Forward MLLP to upstream servers over pooled connections"
+    )
+    proxy_parser.add_argument(
+        "--listen",
+        default=None,
+        metavar="HOST:PORT",
+        help="Address to accept MLLP on (overrides --host and --port)",
+    )
+    proxy_parser.add_argument(
+        "--upstream",
+        default=None,
+        metavar="HOST:PORT[,HOST:PORT]",
+        help="Upstream MLLP servers to forward to",
+    )
+    proxy_parser.add_argument(
+        "--ack-mode",
+        choices=PROXY_ACK_MODES,
+        default=None,
+        help="ACK once forwarded (local) or relay the upstream ACK (relay, default)",
+    )
+    proxy_parser.add_argument(
+        "--upstream-connections",
+        type=int,
+        default=None,
+        help="Persistent connections per upstream",
+    )
+    proxy_parser.add_argument(
+        "--upstream-in-flight",
+        type=int,
+        default=None,
+        help="Frames awaiting ACKs per upstream",
+    )
+    add_server_arguments(proxy_parser, handler=False)
+    proxy_parser.set_defaults(
+        handler=None, handler_mode=None, handler_workers=None, max_in_flight=None
+    )
+
+    send_parser = subparsers.add_parser("send", help="Send HL7 messages")
     send_parser.add_argument("--host", default=None)
     send_parser.add_argument("--port", type=int, default=None)
     send_parser.add_argument("--timeout", type=float, default=None)
     send_parser.add_argument("--encoding", default=None)
+    send_parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Send every message in the input (split on MSH) over one connection",
+    )
+    send_parser.add_argument(
+        "--window",
+        type=int,
+        default=None,
+        help="Frames in flight before reading ACKs in batch mode",
+    )
+    send_parser.add_argument(
+        "--progress",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="Report batch progress on stderr",
+    )
+
+    add_client_tls_arguments(send_parser)
 
     input_group = send_parser.add_mutually_exclusive_group(required=True)
     input_group.add_argument("--message", help="Inline HL7 message")
     input_group.add_argument("--file", help="Read message from file")
+    input_group.add_argument("--glob", help="Read messages from files matching a pattern")
     input_group.add_argument("--stdin", action="store_true", help="Read message from stdin")
 
+    bench_parser = subparsers.add_parser("bench", help="Load test an MLLP server")
+    bench_parser.add_argument("--host", default=None)
+    bench_parser.add_argument("--port", type=int, default=None)
+    bench_parser.add_argument("--timeout", type=float, default=None, help="ACK timeout")
+    bench_parser.add_argument("--encoding", default=None)
+    bench_parser.add_argument("--connections", type=int, default=1)
+    bench_parser.add_argument(
+        "--window",
+        type=int,
+        default=None,
+        help="Messages in flight per connection",
+    )
+    bench_parser.add_argument("--size", type=int, default=512, help="Message size in bytes")
+    bench_parser.add_argument(
+        "--mix",
+        default="ADT^A01",
+        help="Weighted message types, e.g. ADT^A01:70,ORU^R01:30",
+    )
+    limit_group = bench_parser.add_mutually_exclusive_group()
+    limit_group.add_argument("--duration", type=float, default=None, help="Seconds to run")
+    limit_group.add_argument("--count", type=int, default=None, help="Messages to send")
+    bench_parser.add_argument(
+        "--rate",
+        type=float,
+        default=0.0,
+        help="Target messages per second across all connections (0 = unlimited)",
+    )
+    bench_parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    add_client_tls_arguments(bench_parser)
+
+    replay_command = subparsers.add_parser(
+        "replay", help="Replay captured traffic at its original or a scaled rate"
+    )
+    replay_command.add_argument("captures", nargs="+", metavar="CAPTURE")
+    replay_command.add_argument("--host", default=None)
+    replay_command.add_argument("--port", type=int, default=None)
+    replay_command.add_argument("--timeout", type=float, default=None, help="ACK timeout")
+    replay_command.add_argument("--encoding", default=None)
+    replay_command.add_argument(
+        "--connections",
+        type=int,
+        default=1,
+        help="Connections to spread the captured connections over",
+    )
+    replay_command.add_argument(
+        "--window",
+        type=int,
+        default=None,
+        help="Messages in flight per connection",
+    )
+    schedule_group = replay_command.add_mutually_exclusive_group()
+    schedule_group.add_argument(
+        "--speed",
+        default="1",
+        help="Speed relative to the capture, e.g. 1, 10x, or max (default: 1)",
+    )
+    schedule_group.add_argument(
+        "--rate", type=float, default=None, help="Fixed messages per second instead"
+    )
+    replay_command.add_argument("--json", action="store_true", help="Print the report as JSON")
+    add_client_tls_arguments(replay_command)
+
+    journal_parser = subparsers.add_parser("journal", help="Inspect or replay server journals")
+    journal_commands = journal_parser.add_subparsers(dest="journal_command", required=True)
+    scan_parser = journal_commands.add_parser(
+        "scan", help="List journal records as JSON lines and verify their CRCs"
+    )
+    scan_parser.add_argument("directories", nargs="+", metavar="DIR")
+    scan_parser.add_argument("--encoding", default="utf-8")
+    replay_parser = journal_commands.add_parser(
+        "replay", help="Send journaled messages to an MLLP server"
+    )
+    replay_parser.add_argument("directories", nargs="+", metavar="DIR")
+    replay_parser.add_argument("--host", default=None)
+    replay_parser.add_argument("--port", type=int, default=None)
+    replay_parser.add_argument("--timeout", type=float, default=None)
+    replay_parser.add_argument("--encoding", default=None)
+    replay_parser.add_argument(
+        "--window",
+        type=int,
+        default=None,
+        help="Frames in flight before reading ACKs",
+    )
+    replay_parser.add_argument(
+        "--progress",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="Report progress on stderr",
+    )
+    add_client_tls_arguments(replay_parser)
+
     subparsers.add_parser("version", help="Print version")
 
     return parser
@@ -56,26 +459,184 @@ def load_message(args: argparse.Namespace) -> str | bytes:
             return handle.read()
     if args.stdin:
         return sys.stdin.buffer.read()
+    if args.glob is not None:
+        raise ValueError("--glob requires --batch")
     raise ValueError("no input source specified")
 
 
+def iter_file_messages(path: str) -> Iterator[bytes]:
+    """Yield the messages of an HL7 or MLLP capture file, copying one at a time."""
+    try:
+        frame_file = FrameFile(path)
+    except OSError as exc:
+        # Not an OSError, so it is not reported as a connection failure.
+        raise ValueError(f"cannot read {path}: {exc}") from exc
+    with frame_file:
+        for payload in frame_file:
+            yield bytes(payload)
+
+
+def iter_batch_messages(args: argparse.Namespace, encoding: str) -> Iterator[bytes]:
+    """Stream messages from the batch input source without reading it all."""
+    if args.message is not None:
+        yield from iter_messages(io.BytesIO(args.message.encode(encoding, errors="replace")))
+    elif args.file is not None:
+        yield from iter_file_messages(args.file)
+    elif args.glob is not None:
+        for path in sorted(glob.iglob(args.glob, recursive=True)):
+            if os.path.isfile(path):
+                yield from iter_file_messages(path)
+    elif args.stdin:
+        yield from iter_messages(sys.stdin.buffer)
+    else:
+        raise ValueError("no input source specified")
+
+
+def setup_logging(resolved: dict) -> None:
+    configure_logging(
+        resolved["log_level"],
+        log_format=resolved["log_format"],
+        log_queue=resolved["log_queue"],
+        log_sample=resolved["log_sample"],
+        log_rate_limit=resolved["log_rate_limit"],
+    )
+
+
+def client_tls_context(resolved: dict) -> ssl.SSLContext | None:
+    if not resolved["tls"]:
+        return None
+    return client_context(
+        cafile=resolved["tls_ca"],
+        certfile=resolved["tls_cert"],
+        keyfile=resolved["tls_key"],
+        ciphers=resolved["tls_ciphers"],
+        verify=resolved["tls_verify"],
+    )
+
+
+def server_tls(resolved: dict) -> ServerTLS | None:
+    if resolved["tls_cert"] is None:
+        return None
+    return ServerTLS(
+        resolved["tls_cert"],
+        resolved["tls_key"],
+        cafile=resolved["tls_ca"],
+        require_client_cert=resolved["tls_require_client_cert"],
+        ciphers=resolved["tls_ciphers"],
+        session_tickets=resolved["tls_session_tickets"],
+        reload_interval=resolved["tls_reload_interval"],
+    )
+
+
+def server_options(resolved: dict, tls: ServerTLS | None) -> dict:
+    """Return the `serve`/`serve_async` keyword arguments shared by server and proxy."""
+    options = {
+        "timeout": resolved["timeout"],
+        "encoding": resolved["encoding"],
+        "max_size": resolved["max_size"],
+        "log_message": resolved["log_message"],
+        "recv_buffer": resolved["recv_buffer"],
+        "backlog": resolved["backlog"],
+        "journal_dir": resolved["journal_dir"],
+        "journal_segment_size": resolved["journal_segment_size"],
+        "journal_commit_window": resolved["journal_commit_window"],
+        "capture_dir": resolved["capture_dir"],
+        "capture_segment_size": resolved["capture_segment_size"],
+        "capture_segment_seconds": resolved["capture_segment_seconds"],
+        "capture_compress": resolved["capture_compress"],
+        "dedupe": resolved["dedupe"],
+        "dedupe_ttl": resolved["dedupe_ttl"],
+        "dedupe_capacity": resolved["dedupe_capacity"],
+        "dedupe_max_bytes": resolved["dedupe_max_bytes"],
+        "limit_rate": resolved["limit_rate"],
+        "limit_burst": resolved["limit_burst"],
+        "limit_key": resolved["limit_key"],
+        "tls": tls,
+    }
+    if resolved["engine"] == "threaded":
+        options["max_connections"] = resolved["max_connections"]
+        options["overload"] = resolved["overload"]
+    return options
+
+
 def run_server(args: argparse.Namespace) -> int:
     try:
         config = load_config(args.config)
         resolved = resolve_server_config(args, config)
+        handler = load_handler(resolved["handler"]) if resolved["handler"] else None
+        tls = server_tls(resolved)
     except Exception as exc:
         print(f"error: {exc}", file=sys.stderr)
         return 2
 
-    configure_logging(resolved["log_level"])
+    setup_logging(resolved)
+    options = server_options(resolved, tls)
+    options.update(
+        handler=handler,
+        handler_mode=resolved["handler_mode"],
+        handler_workers=resolved["handler_workers"],
+        max_in_flight=resolved["max_in_flight"],
+    )
     try:
-        serve(
+        if resolved["workers"] > 1:
+            serve_workers(
+                resolved["host"],
+                resolved["port"],
+                workers=resolved["workers"],
+                engine=resolved["engine"],
+                metrics_port=resolved["metrics_port"],
+                **options,
+            )
+            return 0
+        if resolved["metrics_port"] is not None:
+            metrics = ServerMetrics()
+            start_metrics_server(metrics.registry, resolved["host"], resolved["metrics_port"])
+            options["metrics"] = metrics
+        if resolved["engine"] == "asyncio":
+            asyncio.run(serve_async(resolved["host"], resolved["port"], **options))
+        else:
+            serve(resolved["host"], resolved["port"], **options)
+    except KeyboardInterrupt:
+        return 0
+    except OSError as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 2
+    except Exception as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 3
+    return 0
+
+
+def run_proxy(args: argparse.Namespace) -> int:
+    try:
+        config = load_config(args.config)
+        if args.listen is not None:
+            args.host, args.port = parse_address(args.listen)
+        resolved = resolve_proxy_config(args, config)
+        if resolved["workers"] > 1:
+            # Each worker would open its own upstream pool, multiplying the connections.
+            raise ValueError("proxy runs as one process; --workers is not supported")
+        tls = server_tls(resolved)
+    except Exception as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 2
+
+    setup_logging(resolved)
+    options = server_options(resolved, tls)
+    try:
+        if resolved["metrics_port"] is not None:
+            metrics = ServerMetrics()
+            start_metrics_server(metrics.registry, resolved["host"], resolved["metrics_port"])
+            options["metrics"] = metrics
+        serve_proxy(
             resolved["host"],
             resolved["port"],
-            timeout=resolved["timeout"],
-            encoding=resolved["encoding"],
-            max_size=resolved["max_size"],
-            log_message=resolved["log_message"],
+            resolved["upstream"],
+            ack_mode=resolved["ack_mode"],
+            upstream_connections=resolved["upstream_connections"],
+            upstream_in_flight=resolved["upstream_in_flight"],
+            engine=resolved["engine"],
+            **options,
         )
     except KeyboardInterrupt:
         return 0
@@ -92,11 +653,14 @@ def run_send(args: argparse.Namespace) -> int:
     try:
         config = load_config(args.config)
         resolved = resolve_client_config(args, config)
+        resolved["ssl_context"] = client_tls_context(resolved)
     except Exception as exc:
         print(f"error: {exc}", file=sys.stderr)
         return 1
 
-    configure_logging(resolved["log_level"])
+    setup_logging(resolved)
+    if args.batch:
+        return run_send_batch(args, resolved)
     try:
         message = load_message(args)
     except Exception as exc:
@@ -110,6 +674,8 @@ def run_send(args: argparse.Namespace) -> int:
             resolved["port"],
             timeout=resolved["timeout"],
             encoding=resolved["encoding"],
+            ssl_context=resolved["ssl_context"],
+            server_hostname=resolved["tls_server_name"],
         )
         sys.stdout.write(ack)
         return 0
@@ -124,6 +690,210 @@ def run_send(args: argparse.Namespace) -> int:
         return 4
 
 
+def run_send_batch(args: argparse.Namespace, resolved: dict) -> int:
+    messages = iter_batch_messages(args, resolved["encoding"])
+    return send_message_stream(messages, resolved, progress=args.progress)
+
+
+def send_message_stream(messages: Iterator[bytes], resolved: dict, *, progress: bool) -> int:
+    """Send `messages` over one pipelined connection, printing each ACK as a JSON line."""
+    encoding = resolved["encoding"]
+    control_ids: collections.deque[str] = collections.deque()
+
+    def tracked_messages() -> Iterator[bytes]:
+        for payload in messages:
+            control_ids.append(parse_msh_bytes(payload, encoding)["control_id"])
+            yield payload
+
+    count = 0
+    start = time.monotonic()
+    last_report = start
+    exit_code = 0
+    try:
+        with MLLPClient(
+            timeout=resolved["timeout"],
+            encoding=encoding,
+            pool_size=1,
+            ssl_context=resolved["ssl_context"],
+            server_hostname=resolved["tls_server_name"],
+        ) as client:
+            acks = client.send_many(
+                tracked_messages(),
+                resolved["host"],
+                resolved["port"],
+                window=resolved["window"],
+            )
+            for ack in acks:
+                record = {
+                    "index": count,
+                    "control_id": control_ids.popleft(),
+                    "ack_code": parse_msa(ack)["ack_code"],
+                    "ack": ack,
+                }
+                sys.stdout.write(json.dumps(record) + "\n")
+                count += 1
+                now = time.monotonic()
+                if progress and now - last_report >= 1.0:
+                    last_report = now
+                    rate = count / (now - start)
+                    print(f"progress: {count} messages ({rate:.0f} msg/s)", file=sys.stderr)
+    except ValueError as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        exit_code = 1
+    except (TimeoutError, ConnectionError) as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        exit_code = 3
+    except Exception as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        exit_code = 4
+    sys.stdout.flush()
+
+    elapsed = max(time.monotonic() - start, 1e-9)
+    print(
+        f"sent {count} messages in {elapsed:.2f}s ({count / elapsed:.0f} msg/s)",
+        file=sys.stderr,
+    )
+    return exit_code
+
+
+def iter_journal_dirs(directories: list[str]) -> Iterator[JournalRecord]:
+    for directory in directories:
+        if not os.path.isdir(directory):
+            raise ValueError(f"not a directory: {directory}")
+        yield from iter_journal(directory)
+
+
+def run_journal(args: argparse.Namespace) -> int:
+    if args.journal_command == "replay":
+        return run_journal_replay(args)
+    count = 0
+    try:
+        for record in iter_journal_dirs(args.directories):
+            msh = parse_msh_bytes(record.payload, args.encoding)
+            entry = {
+                "segment": str(record.segment),
+                "offset": record.offset,
+                "length": len(record.payload),
+                "control_id": msh["control_id"],
+                "message_type": msh["message_type"],
+            }
+            sys.stdout.write(json.dumps(entry) + "\n")
+            count += 1
+    except (OSError, ValueError) as exc:
+        # Includes JournalError for a corrupt record.
+        print(f"error: {exc}", file=sys.stderr)
+        return 1
+    print(f"scanned {count} records", file=sys.stderr)
+    return 0
+
+
+def run_journal_replay(args: argparse.Namespace) -> int:
+    try:
+        config = load_config(args.config)
+        resolved = resolve_client_config(args, config)
+        resolved["ssl_context"] = client_tls_context(resolved)
+    except Exception as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 1
+
+    setup_logging(resolved)
+    messages = (record.payload for record in iter_journal_dirs(args.directories))
+    return send_message_stream(messages, resolved, progress=args.progress)
+
+
+def run_bench_command(args: argparse.Namespace) -> int:
+    try:
+        config = load_config(args.config)
+        resolved = resolve_client_config(args, config)
+        resolved["ssl_context"] = client_tls_context(resolved)
+    except Exception as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 1
+
+    setup_logging(resolved)
+    duration = args.duration
+    if duration is None and args.count is None:
+        duration = 10.0
+    try:
+        report = run_bench(
+            resolved["host"],
+            resolved["port"],
+            connections=args.connections,
+            window=resolved["window"],
+            duration=duration,
+            count=args.count,
+            rate=args.rate,
+            size=args.size,
+            mix=args.mix,
+            timeout=resolved["timeout"],
+            encoding=resolved["encoding"],
+            ssl_context=resolved["ssl_context"],
+            server_hostname=resolved["tls_server_name"],
+        )
+    except ValueError as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        return 130
+
+    if args.json:
+        sys.stdout.write(json.dumps(report) + "\n")
+    else:
+        sys.stdout.write(format_report(report))
+    if report["acked"] == 0 and report["sent"] + report["errors"] > 0:
+        return 3
+    return 0
+
+
+def iter_capture_files(paths: list[str]) -> Iterator[CaptureRecord]:
+    try:
+        yield from merge_captures(paths)
+    except OSError as exc:
+        # Not an OSError, so it is not reported as a connection failure.
+        raise ValueError(f"cannot read capture: {exc}") from exc
+
+
+def run_replay_command(args: argparse.Namespace) -> int:
+    try:
+        config = load_config(args.config)
+        resolved = resolve_client_config(args, config)
+        resolved["ssl_context"] = client_tls_context(resolved)
+        speed = parse_speed(args.speed)
+    except Exception as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 1
+
+    setup_logging(resolved)
+    try:
+        report = run_replay(
+            iter_capture_files(args.captures),
+            resolved["host"],
+            resolved["port"],
+            connections=args.connections,
+            speed=speed,
+            rate=args.rate or 0.0,
+            window=resolved["window"],
+            timeout=resolved["timeout"],
+            encoding=resolved["encoding"],
+            ssl_context=resolved["ssl_context"],
+            server_hostname=resolved["tls_server_name"],
+        )
+    except ValueError as exc:
+        # Includes CaptureError for a corrupt record.
+        print(f"error: {exc}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        return 130
+
+    if args.json:
+        sys.stdout.write(json.dumps(report) + "\n")
+    else:
+        sys.stdout.write(format_replay_report(report))
+    if report["acked"] < report["records"]:
+        return 3
+    return 0
+
+
 def main(argv: list[str] | None = None) -> int:
     parser = build_parser()
     args = parser.parse_args(argv)
@@ -133,8 +903,16 @@ def main(argv: list[str] | None = None) -> int:
         return 0
     if args.command == "server":
         return run_server(args)
+    if args.command == "proxy":
+        return run_proxy(args)
     if args.command == "send":
         return run_send(args)
+    if args.command == "bench":
+        return run_bench_command(args)
+    if args.command == "replay":
+        return run_replay_command(args)
+    if args.command == "journal":
+        return run_journal(args)
 
     print("error: unknown command", file=sys.stderr)
     return 1
@@ -1,6 +1,439 @@
+import collections
 import socket
+import ssl
+import threading
+import time
+from collections.abc import Iterable, Iterator
 
-from .mllp import frame, unframe_stream
+from .hl7 import parse_msa, parse_msh_bytes
+from .metrics import ClientMetrics
+from .mllp import MLLPDecoder, frame_buffers, send_buffers
+from .tls import SessionCache
+
+# Shared by clients created without their own metrics, such as `send()`.
+CLIENT_METRICS = ClientMetrics()
+
+# TLS sessions saved for resumption by clients created without their own cache.
+CLIENT_SESSIONS = SessionCache()
+
+
+def encode_message(message: str | bytes, encoding: str) -> bytes:
+    if isinstance(message, str):
+        return message.encode(encoding, errors="replace")
+    if isinstance(message, (bytes, bytearray)):
+        return bytes(message)
+    raise ValueError("message must be str or bytes")
+
+
+def message_control_id(payload: bytes, encoding: str) -> str:
+    return parse_msh_bytes(payload, encoding)["control_id"]
+
+
+def ack_control_id(ack: bytes, encoding: str) -> str:
+    return parse_msa(ack.decode(encoding, errors="replace"))["control_id"]
+
+
+class Connection:
+    """A persistent MLLP connection that exchanges one frame for one ACK at a time.
+
+    With `ssl_context` the connection is wrapped in TLS, resuming a session
+    saved in `sessions` for the same server when there is one, and saving
+    its own session there once the first ACK has arrived.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        *,
+        timeout: float,
+        recv_buffer: int,
+        metrics: ClientMetrics,
+        ssl_context: ssl.SSLContext | None = None,
+        server_hostname: str | None = None,
+        sessions: SessionCache | None = None,
+    ) -> None:
+        sock = socket.create_connection((host, port), timeout=timeout)
+        self.session_key = None
+        if ssl_context is not None:
+            session = sessions.get(ssl_context, host, port) if sessions is not None else None
+            # Handshake flights and the first frame are small writes that Nagle would delay.
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock = ssl_context.wrap_socket(
+                sock, server_hostname=server_hostname or host, session=session
+            )
+            metrics.tls_handshakes.inc()
+            if sock.session_reused:
+                metrics.tls_resumed.inc()
+            if sessions is not None:
+                self.session_key = (sessions, ssl_context, host, port)
+        self.sock = sock
+        self.sock.settimeout(timeout)
+        self.timeout = timeout
+        self.metrics = metrics
+        metrics.connections_opened.inc()
+        self.decoder = MLLPDecoder()
+        self.read_buffer = bytearray(recv_buffer)
+        self.read_view = memoryview(self.read_buffer)
+        self.last_used = time.monotonic()
+        self.exchanges = 0
+
+    def exchange(self, payload: bytes) -> bytes | None:
+        """Send one framed payload and return the first ACK frame, or None on EOF."""
+        started = time.perf_counter()
+        self.send_frame(payload)
+        ack = self.read_frame()
+        if ack is not None:
+            self.metrics.ack_latency.observe(time.perf_counter() - started)
+        return ack
+
+    def send_frame(self, payload: bytes) -> None:
+        self.send_frames([payload])
+
+    def send_frames(self, payloads: list[bytes]) -> None:
+        """Write framed payloads with one gathered write instead of one per frame."""
+        sent = send_buffers(self.sock, frame_buffers(payloads))
+        self.metrics.messages_sent.inc(len(payloads))
+        self.metrics.bytes_sent.inc(sent)
+
+    def read_frame(self) -> bytes | None:
+        """Return the next frame from the peer, or None on EOF."""
+        for ack in self.decoder.feed(b""):
+            self.exchanges += 1
+            self.metrics.acks_received.inc()
+            return ack
+        while True:
+            received = self.sock.recv_into(self.read_buffer)
+            if not received:
+                return None
+            self.metrics.bytes_received.inc(received)
+            for ack in self.decoder.feed(self.read_view[:received]):
+                self.exchanges += 1
+                self.metrics.acks_received.inc()
+                self.last_used = time.monotonic()
+                if self.session_key is not None:
+                    self.save_session()
+                return ack
+
+    def save_session(self) -> None:
+        # TLS 1.3 servers send session tickets after the handshake, so the
+        # session is only resumable once the connection has read some data.
+        sessions, context, host, port = self.session_key
+        self.session_key = None
+        session = self.sock.session
+        if session is not None:
+            sessions.put(context, host, port, session)
+
+    def pipeline(
+        self,
+        payloads: Iterable[bytes],
+        *,
+        window: int,
+        encoding: str,
+    ) -> Iterator[bytes]:
+        """Send payloads with up to `window` frames in flight and yield ACKs in order.
+
+        Each ACK's MSA-2 is matched against the MSH-10 of the oldest in-flight
+        message. If the peer answers out of order, or with a control ID that
+        cannot be correlated, the remaining messages are sent stop-and-wait.
+        ACKs whose MSA-2 matches no in-flight message are discarded.
+        """
+        inflight: collections.deque[str] = collections.deque()
+        sent_at: collections.deque[float] = collections.deque()
+        early: dict[str, bytes] = {}
+        source = iter(payloads)
+        exhausted = False
+        while True:
+            batch = []
+            while not exhausted and len(inflight) + len(batch) < window:
+                payload = next(source, None)
+                if payload is None:
+                    exhausted = True
+                    break
+                batch.append(payload)
+            if batch:
+                self.send_frames(batch)
+                now = time.perf_counter()
+                for payload in batch:
+                    inflight.append(message_control_id(payload, encoding))
+                    sent_at.append(now)
+            if not inflight:
+                return
+
+            head = inflight[0]
+            ack = early.pop(head, None) if head else None
+            if ack is None:
+                ack = self.read_frame()
+                if ack is None:
+                    raise ConnectionError("no ACK received")
+                control_id = ack_control_id(ack, encoding)
+                if head and control_id and control_id != head:
+                    window = 1
+                    # Keep early ACKs for later messages; drop stray or duplicate ones.
+                    if control_id in inflight:
+                        early[control_id] = ack
+                    continue
+            inflight.popleft()
+            self.metrics.ack_latency.observe(time.perf_counter() - sent_at.popleft())
+            yield ack
+
+    def is_alive(self) -> bool:
+        """Return True if the peer has not closed the socket or sent unsolicited bytes."""
+        # TLS sockets cannot peek; a byte read here means the connection is dropped anyway.
+        flags = 0 if isinstance(self.sock, ssl.SSLSocket) else socket.MSG_PEEK
+        try:
+            self.sock.setblocking(False)
+            try:
+                self.sock.recv(1, flags)
+            finally:
+                self.sock.settimeout(self.timeout)
+        except (BlockingIOError, InterruptedError, ssl.SSLWantReadError):
+            return self.decoder.pending() == 0
+        except OSError:
+            return False
+        # Readable means EOF or stray bytes, such as a late ACK for an abandoned exchange.
+        return False
+
+    def close(self) -> None:
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class ConnectionPool:
+    """Thread-safe pool of idle connections to a single host and port."""
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        *,
+        size: int,
+        timeout: float,
+        idle_timeout: float,
+        recv_buffer: int,
+        metrics: ClientMetrics,
+        ssl_context: ssl.SSLContext | None = None,
+        server_hostname: str | None = None,
+        sessions: SessionCache | None = None,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.recv_buffer = recv_buffer
+        self.metrics = metrics
+        self.ssl_context = ssl_context
+        self.server_hostname = server_hostname
+        self.sessions = sessions
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle: collections.deque[Connection] = collections.deque()
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def acquire(self) -> Connection | None:
+        """Reserve a pool slot and return a live idle connection, if any.
+
+        Returns None when the caller should open a fresh connection.
+        """
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError("timed out waiting for a pooled connection")
+        while True:
+            with self._lock:
+                self._evict_idle()
+                conn = self._idle.pop() if self._idle else None
+            if conn is None or conn.is_alive():
+                return conn
+            conn.close()
+
+    def connect(self) -> Connection:
+        return Connection(
+            self.host,
+            self.port,
+            timeout=self.timeout,
+            recv_buffer=self.recv_buffer,
+            metrics=self.metrics,
+            ssl_context=self.ssl_context,
+            server_hostname=self.server_hostname,
+            sessions=self.sessions,
+        )
+
+    def release(self, conn: Connection | None, *, reuse: bool) -> None:
+        """Return a slot to the pool, keeping `conn` for reuse when `reuse` is true."""
+        try:
+            if conn is not None:
+                with self._lock:
+                    if reuse and not self._closed:
+                        self._idle.append(conn)
+                        conn = None
+                if conn is not None:
+                    conn.close()
+        finally:
+            self._slots.release()
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+        for conn in idle:
+            conn.close()
+
+    def _evict_idle(self) -> None:
+        deadline = time.monotonic() - self.idle_timeout
+        while self._idle and self._idle[0].last_used < deadline:
+            self._idle.popleft().close()
+
+
+class MLLPClient:
+    """Send HL7 messages over pooled, persistent MLLP connections.
+
+    Connections are kept per `(host, port)` and reused across calls and
+    threads. Idle connections older than `idle_timeout` are closed, connections
+    are checked for liveness on checkout, and a send that fails on a reused
+    connection is retried once on a fresh one. Traffic and ACK latency are
+    recorded in `metrics`, or in the process-wide `CLIENT_METRICS` by default.
+
+    With `ssl_context` connections use TLS, checking the certificate against
+    `server_hostname` or the host connected to. TLS sessions are saved in
+    `sessions`, or the process-wide `CLIENT_SESSIONS`, so new connections to
+    a server resume rather than repeat the full handshake.
+    """
+
+    def __init__(
+        self,
+        *,
+        timeout: float = 10.0,
+        encoding: str = "utf-8",
+        pool_size: int = 4,
+        idle_timeout: float = 60.0,
+        recv_buffer: int = 4096,
+        metrics: ClientMetrics | None = None,
+        ssl_context: ssl.SSLContext | None = None,
+        server_hostname: str | None = None,
+        sessions: SessionCache | None = None,
+    ) -> None:
+        if pool_size <= 0:
+            raise ValueError("pool_size must be positive")
+        self.timeout = timeout
+        self.encoding = encoding
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self.recv_buffer = recv_buffer
+        self.metrics = metrics or CLIENT_METRICS
+        self.ssl_context = ssl_context
+        self.server_hostname = server_hostname
+        self.sessions = sessions if sessions is not None else CLIENT_SESSIONS
+        self._pools: dict[tuple[str, int], ConnectionPool] = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "MLLPClient":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def pool(self, host: str, port: int) -> ConnectionPool:
+        key = (host, port)
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = ConnectionPool(
+                    host,
+                    port,
+                    size=self.pool_size,
+                    timeout=self.timeout,
+                    idle_timeout=self.idle_timeout,
+                    recv_buffer=self.recv_buffer,
+                    metrics=self.metrics,
+                    ssl_context=self.ssl_context,
+                    server_hostname=self.server_hostname,
+                    sessions=self.sessions,
+                )
+                self._pools[key] = pool
+            return pool
+
+    def send(self, message: str | bytes, host: str, port: int) -> str:
+        """Send a single HL7 message and return the first ACK."""
+        payload = encode_message(message, self.encoding)
+        ack = self.send_bytes(payload, host, port)
+        return ack.decode(self.encoding, errors="replace")
+
+    def send_bytes(self, payload: bytes, host: str, port: int) -> bytes:
+        """Send a raw payload and return the first ACK frame as bytes."""
+        pool = self.pool(host, port)
+        conn = pool.acquire()
+        ack = None
+        try:
+            try:
+                if conn is not None:
+                    try:
+                        ack = conn.exchange(payload)
+                    except TimeoutError:
+                        raise
+                    except OSError:
+                        ack = None
+                    if ack is None:
+                        # The peer dropped a pooled connection; reconnect once.
+                        conn.close()
+                        conn = None
+                if conn is None:
+                    conn = pool.connect()
+                    ack = conn.exchange(payload)
+            except TimeoutError as exc:
+                raise TimeoutError("timed out waiting for ACK") from exc
+            except OSError as exc:
+                raise ConnectionError("connection error") from exc
+            if ack is None:
+                raise ConnectionError("no ACK received")
+            return ack
+        finally:
+            pool.release(conn, reuse=ack is not None)
+
+    def send_many(
+        self,
+        messages: Iterable[str | bytes],
+        host: str,
+        port: int,
+        *,
+        window: int = 8,
+    ) -> Iterator[str]:
+        """Send messages pipelined over one connection and yield ACKs in order.
+
+        Up to `window` frames are written before ACKs are read. Messages are
+        consumed lazily, so memory stays bounded by the window. A failed pipeline
+        is not retried, since the peer may already have processed part of it.
+        """
+        if window <= 0:
+            raise ValueError("window must be positive")
+        pool = self.pool(host, port)
+        conn = pool.acquire()
+        done = False
+        try:
+            try:
+                if conn is None:
+                    conn = pool.connect()
+                payloads = (encode_message(message, self.encoding) for message in messages)
+                for ack in conn.pipeline(payloads, window=window, encoding=self.encoding):
+                    yield ack.decode(self.encoding, errors="replace")
+                done = True
+            except TimeoutError as exc:
+                raise TimeoutError("timed out waiting for ACK") from exc
+            except ConnectionError:
+                raise
+            except OSError as exc:
+                raise ConnectionError("connection error") from exc
+        finally:
+            pool.release(conn, reuse=done)
+
+    def close(self) -> None:
+        """Close all idle pooled connections."""
+        with self._lock:
+            pools = list(self._pools.values())
+            self._pools.clear()
+        for pool in pools:
+            pool.close()
 
 
 def send(
@@ -10,33 +443,21 @@ def send(
     *,
     timeout: float = 10.0,
     encoding: str = "utf-8",
+    recv_buffer: int = 4096,
+    ssl_context: ssl.SSLContext | None = None,
+    server_hostname: str | None = None,
 ) -> str:
-    """Send a single HL7 message and return the first ACK."""
-    if isinstance(message, str):
-        payload = message.encode(encoding, errors="replace")
-    elif isinstance(message, (bytes, bytearray)):
-        payload = bytes(message)
-    else:
-        raise ValueError("message must be str or bytes")
-
-    framed = frame(payload)
-    buffer = b""
-
-    try:
-        with socket.create_connection((host, port), timeout=timeout) as sock:
-            sock.settimeout(timeout)
-            sock.sendall(framed)
-            while True:
-                chunk = sock.recv(4096)
-                if not chunk:
-                    break
-                buffer += chunk
-                frames, buffer = unframe_stream(buffer)
-                if frames:
-                    return frames[0].decode(encoding, errors="replace")
-    except TimeoutError as exc:
-        raise TimeoutError("timed out waiting for ACK") from exc
-    except OSError as exc:
-        raise ConnectionError("connection error") from exc
-
-    raise ConnectionError("no ACK received")
+    """Send a single HL7 message and return the first ACK.
+
+    With `ssl_context` the message is sent over TLS; repeated calls resume
+    the session saved in `CLIENT_SESSIONS` by the previous one.
+    """
+    with MLLPClient(
+        timeout=timeout,
+        encoding=encoding,
+        pool_size=1,
+        recv_buffer=recv_buffer,
+        ssl_context=ssl_context,
+        server_hostname=server_hostname,
+    ) as client:
+        return client.send(message, host, port)
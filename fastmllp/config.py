@@ -1,4 +1,5 @@
 import os
+import socket
 from typing import Any
 
 try:
@@ -12,20 +13,85 @@ DEFAULT_SERVER = {
     "timeout": 10.0,
     "encoding": "utf-8",
     "max_size": 1048576,
+    "engine": "threaded",
+    "recv_buffer": 65536,
+    "metrics_port": None,
+    "workers": 1,
+    "max_connections": 1024,
+    "overload": "wait",
+    "backlog": socket.SOMAXCONN,
+    "handler": None,
+    "handler_mode": "inline",
+    "handler_workers": None,
+    "max_in_flight": 8,
+    "journal_dir": None,
+    "journal_segment_size": 67108864,
+    "journal_commit_window": 0.0,
+    "capture_dir": None,
+    "capture_segment_size": 67108864,
+    "capture_segment_seconds": 3600.0,
+    "capture_compress": False,
+    "dedupe": False,
+    "dedupe_ttl": 300.0,
+    "dedupe_capacity": 100000,
+    "dedupe_max_bytes": 67108864,
+    "tls_cert": None,
+    "tls_key": None,
+    "tls_ca": None,
+    "tls_require_client_cert": False,
+    "tls_ciphers": None,
+    "tls_session_tickets": True,
+    "tls_reload_interval": 60.0,
 }
 
+SERVER_ENGINES = ("threaded", "asyncio")
+SERVER_OVERLOAD_POLICIES = ("wait", "close")
+SERVER_HANDLER_MODES = ("inline", "thread", "process")
+
+# `[server.limits]`: per-peer admission control; a rate of 0 disables it.
+DEFAULT_LIMITS = {
+    "rate": 0.0,
+    "burst": None,
+    "key": "peer",
+}
+
+LIMIT_KEYS = ("peer", "sender")
+
+DEFAULT_PROXY = {
+    "upstream": None,
+    "ack_mode": "relay",
+    "upstream_connections": 2,
+    "upstream_in_flight": 64,
+}
+
+PROXY_ACK_MODES = ("local", "relay")
+
 DEFAULT_CLIENT = {
     "host": "127.0.0.1",
     "port": 2575,
     "timeout": 10.0,
     "encoding": "utf-8",
+    "window": 8,
+    "tls": False,
+    "tls_cert": None,
+    "tls_key": None,
+    "tls_ca": None,
+    "tls_ciphers": None,
+    "tls_server_name": None,
+    "tls_verify": True,
 }
 
 DEFAULT_LOGGING = {
     "log_level": "info",
     "log_message": False,
+    "log_format": "text",
+    "log_queue": False,
+    "log_sample": {},
+    "log_rate_limit": {},
 }
 
+LOG_FORMATS = ("text", "json")
+
 
 def load_config(path: str | None) -> dict:
     if not path:
@@ -57,8 +123,94 @@ def read_env() -> dict:
         env["log_level"] = os.environ["FASTMLLP_LOG_LEVEL"].strip().lower()
     if "FASTMLLP_LOG_MESSAGE" in os.environ:
         env["log_message"] = parse_bool(os.environ["FASTMLLP_LOG_MESSAGE"])
+    if "FASTMLLP_LOG_FORMAT" in os.environ:
+        env["log_format"] = os.environ["FASTMLLP_LOG_FORMAT"].strip().lower()
+    if "FASTMLLP_LOG_QUEUE" in os.environ:
+        env["log_queue"] = parse_bool(os.environ["FASTMLLP_LOG_QUEUE"])
     if "FASTMLLP_MAX_SIZE" in os.environ:
         env["max_size"] = int(os.environ["FASTMLLP_MAX_SIZE"])
+    if "FASTMLLP_RECV_BUFFER" in os.environ:
+        env["recv_buffer"] = int(os.environ["FASTMLLP_RECV_BUFFER"])
+    if "FASTMLLP_WINDOW" in os.environ:
+        env["window"] = int(os.environ["FASTMLLP_WINDOW"])
+    if "FASTMLLP_METRICS_PORT" in os.environ:
+        env["metrics_port"] = int(os.environ["FASTMLLP_METRICS_PORT"])
+    if "FASTMLLP_WORKERS" in os.environ:
+        env["workers"] = int(os.environ["FASTMLLP_WORKERS"])
+    if "FASTMLLP_MAX_CONNECTIONS" in os.environ:
+        env["max_connections"] = int(os.environ["FASTMLLP_MAX_CONNECTIONS"])
+    if "FASTMLLP_OVERLOAD" in os.environ:
+        env["overload"] = os.environ["FASTMLLP_OVERLOAD"].strip().lower()
+    if "FASTMLLP_BACKLOG" in os.environ:
+        env["backlog"] = int(os.environ["FASTMLLP_BACKLOG"])
+    if "FASTMLLP_HANDLER" in os.environ:
+        env["handler"] = os.environ["FASTMLLP_HANDLER"].strip()
+    if "FASTMLLP_HANDLER_MODE" in os.environ:
+        env["handler_mode"] = os.environ["FASTMLLP_HANDLER_MODE"].strip().lower()
+    if "FASTMLLP_HANDLER_WORKERS" in os.environ:
+        env["handler_workers"] = int(os.environ["FASTMLLP_HANDLER_WORKERS"])
+    if "FASTMLLP_MAX_IN_FLIGHT" in os.environ:
+        env["max_in_flight"] = int(os.environ["FASTMLLP_MAX_IN_FLIGHT"])
+    if "FASTMLLP_JOURNAL_DIR" in os.environ:
+        env["journal_dir"] = os.environ["FASTMLLP_JOURNAL_DIR"].strip()
+    if "FASTMLLP_JOURNAL_SEGMENT_SIZE" in os.environ:
+        env["journal_segment_size"] = int(os.environ["FASTMLLP_JOURNAL_SEGMENT_SIZE"])
+    if "FASTMLLP_JOURNAL_COMMIT_WINDOW" in os.environ:
+        env["journal_commit_window"] = float(os.environ["FASTMLLP_JOURNAL_COMMIT_WINDOW"])
+    if "FASTMLLP_CAPTURE_DIR" in os.environ:
+        env["capture_dir"] = os.environ["FASTMLLP_CAPTURE_DIR"].strip()
+    if "FASTMLLP_CAPTURE_SEGMENT_SIZE" in os.environ:
+        env["capture_segment_size"] = int(os.environ["FASTMLLP_CAPTURE_SEGMENT_SIZE"])
+    if "FASTMLLP_CAPTURE_SEGMENT_SECONDS" in os.environ:
+        env["capture_segment_seconds"] = float(os.environ["FASTMLLP_CAPTURE_SEGMENT_SECONDS"])
+    if "FASTMLLP_CAPTURE_COMPRESS" in os.environ:
+        env["capture_compress"] = parse_bool(os.environ["FASTMLLP_CAPTURE_COMPRESS"])
+    if "FASTMLLP_DEDUPE" in os.environ:
+        env["dedupe"] = parse_bool(os.environ["FASTMLLP_DEDUPE"])
+    if "FASTMLLP_DEDUPE_TTL" in os.environ:
+        env["dedupe_ttl"] = float(os.environ["FASTMLLP_DEDUPE_TTL"])
+    if "FASTMLLP_DEDUPE_CAPACITY" in os.environ:
+        env["dedupe_capacity"] = int(os.environ["FASTMLLP_DEDUPE_CAPACITY"])
+    if "FASTMLLP_DEDUPE_MAX_BYTES" in os.environ:
+        env["dedupe_max_bytes"] = int(os.environ["FASTMLLP_DEDUPE_MAX_BYTES"])
+    if "FASTMLLP_TLS" in os.environ:
+        env["tls"] = parse_bool(os.environ["FASTMLLP_TLS"])
+    if "FASTMLLP_TLS_CERT" in os.environ:
+        env["tls_cert"] = os.environ["FASTMLLP_TLS_CERT"].strip()
+    if "FASTMLLP_TLS_KEY" in os.environ:
+        env["tls_key"] = os.environ["FASTMLLP_TLS_KEY"].strip()
+    if "FASTMLLP_TLS_CA" in os.environ:
+        env["tls_ca"] = os.environ["FASTMLLP_TLS_CA"].strip()
+    if "FASTMLLP_TLS_REQUIRE_CLIENT_CERT" in os.environ:
+        env["tls_require_client_cert"] = parse_bool(
+            os.environ["FASTMLLP_TLS_REQUIRE_CLIENT_CERT"]
+        )
+    if "FASTMLLP_TLS_CIPHERS" in os.environ:
+        env["tls_ciphers"] = os.environ["FASTMLLP_TLS_CIPHERS"].strip()
+    if "FASTMLLP_TLS_SESSION_TICKETS" in os.environ:
+        env["tls_session_tickets"] = parse_bool(os.environ["FASTMLLP_TLS_SESSION_TICKETS"])
+    if "FASTMLLP_TLS_RELOAD_INTERVAL" in os.environ:
+        env["tls_reload_interval"] = float(os.environ["FASTMLLP_TLS_RELOAD_INTERVAL"])
+    if "FASTMLLP_TLS_SERVER_NAME" in os.environ:
+        env["tls_server_name"] = os.environ["FASTMLLP_TLS_SERVER_NAME"].strip()
+    if "FASTMLLP_TLS_VERIFY" in os.environ:
+        env["tls_verify"] = parse_bool(os.environ["FASTMLLP_TLS_VERIFY"])
+    if "FASTMLLP_ENGINE" in os.environ:
+        env["engine"] = os.environ["FASTMLLP_ENGINE"].strip().lower()
+    if "FASTMLLP_LIMIT_RATE" in os.environ:
+        env["limit_rate"] = float(os.environ["FASTMLLP_LIMIT_RATE"])
+    if "FASTMLLP_LIMIT_BURST" in os.environ:
+        env["limit_burst"] = float(os.environ["FASTMLLP_LIMIT_BURST"])
+    if "FASTMLLP_LIMIT_KEY" in os.environ:
+        env["limit_key"] = os.environ["FASTMLLP_LIMIT_KEY"].strip().lower()
+    if "FASTMLLP_UPSTREAM" in os.environ:
+        env["upstream"] = os.environ["FASTMLLP_UPSTREAM"].strip()
+    if "FASTMLLP_ACK_MODE" in os.environ:
+        env["ack_mode"] = os.environ["FASTMLLP_ACK_MODE"].strip().lower()
+    if "FASTMLLP_UPSTREAM_CONNECTIONS" in os.environ:
+        env["upstream_connections"] = int(os.environ["FASTMLLP_UPSTREAM_CONNECTIONS"])
+    if "FASTMLLP_UPSTREAM_IN_FLIGHT" in os.environ:
+        env["upstream_in_flight"] = int(os.environ["FASTMLLP_UPSTREAM_IN_FLIGHT"])
     return env
 
 
@@ -104,6 +256,20 @@ def coerce_bool(value: Any, name: str) -> bool | None:
     raise ValueError(f"{name} must be a boolean")
 
 
+def coerce_event_limits(value: Any, name: str, coerce: Any = coerce_float) -> dict | None:
+    if value is None:
+        return None
+    if not isinstance(value, dict):
+        raise ValueError(f"{name} must be a table of event names to numbers")
+    limits = {}
+    for event, limit in value.items():
+        limit = coerce(limit, f"{name}.{event}")
+        if limit <= 0:
+            raise ValueError(f"{name}.{event} must be positive")
+        limits[event] = limit
+    return limits
+
+
 def validate_port(value: int) -> int:
     if value <= 0 or value > 65535:
         raise ValueError("port must be between 1 and 65535")
@@ -122,29 +288,240 @@ def validate_positive_float(value: float, name: str) -> float:
     return value
 
 
-def resolve_server_config(cli_args: Any, config: dict) -> dict:
+def validate_non_negative_float(value: float, name: str) -> float:
+    if value < 0:
+        raise ValueError(f"{name} must not be negative")
+    return value
+
+
+def validate_choice(value: str, choices: tuple[str, ...], name: str) -> str:
+    if value not in choices:
+        raise ValueError(f"{name} must be one of: {', '.join(choices)}")
+    return value
+
+
+def resolve_logging_config(cli_args: Any, env: dict, logging_cfg: dict) -> dict:
+    sample = coerce_event_limits(logging_cfg.get("log_sample"), "logging.log_sample", coerce_int)
+    rate_limit = coerce_event_limits(logging_cfg.get("log_rate_limit"), "logging.log_rate_limit")
+    return {
+        "log_level": resolve_value(
+            cli_args.log_level,
+            env.get("log_level"),
+            logging_cfg.get("log_level"),
+            DEFAULT_LOGGING["log_level"],
+        ),
+        "log_message": resolve_value(
+            cli_args.log_message,
+            env.get("log_message"),
+            coerce_bool(logging_cfg.get("log_message"), "logging.log_message"),
+            DEFAULT_LOGGING["log_message"],
+        ),
+        "log_format": validate_choice(
+            resolve_value(
+                cli_args.log_format,
+                env.get("log_format"),
+                logging_cfg.get("log_format"),
+                DEFAULT_LOGGING["log_format"],
+            ),
+            LOG_FORMATS,
+            "log_format",
+        ),
+        "log_queue": resolve_value(
+            cli_args.log_queue,
+            env.get("log_queue"),
+            coerce_bool(logging_cfg.get("log_queue"), "logging.log_queue"),
+            DEFAULT_LOGGING["log_queue"],
+        ),
+        "log_sample": sample or dict(DEFAULT_LOGGING["log_sample"]),
+        "log_rate_limit": rate_limit or dict(DEFAULT_LOGGING["log_rate_limit"]),
+    }
+
+
+def resolve_limits_config(cli_args: Any, env: dict, limits_cfg: Any, section: str) -> dict:
+    """Resolve admission control settings from the `[section.limits]` table."""
+    if not isinstance(limits_cfg, dict):
+        raise ValueError(f"{section}.limits must be a table")
+    rate = resolve_value(
+        cli_args.limit_rate,
+        env.get("limit_rate"),
+        coerce_float(limits_cfg.get("rate"), f"{section}.limits.rate"),
+        DEFAULT_LIMITS["rate"],
+    )
+    burst = resolve_value(
+        cli_args.limit_burst,
+        env.get("limit_burst"),
+        coerce_float(limits_cfg.get("burst"), f"{section}.limits.burst"),
+        DEFAULT_LIMITS["burst"],
+    )
+    return {
+        "limit_rate": validate_non_negative_float(float(rate), "limit_rate"),
+        "limit_burst": (
+            validate_positive_float(float(burst), "limit_burst") if burst is not None else None
+        ),
+        "limit_key": validate_choice(
+            resolve_value(
+                cli_args.limit_key,
+                env.get("limit_key"),
+                limits_cfg.get("key"),
+                DEFAULT_LIMITS["key"],
+            ),
+            LIMIT_KEYS,
+            "limit_key",
+        ),
+    }
+
+
+def resolve_tls_files(cli_args: Any, env: dict, section_cfg: dict, section: str) -> dict:
+    """Resolve the certificate, key, CA and cipher settings shared by servers and clients."""
+    resolved = {
+        name: resolve_value(
+            getattr(cli_args, name),
+            env.get(name),
+            section_cfg.get(name),
+            None,
+        )
+        for name in ("tls_cert", "tls_key", "tls_ca", "tls_ciphers")
+    }
+    if resolved["tls_key"] is not None and resolved["tls_cert"] is None:
+        raise ValueError(f"{section}.tls_key requires tls_cert")
+    return resolved
+
+
+def parse_address(value: str) -> tuple[str, int]:
+    """Parse `host:port` (IPv6 hosts in brackets) into a host and a valid port."""
+    host, sep, port = value.strip().rpartition(":")
+    if not sep or not host or not port.isdigit():
+        raise ValueError(f"address must be host:port, got {value!r}")
+    return host.removeprefix("[").removesuffix("]"), validate_port(int(port))
+
+
+def parse_upstreams(value: Any, name: str) -> list[tuple[str, int]]:
+    """Parse a comma-separated string or list of `host:port` upstream addresses."""
+    items = value.split(",") if isinstance(value, str) else value
+    if not isinstance(items, list):
+        raise ValueError(f"{name} must be a string or a list of host:port addresses")
+    upstreams = [parse_address(item) for item in items if str(item).strip()]
+    if not upstreams:
+        raise ValueError(f"{name} must name at least one host:port")
+    return upstreams
+
+
+def resolve_server_config(cli_args: Any, config: dict, section: str = "server") -> dict:
+    """Resolve listener settings from the CLI, environment, `[section]` table and defaults."""
     env = read_env()
-    server_cfg = config.get("server", {}) if config else {}
+    server_cfg = config.get(section, {}) if config else {}
     logging_cfg = config.get("logging", {}) if config else {}
 
     port = resolve_value(
         cli_args.port,
         env.get("port"),
-        coerce_int(server_cfg.get("port"), "server.port"),
+        coerce_int(server_cfg.get("port"), f"{section}.port"),
         DEFAULT_SERVER["port"],
     )
     timeout = resolve_value(
         cli_args.timeout,
         env.get("timeout"),
-        coerce_float(server_cfg.get("timeout"), "server.timeout"),
+        coerce_float(server_cfg.get("timeout"), f"{section}.timeout"),
         DEFAULT_SERVER["timeout"],
     )
     max_size = resolve_value(
         cli_args.max_size,
         env.get("max_size"),
-        coerce_int(server_cfg.get("max_size"), "server.max_size"),
+        coerce_int(server_cfg.get("max_size"), f"{section}.max_size"),
         DEFAULT_SERVER["max_size"],
     )
+    recv_buffer = resolve_value(
+        cli_args.recv_buffer,
+        env.get("recv_buffer"),
+        coerce_int(server_cfg.get("recv_buffer"), f"{section}.recv_buffer"),
+        DEFAULT_SERVER["recv_buffer"],
+    )
+    metrics_port = resolve_value(
+        cli_args.metrics_port,
+        env.get("metrics_port"),
+        coerce_int(server_cfg.get("metrics_port"), f"{section}.metrics_port"),
+        DEFAULT_SERVER["metrics_port"],
+    )
+    workers = resolve_value(
+        cli_args.workers,
+        env.get("workers"),
+        coerce_int(server_cfg.get("workers"), f"{section}.workers"),
+        DEFAULT_SERVER["workers"],
+    )
+    max_connections = resolve_value(
+        cli_args.max_connections,
+        env.get("max_connections"),
+        coerce_int(server_cfg.get("max_connections"), f"{section}.max_connections"),
+        DEFAULT_SERVER["max_connections"],
+    )
+    backlog = resolve_value(
+        cli_args.backlog,
+        env.get("backlog"),
+        coerce_int(server_cfg.get("backlog"), f"{section}.backlog"),
+        DEFAULT_SERVER["backlog"],
+    )
+    handler_workers = resolve_value(
+        cli_args.handler_workers,
+        env.get("handler_workers"),
+        coerce_int(server_cfg.get("handler_workers"), f"{section}.handler_workers"),
+        DEFAULT_SERVER["handler_workers"],
+    )
+    max_in_flight = resolve_value(
+        cli_args.max_in_flight,
+        env.get("max_in_flight"),
+        coerce_int(server_cfg.get("max_in_flight"), f"{section}.max_in_flight"),
+        DEFAULT_SERVER["max_in_flight"],
+    )
+    journal_segment_size = resolve_value(
+        cli_args.journal_segment_size,
+        env.get("journal_segment_size"),
+        coerce_int(server_cfg.get("journal_segment_size"), f"{section}.journal_segment_size"),
+        DEFAULT_SERVER["journal_segment_size"],
+    )
+    journal_commit_window = resolve_value(
+        cli_args.journal_commit_window,
+        env.get("journal_commit_window"),
+        coerce_float(server_cfg.get("journal_commit_window"), f"{section}.journal_commit_window"),
+        DEFAULT_SERVER["journal_commit_window"],
+    )
+    capture_segment_size = resolve_value(
+        cli_args.capture_segment_size,
+        env.get("capture_segment_size"),
+        coerce_int(server_cfg.get("capture_segment_size"), f"{section}.capture_segment_size"),
+        DEFAULT_SERVER["capture_segment_size"],
+    )
+    capture_segment_seconds = resolve_value(
+        cli_args.capture_segment_seconds,
+        env.get("capture_segment_seconds"),
+        coerce_float(
+            server_cfg.get("capture_segment_seconds"), f"{section}.capture_segment_seconds"
+        ),
+        DEFAULT_SERVER["capture_segment_seconds"],
+    )
+    dedupe_ttl = resolve_value(
+        cli_args.dedupe_ttl,
+        env.get("dedupe_ttl"),
+        coerce_float(server_cfg.get("dedupe_ttl"), f"{section}.dedupe_ttl"),
+        DEFAULT_SERVER["dedupe_ttl"],
+    )
+    dedupe_capacity = resolve_value(
+        cli_args.dedupe_capacity,
+        env.get("dedupe_capacity"),
+        coerce_int(server_cfg.get("dedupe_capacity"), f"{section}.dedupe_capacity"),
+        DEFAULT_SERVER["dedupe_capacity"],
+    )
+    dedupe_max_bytes = resolve_value(
+        cli_args.dedupe_max_bytes,
+        env.get("dedupe_max_bytes"),
+        coerce_int(server_cfg.get("dedupe_max_bytes"), f"{section}.dedupe_max_bytes"),
+        DEFAULT_SERVER["dedupe_max_bytes"],
+    )
+    tls_reload_interval = resolve_value(
+        cli_args.tls_reload_interval,
+        env.get("tls_reload_interval"),
+        coerce_float(server_cfg.get("tls_reload_interval"), f"{section}.tls_reload_interval"),
+        DEFAULT_SERVER["tls_reload_interval"],
+    )
 
     resolved = {
         "host": resolve_value(
@@ -162,19 +539,117 @@ def resolve_server_config(cli_args: Any, config: dict) -> dict:
             DEFAULT_SERVER["encoding"],
         ),
         "max_size": validate_positive_int(int(max_size), "max_size"),
-        "log_level": resolve_value(
-            cli_args.log_level,
-            env.get("log_level"),
-            logging_cfg.get("log_level"),
-            DEFAULT_LOGGING["log_level"],
+        "engine": validate_choice(
+            resolve_value(
+                cli_args.engine,
+                env.get("engine"),
+                server_cfg.get("engine"),
+                DEFAULT_SERVER["engine"],
+            ),
+            SERVER_ENGINES,
+            "engine",
         ),
-        "log_message": resolve_value(
-            cli_args.log_message,
-            env.get("log_message"),
-            coerce_bool(logging_cfg.get("log_message"), "logging.log_message"),
-            DEFAULT_LOGGING["log_message"],
+        "recv_buffer": validate_positive_int(int(recv_buffer), "recv_buffer"),
+        "metrics_port": validate_port(int(metrics_port)) if metrics_port is not None else None,
+        "workers": validate_positive_int(int(workers), "workers"),
+        "max_connections": validate_positive_int(int(max_connections), "max_connections"),
+        "overload": validate_choice(
+            resolve_value(
+                cli_args.overload,
+                env.get("overload"),
+                server_cfg.get("overload"),
+                DEFAULT_SERVER["overload"],
+            ),
+            SERVER_OVERLOAD_POLICIES,
+            "overload",
+        ),
+        "backlog": validate_positive_int(int(backlog), "backlog"),
+        "handler": resolve_value(
+            cli_args.handler,
+            env.get("handler"),
+            server_cfg.get("handler"),
+            DEFAULT_SERVER["handler"],
+        ),
+        "handler_mode": validate_choice(
+            resolve_value(
+                cli_args.handler_mode,
+                env.get("handler_mode"),
+                server_cfg.get("handler_mode"),
+                DEFAULT_SERVER["handler_mode"],
+            ),
+            SERVER_HANDLER_MODES,
+            "handler_mode",
+        ),
+        "handler_workers": (
+            validate_positive_int(int(handler_workers), "handler_workers")
+            if handler_workers is not None
+            else None
+        ),
+        "max_in_flight": validate_positive_int(int(max_in_flight), "max_in_flight"),
+        "journal_dir": resolve_value(
+            cli_args.journal_dir,
+            env.get("journal_dir"),
+            server_cfg.get("journal_dir"),
+            DEFAULT_SERVER["journal_dir"],
+        ),
+        "journal_segment_size": validate_positive_int(
+            int(journal_segment_size), "journal_segment_size"
+        ),
+        "journal_commit_window": validate_non_negative_float(
+            float(journal_commit_window), "journal_commit_window"
+        ),
+        "capture_dir": resolve_value(
+            cli_args.capture_dir,
+            env.get("capture_dir"),
+            server_cfg.get("capture_dir"),
+            DEFAULT_SERVER["capture_dir"],
         ),
+        "capture_segment_size": validate_positive_int(
+            int(capture_segment_size), "capture_segment_size"
+        ),
+        "capture_segment_seconds": validate_non_negative_float(
+            float(capture_segment_seconds), "capture_segment_seconds"
+        ),
+        "capture_compress": resolve_value(
+            cli_args.capture_compress,
+            env.get("capture_compress"),
+            coerce_bool(server_cfg.get("capture_compress"), f"{section}.capture_compress"),
+            DEFAULT_SERVER["capture_compress"],
+        ),
+        "dedupe": resolve_value(
+            cli_args.dedupe,
+            env.get("dedupe"),
+            coerce_bool(server_cfg.get("dedupe"), f"{section}.dedupe"),
+            DEFAULT_SERVER["dedupe"],
+        ),
+        "dedupe_ttl": validate_positive_float(float(dedupe_ttl), "dedupe_ttl"),
+        "dedupe_capacity": validate_positive_int(int(dedupe_capacity), "dedupe_capacity"),
+        "dedupe_max_bytes": validate_positive_int(int(dedupe_max_bytes), "dedupe_max_bytes"),
+        **resolve_limits_config(cli_args, env, server_cfg.get("limits", {}), section),
+        **resolve_tls_files(cli_args, env, server_cfg, section),
+        "tls_require_client_cert": resolve_value(
+            cli_args.tls_require_client_cert,
+            env.get("tls_require_client_cert"),
+            coerce_bool(
+                server_cfg.get("tls_require_client_cert"), f"{section}.tls_require_client_cert"
+            ),
+            DEFAULT_SERVER["tls_require_client_cert"],
+        ),
+        "tls_session_tickets": resolve_value(
+            cli_args.tls_session_tickets,
+            env.get("tls_session_tickets"),
+            coerce_bool(server_cfg.get("tls_session_tickets"), f"{section}.tls_session_tickets"),
+            DEFAULT_SERVER["tls_session_tickets"],
+        ),
+        "tls_reload_interval": validate_non_negative_float(
+            float(tls_reload_interval), "tls_reload_interval"
+        ),
+        **resolve_logging_config(cli_args, env, logging_cfg),
     }
+    if resolved["tls_require_client_cert"] and resolved["tls_ca"] is None:
+        raise ValueError("tls_require_client_cert requires tls_ca")
+    if resolved["tls_ca"] is not None and resolved["tls_cert"] is None:
+        raise ValueError("server.tls_ca requires tls_cert")
     return resolved
 
 
@@ -195,6 +670,12 @@ def resolve_client_config(cli_args: Any, config: dict) -> dict:
         coerce_float(client_cfg.get("timeout"), "client.timeout"),
         DEFAULT_CLIENT["timeout"],
     )
+    window = resolve_value(
+        cli_args.window,
+        env.get("window"),
+        coerce_int(client_cfg.get("window"), "client.window"),
+        DEFAULT_CLIENT["window"],
+    )
 
     resolved = {
         "host": resolve_value(
@@ -211,17 +692,81 @@ def resolve_client_config(cli_args: Any, config: dict) -> dict:
             client_cfg.get("encoding"),
             DEFAULT_CLIENT["encoding"],
         ),
-        "log_level": resolve_value(
-            cli_args.log_level,
-            env.get("log_level"),
-            logging_cfg.get("log_level"),
-            DEFAULT_LOGGING["log_level"],
+        "window": validate_positive_int(int(window), "window"),
+        **resolve_tls_files(cli_args, env, client_cfg, "client"),
+        "tls_server_name": resolve_value(
+            cli_args.tls_server_name,
+            env.get("tls_server_name"),
+            client_cfg.get("tls_server_name"),
+            DEFAULT_CLIENT["tls_server_name"],
         ),
-        "log_message": resolve_value(
-            cli_args.log_message,
-            env.get("log_message"),
-            coerce_bool(logging_cfg.get("log_message"), "logging.log_message"),
-            DEFAULT_LOGGING["log_message"],
+        "tls_verify": resolve_value(
+            cli_args.tls_verify,
+            env.get("tls_verify"),
+            coerce_bool(client_cfg.get("tls_verify"), "client.tls_verify"),
+            DEFAULT_CLIENT["tls_verify"],
         ),
+        **resolve_logging_config(cli_args, env, logging_cfg),
     }
+    # A CA or client certificate implies TLS without --tls.
+    resolved["tls"] = bool(
+        resolve_value(
+            cli_args.tls,
+            env.get("tls"),
+            coerce_bool(client_cfg.get("tls"), "client.tls"),
+            DEFAULT_CLIENT["tls"],
+        )
+        or resolved["tls_ca"]
+        or resolved["tls_cert"]
+    )
+    return resolved
+
+
+def resolve_proxy_config(cli_args: Any, config: dict) -> dict:
+    """Resolve `fastmllp proxy` settings; listener settings come from the `[proxy]` table."""
+    env = read_env()
+    proxy_cfg = config.get("proxy", {}) if config else {}
+    resolved = resolve_server_config(cli_args, config, "proxy")
+
+    upstream = resolve_value(
+        cli_args.upstream,
+        env.get("upstream"),
+        proxy_cfg.get("upstream"),
+        DEFAULT_PROXY["upstream"],
+    )
+    if upstream is None:
+        raise ValueError("proxy requires --upstream")
+    upstream_connections = resolve_value(
+        cli_args.upstream_connections,
+        env.get("upstream_connections"),
+        coerce_int(proxy_cfg.get("upstream_connections"), "proxy.upstream_connections"),
+        DEFAULT_PROXY["upstream_connections"],
+    )
+    upstream_in_flight = resolve_value(
+        cli_args.upstream_in_flight,
+        env.get("upstream_in_flight"),
+        coerce_int(proxy_cfg.get("upstream_in_flight"), "proxy.upstream_in_flight"),
+        DEFAULT_PROXY["upstream_in_flight"],
+    )
+    resolved.update(
+        {
+            "upstream": parse_upstreams(upstream, "upstream"),
+            "ack_mode": validate_choice(
+                resolve_value(
+                    cli_args.ack_mode,
+                    env.get("ack_mode"),
+                    proxy_cfg.get("ack_mode"),
+                    DEFAULT_PROXY["ack_mode"],
+                ),
+                PROXY_ACK_MODES,
+                "ack_mode",
+            ),
+            "upstream_connections": validate_positive_int(
+                int(upstream_connections), "upstream_connections"
+            ),
+            "upstream_in_flight": validate_positive_int(
+                int(upstream_in_flight), "upstream_in_flight"
+            ),
+        }
+    )
     return resolved
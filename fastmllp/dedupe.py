@@ -0,0 +1,125 @@
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+
+from .hl7 import parse_msa, parse_msh_bytes
+from .metrics import ServerMetrics
+
+MessageKey = tuple[str, str, str]
+
+# Rough per-entry cost of the dict slot, tuple, strings and entry list beyond the key text.
+ENTRY_OVERHEAD = 240
+
+
+def message_key(payload: bytes | memoryview, encoding: str = "utf-8") -> MessageKey | None:
+    """Return (sending app, sending facility, control ID), or None without MSH-10."""
+    msh = parse_msh_bytes(payload, encoding)
+    if not msh["control_id"]:
+        return None
+    return (msh["sending_app"], msh["sending_fac"], msh["control_id"])
+
+
+def entry_size(key: MessageKey) -> int:
+    return ENTRY_OVERHEAD + sum(len(part) for part in key)
+
+
+class DedupeCache:
+    """Recently received message keys and their ACK codes, bounded by count, bytes and age.
+
+    `claim` records a new key and returns None, or returns the ACK code to
+    repeat for a key seen within `ttl` seconds. A claimed key is ACKed AA
+    until `resolve` records the handler's result; an AE result forgets the
+    key so a retransmission is handled again. The least recently seen keys
+    are evicted beyond `capacity` entries or about `max_bytes` of memory.
+    Safe to call from any thread.
+    """
+
+    def __init__(
+        self,
+        *,
+        capacity: int = 100000,
+        ttl: float = 300.0,
+        max_bytes: int = 64 * 1024 * 1024,
+        metrics: ServerMetrics | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if capacity <= 0:
+            raise ValueError("dedupe capacity must be positive")
+        if ttl <= 0:
+            raise ValueError("dedupe ttl must be positive")
+        if max_bytes <= 0:
+            raise ValueError("dedupe max_bytes must be positive")
+        self.capacity = capacity
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.metrics = metrics
+        self._clock = clock
+        self._lock = threading.Lock()
+        # key -> [first seen, ACK code], least recently seen first.
+        self._entries: OrderedDict[MessageKey, list] = OrderedDict()
+        self._bytes = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def claim(self, key: MessageKey | None) -> str | None:
+        """Return the ACK code for a duplicate of `key`, or record it and return None."""
+        if key is None:
+            return None
+        now = self._clock()
+        added = 0
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] < self.ttl:
+                self._entries.move_to_end(key)
+                code = entry[1]
+            else:
+                if entry is not None:
+                    self._remove(key)
+                    added -= 1
+                self._entries[key] = [now, "AA"]
+                self._bytes += entry_size(key)
+                added += 1 - self._evict(now)
+                code = None
+        if self.metrics is not None:
+            if code is None:
+                self.metrics.dedupe_misses.inc()
+                self.metrics.dedupe_entries.inc(added)
+            else:
+                self.metrics.dedupe_hits.inc()
+        return code
+
+    def resolve(self, key: MessageKey | None, ack_code: str | bytes) -> None:
+        """Record the ACK code sent for a claimed key, or the MSA-1 of a relayed ACK."""
+        if key is None:
+            return
+        if isinstance(ack_code, bytes):
+            ack_code = parse_msa(ack_code.decode("latin-1"))["ack_code"] or "AE"
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            if ack_code != "AE":
+                entry[1] = ack_code
+                return
+            self._remove(key)
+        if self.metrics is not None:
+            self.metrics.dedupe_entries.dec()
+
+    def _remove(self, key: MessageKey) -> None:
+        del self._entries[key]
+        self._bytes -= entry_size(key)
+
+    def _evict(self, now: float) -> int:
+        # Called with the lock held; returns how many entries were removed.
+        removed = 0
+        while self._entries:
+            key, (seen, _) = next(iter(self._entries.items()))
+            over = len(self._entries) > self.capacity or self._bytes > self.max_bytes
+            if not over and now - seen < self.ttl:
+                break
+            self._remove(key)
+            removed += 1
+        return removed
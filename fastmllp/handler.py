@@ -0,0 +1,56 @@
+import importlib
+import multiprocessing
+import os
+import sys
+from collections.abc import Callable
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+ACK_CODES = ("AA", "AE", "AR")
+HANDLER_MODES = ("inline", "thread", "process")
+
+MessageHandler = Callable[[bytes], str | bytes | None]
+
+
+def load_handler(spec: str) -> MessageHandler:
+    """Import a handler from a `module:function` reference.
+
+    The current directory is importable, as it is for `python -m`.
+    """
+    module_name, sep, attribute = spec.partition(":")
+    if not sep or not module_name or not attribute:
+        raise ValueError(f"handler must be module:function, got {spec!r}")
+    if os.getcwd() not in sys.path:
+        sys.path.insert(0, os.getcwd())
+    target = importlib.import_module(module_name)
+    for name in attribute.split("."):
+        target = getattr(target, name)
+    if not callable(target):
+        raise ValueError(f"handler is not callable: {spec}")
+    return target
+
+
+def create_handler_pool(mode: str, workers: int | None = None) -> Executor | None:
+    """Return the executor handlers run on, or None when they run inline."""
+    if mode == "inline":
+        return None
+    if mode == "thread":
+        return ThreadPoolExecutor(workers, thread_name_prefix="fastmllp-handler")
+    if mode == "process":
+        # Workers start from a clean process rather than a fork of the threaded server.
+        methods = multiprocessing.get_all_start_methods()
+        method = "forkserver" if "forkserver" in methods else "spawn"
+        return ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context(method))
+    raise ValueError(f"handler_mode must be one of: {', '.join(HANDLER_MODES)}")
+
+
+def ack_code_for(result: object) -> str | bytes:
+    """Map a handler result to an MSA-1 code; `None` acknowledges with AA.
+
+    A `bytes` result is a complete ACK message, sent back unchanged.
+    """
+    if isinstance(result, bytes):
+        return result
+    code = "AA" if result is None else result
+    if code not in ACK_CODES:
+        raise ValueError(f"handler returned an invalid ACK code: {code!r}")
+    return code
@@ -1,6 +1,52 @@
+import functools
+import re
+import sys
+from collections.abc import Iterator
+from typing import BinaryIO
+
 DEFAULT_FIELD_SEP = "|"
 DEFAULT_ENCODING_CHARS = "^~\\&"
 
+# MSH at the start of a segment, i.e. after a CR or LF segment terminator.
+MESSAGE_START = re.compile(rb"(?<=[\r\n])MSH")
+# Batch envelope segments (FHS/BHS/BTS/FTS) are not part of any message.
+ENVELOPE_SEGMENT = re.compile(rb"(?<=[\r\n])(?:FHS|BHS|BTS|FTS)")
+
+# HL7 table 0211 character sets (MSH-18) mapped to Python codecs.
+HL7_CHARSETS = {
+    "ASCII": "ascii",
+    "8859/1": "latin-1",
+    "8859/2": "iso8859-2",
+    "8859/3": "iso8859-3",
+    "8859/4": "iso8859-4",
+    "8859/5": "iso8859-5",
+    "8859/6": "iso8859-6",
+    "8859/7": "iso8859-7",
+    "8859/8": "iso8859-8",
+    "8859/9": "iso8859-9",
+    "8859/15": "iso8859-15",
+    "ISO IR6": "ascii",
+    "ISO IR100": "latin-1",
+    "ISO IR101": "iso8859-2",
+    "ISO IR109": "iso8859-3",
+    "ISO IR110": "iso8859-4",
+    "ISO IR126": "iso8859-7",
+    "ISO IR127": "iso8859-6",
+    "ISO IR138": "iso8859-8",
+    "ISO IR144": "iso8859-5",
+    "ISO IR148": "iso8859-9",
+    "ISO IR192": "utf-8",
+    "ISO IR87": "iso2022_jp",
+    "UNICODE UTF-8": "utf-8",
+    "UNICODE UTF-16": "utf-16",
+    "UNICODE UTF-32": "utf-32",
+    "GB 18030-2000": "gb18030",
+    "KS X 1001": "euc_kr",
+    "BIG-5": "big5",
+}
+# Initial read size when looking for the end of MSH in a memoryview.
+MSH_SCAN_SIZE = 1024
+
 
 def parse_msh(message: str) -> dict:
     """Parse MSH with best-effort defaults."""
@@ -17,6 +63,7 @@ def parse_msh(message: str) -> dict:
         "control_id": "",
         "processing_id": "",
         "version": "",
+        "charset": "",
     }
 
     if not message.startswith("MSH") or len(message) < 4:
@@ -31,6 +78,7 @@ def parse_msh(message: str) -> dict:
         encoding_chars = parts[1]
 
     comp_sep = encoding_chars[0] if encoding_chars else "^"
+    rep_sep = encoding_chars[1] if len(encoding_chars) > 1 else "~"
 
     def get_field(index: int) -> str:
         return parts[index] if len(parts) > index else ""
@@ -61,4 +109,364 @@ def parse_msh(message: str) -> dict:
         "control_id": get_field(9),
         "processing_id": get_field(10),
         "version": get_field(11),
+        "charset": get_field(17).split(rep_sep, 1)[0],
+    }
+
+
+@functools.lru_cache(maxsize=64)
+def is_ascii_compatible(encoding: str) -> bool:
+    sample = "MSH|^~\\&\rACKFASTMLLP0123456789"
+    try:
+        return sample.encode(encoding) == sample.encode("ascii")
+    except (LookupError, UnicodeError):
+        return False
+
+
+def charset_codec(charset: str) -> str | None:
+    """Return the Python codec for an MSH-18 character set, or None if unknown."""
+    return HL7_CHARSETS.get(charset.strip().upper()) if charset else None
+
+
+def first_segment(payload: bytes | bytearray | memoryview) -> bytes:
+    """Return the bytes before the first CR without copying the rest of the payload."""
+    if not isinstance(payload, memoryview):
+        end = payload.find(b"\r")
+        return bytes(payload[:end] if end != -1 else payload)
+    # memoryview has no find(); copy growing prefixes until a CR shows up.
+    limit = MSH_SCAN_SIZE
+    while True:
+        head = payload[:limit].tobytes()
+        end = head.find(b"\r")
+        if end != -1:
+            return head[:end]
+        if limit >= len(payload):
+            return head
+        limit *= 4
+
+
+def parse_msh_bytes(payload: bytes | bytearray | memoryview, encoding: str = "utf-8") -> dict:
+    """Parse MSH from payload bytes, decoding only the MSH segment.
+
+    Returns the same fields as `parse_msh`. When MSH-18 names a known
+    ASCII-compatible character set, the segment is decoded with it instead of
+    `encoding`.
+    """
+    if not is_ascii_compatible(encoding):
+        return parse_msh(str(payload, encoding, "replace"))
+    segment = first_segment(payload)
+    msh = parse_msh(segment.decode(encoding, errors="replace"))
+    codec = charset_codec(msh["charset"])
+    if codec and codec != encoding and is_ascii_compatible(codec):
+        msh = parse_msh(segment.decode(codec, errors="replace"))
+    return msh
+
+
+def decode_message(payload: bytes | bytearray | memoryview, encoding: str = "utf-8") -> str:
+    """Decode a whole payload, using the MSH-18 character set when it is recognised."""
+    codec = charset_codec(parse_msh_bytes(payload, encoding)["charset"]) or encoding
+    return str(payload, codec, "replace")
+
+
+def parse_msa(message: str) -> dict:
+    """Parse the MSA segment of an ACK with best-effort defaults."""
+    result = {
+        "ack_code": "",
+        "control_id": "",
+        "text": "",
     }
+
+    field_sep = parse_msh(message)["field_sep"]
+    for segment in message.split("\r"):
+        segment = segment.strip("\n")
+        if not segment.startswith("MSA"):
+            continue
+        parts = segment.split(field_sep)
+        for index, key in enumerate(("ack_code", "control_id", "text"), start=1):
+            if len(parts) > index:
+                result[key] = parts[index]
+        break
+    return result
+
+
+def trim_envelope(message: bytes) -> bytes:
+    match = ENVELOPE_SEGMENT.search(message)
+    if match is None:
+        return message
+    return message[:match.start()]
+
+
+def iter_messages(stream: BinaryIO, *, chunk_size: int = 65536) -> Iterator[bytes]:
+    """Yield HL7 messages from a stream of concatenated messages.
+
+    Messages are split where an `MSH` segment starts. Bytes before the first
+    MSH and batch envelope segments are skipped; message bytes are otherwise
+    yielded unchanged. Only one message plus one read chunk is held in memory,
+    and the last message is yielded at EOF.
+    """
+    # read1 returns whatever is available, so piped input is not held back.
+    read = getattr(stream, "read1", stream.read)
+    buffer = bytearray()
+    scan = 1
+    eof = False
+    while not eof:
+        chunk = read(chunk_size)
+        if chunk:
+            buffer += chunk
+        else:
+            eof = True
+
+        if not buffer.startswith(b"MSH"):
+            match = MESSAGE_START.search(buffer)
+            if match is None:
+                # Keep a short tail in case a terminator and MSH straddle reads.
+                del buffer[:-3]
+                continue
+            del buffer[:match.start()]
+            scan = 1
+
+        while True:
+            match = MESSAGE_START.search(buffer, scan)
+            if match is None:
+                scan = max(len(buffer) - 3, 1)
+                break
+            yield trim_envelope(bytes(buffer[:match.start()]))
+            del buffer[:match.start()]
+            scan = 1
+
+    if buffer.startswith(b"MSH"):
+        yield trim_envelope(bytes(buffer))
+
+
+# Field paths such as "PID-3", "PID-3.1", "PID-3.1.2" or "OBX(2)-5" (second OBX).
+FIELD_PATH = re.compile(r"([A-Z][A-Z0-9]{2})(?:\((\d+)\))?-(\d+)(?:\.(\d+))?(?:\.(\d+))?")
+
+
+@functools.lru_cache(maxsize=256)
+def parse_field_path(path: str) -> tuple[str, int, int, int | None, int | None]:
+    """Split a field path into (segment, occurrence, field, component, subcomponent)."""
+    match = FIELD_PATH.fullmatch(path)
+    if match is None:
+        raise ValueError(f"invalid field path: {path!r}")
+    name, occurrence, field, component, subcomponent = match.groups()
+    numbers = [int(value) for value in (occurrence or "1", field)]
+    if numbers[0] < 1 or numbers[1] < 1:
+        raise ValueError(f"invalid field path: {path!r}")
+    return (
+        name,
+        numbers[0],
+        numbers[1],
+        int(component) if component else None,
+        int(subcomponent) if subcomponent else None,
+    )
+
+
+class HL7Segment:
+    """One segment of an `HL7Message`, split into fields on first access.
+
+    Fields are numbered as in HL7: `segment[1]` is the first field after the
+    name, and for MSH `segment[1]` is the field separator and `segment[2]` the
+    encoding characters. Values are returned raw, without unescaping; missing
+    fields are "".
+    """
+
+    __slots__ = ("name", "text", "_message", "_fields", "_components")
+
+    def __init__(self, message: "HL7Message", text: str) -> None:
+        self.name = text[:3]
+        self.text = text
+        self._message = message
+        self._fields: list[str] | None = None
+        self._components: dict[int, list[str]] = {}
+
+    def __repr__(self) -> str:
+        return f"HL7Segment({self.text!r})"
+
+    def __str__(self) -> str:
+        return self.text
+
+    def __len__(self) -> int:
+        """Return the number of fields, not counting the segment name."""
+        return len(self.fields()) - 1
+
+    def __getitem__(self, index: int) -> str:
+        return self.field(index)
+
+    def fields(self) -> list[str]:
+        """Return the segment split on the field separator, name first."""
+        if self._fields is None:
+            fields = self.text.split(self._message.field_sep)
+            if self.name == "MSH":
+                # MSH-1 is the separator itself, so MSH-n is the (n-1)th split part.
+                fields.insert(1, self._message.field_sep)
+            self._fields = fields
+        return self._fields
+
+    def field(self, index: int) -> str:
+        """Return field `index` (all repetitions), or "" when absent."""
+        fields = self.fields()
+        return fields[index] if 0 < index < len(fields) else ""
+
+    def repetitions(self, index: int) -> list[str]:
+        """Return the repetitions of field `index`."""
+        value = self.field(index)
+        if self.name == "MSH" and index <= 2:
+            return [value]
+        return value.split(self._message.repetition_sep) if value else []
+
+    def components(self, index: int) -> list[str]:
+        """Return the components of the first repetition of field `index`."""
+        components = self._components.get(index)
+        if components is None:
+            if self.name == "MSH" and index <= 2:
+                components = [self.field(index)]
+            else:
+                repetition = self.field(index).split(self._message.repetition_sep, 1)[0]
+                components = repetition.split(self._message.component_sep)
+            self._components[index] = components
+        return components
+
+    def component(self, index: int, component: int, subcomponent: int | None = None) -> str:
+        """Return a component (and optionally subcomponent) of field `index`, or ""."""
+        components = self.components(index)
+        if not 0 < component <= len(components):
+            return ""
+        value = components[component - 1]
+        if subcomponent is None:
+            return value
+        subcomponents = value.split(self._message.subcomponent_sep)
+        return subcomponents[subcomponent - 1] if 0 < subcomponent <= len(subcomponents) else ""
+
+
+class HL7Message:
+    """An HL7 v2 message indexed by segment, parsed only as far as it is read.
+
+    Segment boundaries are recorded as byte offsets in a single forward scan
+    that only goes as far as the segments asked for, and segments looked up
+    by name are found with a byte search. A segment is decoded and
+    split into fields the first time it is accessed, and a field into
+    components the first time they are read. Separators come from MSH-1 and
+    MSH-2 and the character set from MSH-18, with the same defaults as
+    `parse_msh`.
+
+    `message["PID-3.1"]` returns a field, component or subcomponent value
+    (first repetition, raw) or "" when absent; `"OBX(2)-5"` reads the second
+    OBX. `segments("OBX")` iterates the segments with a given name.
+    """
+
+    __slots__ = (
+        "data",
+        "encoding",
+        "field_sep",
+        "component_sep",
+        "repetition_sep",
+        "escape_char",
+        "subcomponent_sep",
+        "_spans",
+        "_scan",
+        "_segments",
+    )
+
+    def __init__(self, data: bytes | bytearray | memoryview | str, encoding: str = "utf-8") -> None:
+        # Text is re-encoded as UTF-8, since segments are found by byte offset and
+        # need CR to be a single byte; MSH-18 then no longer applies.
+        transcoded = isinstance(data, str) or not is_ascii_compatible(encoding)
+        if isinstance(data, str):
+            data, encoding = data.encode("utf-8"), "utf-8"
+        elif transcoded:
+            data, encoding = str(data, encoding, "replace").encode("utf-8"), "utf-8"
+        else:
+            data = bytes(data)
+        if b"\n" in data:
+            data = data.replace(b"\n", b"\r")
+        msh = parse_msh_bytes(data, encoding)
+        codec = None if transcoded else charset_codec(msh["charset"])
+        self.data = data
+        self.encoding = codec if codec and is_ascii_compatible(codec) else encoding
+        self.field_sep = msh["field_sep"]
+        encoding_chars = msh["encoding_chars"]
+        self.component_sep = encoding_chars[0]
+        self.repetition_sep = encoding_chars[1]
+        self.escape_char = encoding_chars[2]
+        self.subcomponent_sep = encoding_chars[3]
+        # (start, end) of each segment found so far, and where the scan resumes.
+        self._spans: list[tuple[int, int]] = []
+        self._scan = 0
+        # Segments decoded so far, by start offset.
+        self._segments: dict[int, HL7Segment] = {}
+
+    def __repr__(self) -> str:
+        return f"HL7Message({len(self)} segments)"
+
+    def __len__(self) -> int:
+        self._span(sys.maxsize)
+        return len(self._spans)
+
+    def __iter__(self) -> Iterator[HL7Segment]:
+        index = 0
+        while (span := self._span(index)) is not None:
+            yield self._segment(span[0])
+            index += 1
+
+    def __getitem__(self, path: str) -> str:
+        name, occurrence, field, component, subcomponent = parse_field_path(path)
+        segment = self.segment(name, occurrence)
+        if segment is None:
+            return ""
+        if component is None:
+            return segment.field(field)
+        return segment.component(field, component, subcomponent)
+
+    def segment(self, name: str, occurrence: int = 1) -> HL7Segment | None:
+        """Return the `occurrence`th segment named `name` (from 1), or None."""
+        for segment in self.segments(name):
+            occurrence -= 1
+            if not occurrence:
+                return segment
+        return None
+
+    def segments(self, name: str | None = None) -> Iterator[HL7Segment]:
+        """Yield the segments named `name` in order, or all segments."""
+        if name is None:
+            yield from self
+            return
+        # Search the bytes so unrelated segments are never decoded.
+        data = self.data
+        prefix = name.encode("ascii")
+        needle = b"\r" + prefix
+        terminators = (self.field_sep.encode(self.encoding, errors="replace"), b"\r", b"")
+        start = 0 if data.startswith(prefix) else data.find(needle) + 1
+        if not start and not data.startswith(prefix):
+            return
+        while True:
+            after = start + len(prefix)
+            if data[after : after + 1] in terminators:
+                yield self._segment(start)
+            start = data.find(needle, after) + 1
+            if not start:
+                return
+
+    def _span(self, index: int) -> tuple[int, int] | None:
+        """Return the byte span of segment `index`, scanning forward as needed."""
+        spans = self._spans
+        if index < len(spans):
+            return spans[index]
+        data = self.data
+        size = len(data)
+        position = self._scan
+        while len(spans) <= index and position < size:
+            end = data.find(b"\r", position)
+            if end == -1:
+                end = size
+            if end > position:
+                spans.append((position, end))
+            position = end + 1
+        self._scan = position
+        return spans[index] if index < len(spans) else None
+
+    def _segment(self, start: int) -> HL7Segment:
+        segment = self._segments.get(start)
+        if segment is None:
+            end = self.data.find(b"\r", start)
+            text = self.data[start : end if end != -1 else None].decode(self.encoding, "replace")
+            segment = self._segments[start] = HL7Segment(self, text)
+        return segment
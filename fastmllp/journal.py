@@ -0,0 +1,242 @@
+import os
+import struct
+import threading
+import time
+import zlib
+from collections.abc import Iterator
+from pathlib import Path
+from typing import NamedTuple
+
+from .metrics import ServerMetrics
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+SEGMENT_MAGIC = b"FMLLPJ1\n"
+SEGMENT_SUFFIX = ".journal"
+# Each record is a big-endian payload length and CRC-32, then the payload.
+RECORD_HEADER = struct.Struct(">II")
+DEFAULT_SEGMENT_SIZE = 64 * 1024 * 1024
+
+
+class JournalError(OSError):
+    """Raised when the journal cannot make records durable or a record is corrupt."""
+
+
+class JournalRecord(NamedTuple):
+    segment: Path
+    offset: int
+    payload: bytes
+
+
+def segment_paths(directory: str | os.PathLike) -> list[Path]:
+    return sorted(Path(directory).glob(f"*{SEGMENT_SUFFIX}"))
+
+
+class Journal:
+    """Segmented append-only journal with group-committed fsyncs.
+
+    `write` appends a length- and CRC-prefixed record to the current segment
+    and returns its sequence number; `sync` blocks until that record is on
+    disk. Concurrent callers share fsyncs: one caller syncs everything
+    written so far while the others wait, optionally after `commit_window`
+    seconds to let more writes join the batch. Segments rotate once they
+    reach `segment_size` bytes, and each process writes new segments only.
+    """
+
+    def __init__(
+        self,
+        directory: str | os.PathLike,
+        *,
+        segment_size: int = DEFAULT_SEGMENT_SIZE,
+        commit_window: float = 0.0,
+        metrics: ServerMetrics | None = None,
+    ) -> None:
+        if segment_size <= len(SEGMENT_MAGIC):
+            raise ValueError("segment_size is too small")
+        self.directory = Path(directory)
+        self.segment_size = segment_size
+        self.commit_window = commit_window
+        self.metrics = metrics
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock_fd = os.open(self.directory / "LOCK", os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl is not None:
+            try:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(self._lock_fd)
+                raise JournalError(f"journal is in use: {self.directory}") from None
+        existing = segment_paths(self.directory)
+        self._next_index = int(existing[-1].stem) + 1 if existing else 1
+        self._cond = threading.Condition()
+        self._fd = -1
+        self._size = 0
+        self._written = 0
+        self._durable = 0
+        self._syncing = False
+        self._error: OSError | None = None
+        self._open_segment()
+
+    def write(self, payload: bytes) -> int:
+        """Append one record and return its sequence number (not yet durable)."""
+        header = RECORD_HEADER.pack(len(payload), zlib.crc32(payload))
+        with self._cond:
+            self._check()
+            if self._size + len(header) + len(payload) > self.segment_size:
+                self._rotate()
+            write_all(self._fd, header, payload)
+            self._size += len(header) + len(payload)
+            self._written += 1
+            if self.metrics is not None:
+                self.metrics.journal_bytes.inc(len(header) + len(payload))
+            return self._written
+
+    def sync(self, seq: int) -> None:
+        """Block until record `seq` and everything before it is on disk."""
+        with self._cond:
+            while self._durable < seq:
+                self._check()
+                if self._syncing:
+                    self._cond.wait()
+                    continue
+                self._sync_batch()
+
+    def append(self, payload: bytes) -> int:
+        seq = self.write(payload)
+        self.sync(seq)
+        return seq
+
+    def close(self) -> None:
+        with self._cond:
+            while self._syncing:
+                self._cond.wait()
+            if self._fd >= 0:
+                try:
+                    if self._error is None:
+                        os.fsync(self._fd)
+                finally:
+                    os.close(self._fd)
+                    self._fd = -1
+            if self._lock_fd >= 0:
+                os.close(self._lock_fd)
+                self._lock_fd = -1
+
+    def __enter__(self) -> "Journal":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def _sync_batch(self) -> None:
+        # Called with the condition held; the fsync itself runs without it.
+        self._syncing = True
+        try:
+            if self.commit_window > 0:
+                self._cond.wait(self.commit_window)
+            fd = self._fd
+            target = self._written
+            self._cond.release()
+            started = time.perf_counter()
+            try:
+                os.fsync(fd)
+            except OSError as exc:
+                # Data may already be lost from the page cache; never report it durable.
+                self._error = exc
+            finally:
+                self._cond.acquire()
+            if self.metrics is not None:
+                self.metrics.journal_fsyncs.inc()
+                self.metrics.journal_fsync_latency.observe(time.perf_counter() - started)
+            if self._error is None:
+                self._durable = max(self._durable, target)
+        finally:
+            self._syncing = False
+            self._cond.notify_all()
+        self._check()
+
+    def _rotate(self) -> None:
+        while self._syncing:
+            self._cond.wait()
+        self._check()
+        os.fsync(self._fd)
+        os.close(self._fd)
+        self._durable = self._written
+        self._open_segment()
+
+    def _open_segment(self) -> None:
+        path = self.directory / f"{self._next_index:010d}{SEGMENT_SUFFIX}"
+        self._next_index += 1
+        self._fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_APPEND, 0o644)
+        write_all(self._fd, SEGMENT_MAGIC)
+        self._size = len(SEGMENT_MAGIC)
+        # Make the new file's directory entry durable too.
+        if hasattr(os, "O_DIRECTORY"):
+            dir_fd = os.open(self.directory, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+
+    def _check(self) -> None:
+        if self._error is not None:
+            raise JournalError(f"journal fsync failed: {self._error}")
+        if self._fd < 0:
+            raise JournalError("journal is closed")
+
+
+def write_all(fd: int, *chunks: bytes) -> None:
+    data = b"".join(chunks) if len(chunks) > 1 else chunks[0]
+    view = memoryview(data)
+    while view:
+        written = os.write(fd, view)
+        view = view[written:]
+
+
+def iter_segment(
+    path: str | os.PathLike,
+    end: int | None = None,
+    start: int | None = None,
+) -> Iterator[JournalRecord]:
+    """Yield the records of one segment, stopping at a torn record at its end.
+
+    Only the first `end` bytes are read when given, so a segment that is still
+    being written is read as of that size. Reading begins at the record at
+    offset `start`, if given. Raises `JournalError` for a bad segment header or
+    a record whose CRC does not match.
+    """
+    path = Path(path)
+    with open(path, "rb") as handle:
+        if handle.read(len(SEGMENT_MAGIC)) != SEGMENT_MAGIC:
+            raise JournalError(f"not a journal segment: {path}")
+        offset = len(SEGMENT_MAGIC)
+        if start is not None and start > offset:
+            offset = handle.seek(start)
+        while True:
+            if end is not None and offset + RECORD_HEADER.size > end:
+                return
+            header = handle.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                return
+            length, crc = RECORD_HEADER.unpack(header)
+            if end is not None and offset + RECORD_HEADER.size + length > end:
+                return
+            payload = handle.read(length)
+            if len(payload) < length:
+                return
+            if zlib.crc32(payload) != crc:
+                raise JournalError(f"CRC mismatch in {path} at offset {offset}")
+            yield JournalRecord(path, offset, payload)
+            offset += RECORD_HEADER.size + length
+
+
+def iter_journal(directory: str | os.PathLike) -> Iterator[JournalRecord]:
+    """Yield every record in a journal directory, oldest segment first.
+
+    Segments are listed and sized up front, so records appended while reading
+    (for example by a server the journal is replayed into) are not yielded.
+    """
+    segments = [(path, path.stat().st_size) for path in segment_paths(directory)]
+    for path, size in segments:
+        yield from iter_segment(path, size)
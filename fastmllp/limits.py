@@ -0,0 +1,99 @@
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+
+from .hl7 import parse_msh_bytes
+from .metrics import ServerMetrics
+
+LIMIT_KEYS = ("peer", "sender")
+# Buckets kept before the least recently charged ones are forgotten.
+MAX_BUCKETS = 10000
+
+
+def sender_key(payload: bytes | memoryview, encoding: str = "utf-8") -> str:
+    """Return a frame's sending application and facility (MSH-3, MSH-4) as `app/facility`."""
+    msh = parse_msh_bytes(payload, encoding)
+    return f"{msh['sending_app']}/{msh['sending_fac']}"
+
+
+class AdmissionControl:
+    """Token buckets limiting the frames per second accepted from each peer.
+
+    Each key (a source IP, or a sender's MSH-3/MSH-4 with `key="sender"`)
+    refills at `rate` frames per second up to `burst` frames. Frames are
+    charged after they are read and may take a bucket below zero; `admit`
+    then returns how long the connection should wait before handling them,
+    so a busy peer is slowed to `rate` while it keeps its messages. Buckets
+    are shared by all connections from a key, and the least recently
+    charged are forgotten beyond `max_buckets`. Safe to call from any thread.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: float | None = None,
+        *,
+        key: str = "peer",
+        max_buckets: int = MAX_BUCKETS,
+        metrics: ServerMetrics | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if rate <= 0:
+            raise ValueError("limit rate must be positive")
+        if burst is None:
+            burst = max(rate, 1.0)
+        if burst <= 0:
+            raise ValueError("limit burst must be positive")
+        if key not in LIMIT_KEYS:
+            raise ValueError(f"limit key must be one of: {', '.join(LIMIT_KEYS)}")
+        self.rate = rate
+        self.burst = burst
+        self.key = key
+        self.max_buckets = max_buckets
+        self.metrics = metrics
+        self._clock = clock
+        self._lock = threading.Lock()
+        # key -> [tokens, last refill time], least recently charged first.
+        self._buckets: OrderedDict[str, list[float]] = OrderedDict()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._buckets)
+
+    def charge(self, key: str, count: int = 1) -> float:
+        """Take `count` tokens from `key`'s bucket and return the seconds until it is even."""
+        now = self._clock()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self.burst, now]
+                if len(self._buckets) > self.max_buckets:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            bucket[0] -= count
+            tokens = bucket[0]
+        return -tokens / self.rate if tokens < 0 else 0.0
+
+    def admit(self, peer: str, frames: list[bytes], encoding: str = "utf-8") -> tuple[str, float]:
+        """Charge one read's frames and return the key to blame and the seconds to wait.
+
+        With `key="peer"` all frames are charged to `peer`; with "sender" each
+        frame is charged to its sender and the longest wait is returned.
+        """
+        if self.key == "peer":
+            blamed, delay = peer, self.charge(peer, len(frames))
+        else:
+            blamed, delay = peer, 0.0
+            for payload in frames:
+                sender = sender_key(payload, encoding)
+                wait = self.charge(sender)
+                if wait > delay:
+                    blamed, delay = sender, wait
+        if delay > 0 and self.metrics is not None:
+            self.metrics.admission_throttled.inc(blamed)
+            self.metrics.admission_throttle_seconds.inc(blamed, delay)
+        return blamed, delay
@@ -1,4 +1,13 @@
+import atexit
+import datetime as dt
+import itertools
+import json
 import logging as std_logging
+import os
+import queue
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import TextIO
 
 LEVELS = {
     "debug": std_logging.DEBUG,
@@ -7,20 +16,164 @@ LEVELS = {
     "error": std_logging.ERROR,
 }
 
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(message)s"
+
 
 def resolve_level(level: str) -> int:
     return LEVELS.get(level.lower(), std_logging.INFO)
 
 
-def configure_logging(level: str = "info") -> std_logging.Logger:
+class EventMessage:
+    """Log message for one event, formatted only when a handler emits it."""
+
+    __slots__ = ("event", "conn_id", "fields")
+
+    def __init__(self, event: str, conn_id: int | None, fields: dict[str, object]) -> None:
+        self.event = event
+        self.conn_id = conn_id
+        self.fields = fields
+
+    def __str__(self) -> str:
+        parts = [f"event={self.event}"]
+        if self.conn_id is not None:
+            parts.append(f"conn_id={self.conn_id}")
+        for key, value in self.fields.items():
+            parts.append(f"{key}={value}")
+        return " ".join(parts)
+
+    def as_dict(self) -> dict[str, object]:
+        data: dict[str, object] = {"event": self.event}
+        if self.conn_id is not None:
+            data["conn_id"] = self.conn_id
+        data.update(self.fields)
+        return data
+
+
+class JsonFormatter(std_logging.Formatter):
+    """Format records as one JSON object per line."""
+
+    def format(self, record: std_logging.LogRecord) -> str:
+        timestamp = dt.datetime.fromtimestamp(record.created, dt.timezone.utc)
+        data: dict[str, object] = {
+            "ts": timestamp.isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+        }
+        if isinstance(record.msg, EventMessage):
+            data.update(record.msg.as_dict())
+        else:
+            data["message"] = record.getMessage()
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """Queue records unformatted so the listener thread does the formatting."""
+
+    def prepare(self, record: std_logging.LogRecord) -> std_logging.LogRecord:
+        return record
+
+
+class EventLimiter:
+    """Per-event sampling (1 in N) and rate limits (events per second).
+
+    Counters are not locked; under concurrency limits are approximate, which is
+    acceptable for log volume control.
+    """
+
+    def __init__(
+        self,
+        sample: dict[str, int] | None = None,
+        rate_limit: dict[str, float] | None = None,
+    ) -> None:
+        self.sample = dict(sample or {})
+        self.rate_limit = dict(rate_limit or {})
+        self._counters = {event: itertools.count() for event in self.sample}
+        self._windows: dict[str, list[float]] = {
+            event: [0.0, 0.0] for event in self.rate_limit
+        }
+
+    def __bool__(self) -> bool:
+        return bool(self.sample or self.rate_limit)
+
+    def allow(self, event: str) -> bool:
+        every = self.sample.get(event)
+        if every and next(self._counters[event]) % every:
+            return False
+        limit = self.rate_limit.get(event)
+        if limit:
+            window = self._windows[event]
+            second = time.monotonic() // 1
+            if window[0] != second:
+                window[0] = second
+                window[1] = 0.0
+            if window[1] >= limit:
+                return False
+            window[1] += 1
+        return True
+
+
+_limiter = EventLimiter()
+_listener: QueueListener | None = None
+
+
+def stop_queue_listener() -> None:
+    """Flush and stop the background log writer, if one is running."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def _restart_queue_listener() -> None:
+    # Threads do not survive fork, so a forked worker needs its own writer thread.
+    global _listener
+    if _listener is not None:
+        _listener = QueueListener(
+            _listener.queue,
+            *_listener.handlers,
+            respect_handler_level=True,
+        )
+        _listener.start()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_queue_listener)
+
+
+def configure_logging(
+    level: str = "info",
+    *,
+    log_format: str = "text",
+    log_queue: bool = False,
+    log_sample: dict[str, int] | None = None,
+    log_rate_limit: dict[str, float] | None = None,
+    stream: TextIO | None = None,
+) -> std_logging.Logger:
+    """Configure the `fastmllp` logger.
+
+    With `log_queue`, records are handed to a `QueueHandler` and written by a
+    `QueueListener` thread, so connection threads never block on stderr.
+    """
+    global _limiter, _listener
     logger = std_logging.getLogger("fastmllp")
     if not logger.handlers:
-        handler = std_logging.StreamHandler()
-        formatter = std_logging.Formatter("%(asctime)s %(levelname)s %(message)s")
-        handler.setFormatter(formatter)
+        handler = std_logging.StreamHandler(stream)
+        if log_format == "json":
+            handler.setFormatter(JsonFormatter())
+        else:
+            handler.setFormatter(std_logging.Formatter(TEXT_FORMAT))
+        if log_queue:
+            records: queue.SimpleQueue[std_logging.LogRecord] = queue.SimpleQueue()
+            _listener = QueueListener(records, handler, respect_handler_level=True)
+            _listener.start()
+            atexit.register(stop_queue_listener)
+            handler = DeferredQueueHandler(records)
         logger.addHandler(handler)
         logger.propagate = False
     logger.setLevel(resolve_level(level))
+    if log_sample is not None or log_rate_limit is not None:
+        _limiter = EventLimiter(log_sample, log_rate_limit)
     return logger
 
 
@@ -31,9 +184,8 @@ def log_event(
     conn_id: int | None = None,
     **fields: object,
 ) -> None:
-    parts = [f"event={event}"]
-    if conn_id is not None:
-        parts.append(f"conn_id={conn_id}")
-    for key, value in fields.items():
-        parts.append(f"{key}={value}")
-    logger.log(level, " ".join(parts))
+    if not logger.isEnabledFor(level):
+        return
+    if _limiter and not _limiter.allow(event):
+        return
+    logger.log(level, EventMessage(event, conn_id, fields))
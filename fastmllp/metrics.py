@@ -0,0 +1,518 @@
+import bisect
+import threading
+import weakref
+from collections.abc import Iterable
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TypeVar
+
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+# Store-and-forward delivery lag, from seconds up to an hour-long outage.
+LAG_BUCKETS = (0.01, 0.1, 0.5, 1.0, 5.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Distinct label values a `LabeledCounter` tracks before counting the rest as "other".
+MAX_LABEL_VALUES = 1000
+
+MetricT = TypeVar("MetricT", bound="Counter | LabeledCounter | Histogram")
+
+
+class CellOwner:
+    """Thread-local anchor whose finalizer folds a dead thread's cell into the totals."""
+
+    __slots__ = ("__weakref__",)
+
+
+class ShardedCells:
+    """Per-thread value cells that are only summed when read.
+
+    Each thread updates its own list (`local.cell`, created by `new_cell`)
+    without a lock. When the thread exits its cell is folded into a retired
+    total, so thread-per-connection servers do not accumulate cells.
+    """
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self.local = threading.local()
+        self._lock = threading.Lock()
+        self._cells: dict[int, list[float]] = {}
+        self._retired: list[float] = [0] * size
+
+    def totals(self) -> list[float]:
+        with self._lock:
+            totals = list(self._retired)
+            for cell in self._cells.values():
+                for index, value in enumerate(cell):
+                    totals[index] += value
+        return totals
+
+    def new_cell(self) -> list[float]:
+        cell: list[float] = [0] * self.size
+        owner = CellOwner()
+        with self._lock:
+            self._cells[id(cell)] = cell
+        weakref.finalize(owner, self._retire, cell).atexit = False
+        self.local.owner = owner
+        self.local.cell = cell
+        return cell
+
+    def _retire(self, cell: list[float]) -> None:
+        with self._lock:
+            del self._cells[id(cell)]
+            for index, value in enumerate(cell):
+                self._retired[index] += value
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str) -> None:
+        self.name = name
+        self.help_text = help_text
+        self._cells = ShardedCells(1)
+        self._local = self._cells.local
+
+    def inc(self, amount: float = 1) -> None:
+        try:
+            self._local.cell[0] += amount
+        except AttributeError:
+            self._cells.new_cell()[0] += amount
+
+    def value(self) -> float:
+        return self._cells.totals()[0]
+
+    def sample(self) -> float:
+        return self.value()
+
+    def expose(self, sample: float) -> list[str]:
+        return [f"{self.name} {format_value(sample)}"]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1) -> None:
+        self.inc(-amount)
+
+
+class LabeledCounter:
+    """Counter with a value per value of one label, such as a peer address.
+
+    Updates take a lock, so it suits events that are rare next to frames. At
+    most `max_values` label values are kept; later ones are counted as
+    "other", bounding the exposition when many distinct peers are seen.
+    """
+
+    kind = "counter"
+
+    def __init__(
+        self, name: str, help_text: str, label: str, max_values: int = MAX_LABEL_VALUES
+    ) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.max_values = max_values
+        self._values: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_value: str, amount: float = 1) -> None:
+        with self._lock:
+            if label_value not in self._values and len(self._values) >= self.max_values:
+                label_value = "other"
+            self._values[label_value] = self._values.get(label_value, 0) + amount
+
+    def value(self, label_value: str) -> float:
+        with self._lock:
+            return self._values.get(label_value, 0)
+
+    def sample(self) -> dict:
+        with self._lock:
+            return {"labels": dict(self._values)}
+
+    def expose(self, sample: dict) -> list[str]:
+        lines = []
+        for label_value, count in sample["labels"].items():
+            text = escape_label(label_value)
+            lines.append(f'{self.name}{{{self.label}="{text}"}} {format_value(count)}')
+        return lines
+
+
+class Histogram:
+    """Fixed-bucket histogram with Prometheus `le` (less than or equal) buckets."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: tuple[float, ...]) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        # One count per bucket, one for +Inf, then the running sum.
+        self._cells = ShardedCells(len(self.buckets) + 2)
+        self._local = self._cells.local
+
+    def observe(self, value: float) -> None:
+        try:
+            cell = self._local.cell
+        except AttributeError:
+            cell = self._cells.new_cell()
+        cell[bisect.bisect_left(self.buckets, value)] += 1
+        cell[-1] += value
+
+    def sample(self) -> dict:
+        totals = self._cells.totals()
+        counts = totals[:-1]
+        return {
+            "buckets": dict(zip(self.buckets, counts)),
+            "count": sum(counts),
+            "sum": totals[-1],
+        }
+
+    def expose(self, sample: dict) -> list[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in sample["buckets"].items():
+            cumulative += count
+            lines.append(f'{self.name}_bucket{{le="{format_value(bound)}"}} {cumulative:g}')
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {sample["count"]:g}')
+        lines.append(f"{self.name}_sum {format_value(sample['sum'])}")
+        lines.append(f"{self.name}_count {sample['count']:g}")
+        return lines
+
+
+def format_value(value: float) -> str:
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetricsRegistry:
+    """A named collection of counters, gauges and histograms."""
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, Counter | LabeledCounter | Histogram] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self._register(Counter(name, help_text))
+
+    def gauge(self, name: str, help_text: str) -> Gauge:
+        return self._register(Gauge(name, help_text))
+
+    def labeled_counter(self, name: str, help_text: str, label: str) -> LabeledCounter:
+        return self._register(LabeledCounter(name, help_text, label))
+
+    def histogram(self, name: str, help_text: str, buckets: tuple[float, ...]) -> Histogram:
+        return self._register(Histogram(name, help_text, buckets))
+
+    def snapshot(self) -> dict:
+        """Return current values keyed by metric name."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.sample() for metric in metrics}
+
+    def kinds(self) -> dict[str, str]:
+        with self._lock:
+            return {name: metric.kind for name, metric in self._metrics.items()}
+
+    def render(self, snapshot: dict | None = None) -> str:
+        """Return metrics in the Prometheus text exposition format.
+
+        Values come from `snapshot` when given (metrics missing from it are
+        skipped), otherwise from the live metrics.
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            sample = metric.sample() if snapshot is None else snapshot.get(metric.name)
+            if sample is None:
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.expose(sample))
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric: MetricT) -> MetricT:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+
+def merge_snapshots(snapshots: Iterable[dict]) -> dict:
+    """Sum metric snapshots from several registries, such as one per worker process."""
+    merged: dict = {}
+    for snapshot in snapshots:
+        for name, value in snapshot.items():
+            if not isinstance(value, dict):
+                merged[name] = merged.get(name, 0) + value
+                continue
+            if "labels" in value:
+                labels = merged.setdefault(name, {"labels": {}})["labels"]
+                for label_value, count in value["labels"].items():
+                    labels[label_value] = labels.get(label_value, 0) + count
+                continue
+            current = merged.setdefault(name, {"buckets": {}, "count": 0, "sum": 0})
+            for bound, count in value["buckets"].items():
+                current["buckets"][bound] = current["buckets"].get(bound, 0) + count
+            current["count"] += value["count"]
+            current["sum"] += value["sum"]
+    return merged
+
+
+class MetricsAggregator:
+    """Combine snapshots reported by several sources into one view of `registry`.
+
+    The registry's own live values are included, and the counters and
+    histograms of retired sources are kept so totals survive restarts.
+    """
+
+    def __init__(self, registry: MetricsRegistry) -> None:
+        self.registry = registry
+        self._latest: dict[object, dict] = {}
+        self._retired: dict = {}
+        self._lock = threading.Lock()
+
+    def update(self, source: object, snapshot: dict) -> None:
+        with self._lock:
+            self._latest[source] = snapshot
+
+    def retire(self, source: object) -> None:
+        """Fold a source's last snapshot into the totals, dropping its gauges."""
+        kinds = self.registry.kinds()
+        with self._lock:
+            snapshot = self._latest.pop(source, None)
+            if snapshot is None:
+                return
+            kept = {name: value for name, value in snapshot.items() if kinds.get(name) != "gauge"}
+            self._retired = merge_snapshots([self._retired, kept])
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            snapshots = [self._retired, *self._latest.values()]
+        return merge_snapshots([self.registry.snapshot(), *snapshots])
+
+    def render(self) -> str:
+        return self.registry.render(self.snapshot())
+
+
+class ServerMetrics:
+    """Metrics recorded by `serve()` and `serve_async()`."""
+
+    def __init__(self, registry: MetricsRegistry | None = None) -> None:
+        self.registry = registry = registry or MetricsRegistry()
+        self.connections_active = registry.gauge(
+            "fastmllp_connections_active", "Open client connections"
+        )
+        self.connections_total = registry.counter(
+            "fastmllp_connections_total", "Client connections accepted"
+        )
+        self.connections_rejected = registry.counter(
+            "fastmllp_connections_rejected_total", "Connections closed at the connection limit"
+        )
+        self.accept_pauses = registry.counter(
+            "fastmllp_accept_paused_total", "Times accepting paused at the connection limit"
+        )
+        self.frames_received = registry.counter(
+            "fastmllp_frames_received_total", "Complete MLLP frames received"
+        )
+        self.bytes_received = registry.counter(
+            "fastmllp_bytes_received_total", "Bytes read from client sockets"
+        )
+        self.bytes_sent = registry.counter(
+            "fastmllp_bytes_sent_total", "ACK bytes written to clients"
+        )
+        self.ack_writes = registry.counter(
+            "fastmllp_ack_writes_total", "Socket writes carrying one or more ACKs"
+        )
+        self.frames_too_large = registry.counter(
+            "fastmllp_frames_too_large_total", "Connections dropped for oversized frames"
+        )
+        self.ack_build_errors = registry.counter(
+            "fastmllp_ack_build_errors_total", "ACKs built without MSH after a build error"
+        )
+        self.handler_errors = registry.counter(
+            "fastmllp_handler_errors_total", "Handler failures answered with AE"
+        )
+        self.dedupe_hits = registry.counter(
+            "fastmllp_dedupe_hits_total", "Duplicate messages re-ACKed without handling"
+        )
+        self.dedupe_misses = registry.counter(
+            "fastmllp_dedupe_misses_total", "Messages not found in the dedupe cache"
+        )
+        self.dedupe_entries = registry.gauge(
+            "fastmllp_dedupe_entries", "Message keys held in the dedupe cache"
+        )
+        self.tls_handshakes = registry.counter(
+            "fastmllp_tls_handshakes_total", "Completed TLS handshakes"
+        )
+        self.tls_resumed = registry.counter(
+            "fastmllp_tls_resumed_total", "TLS handshakes that resumed an earlier session"
+        )
+        self.tls_handshake_errors = registry.counter(
+            "fastmllp_tls_handshake_errors_total", "TLS handshakes that failed or timed out"
+        )
+        self.tls_reloads = registry.counter(
+            "fastmllp_tls_reloads_total", "Certificate chains reloaded after their files changed"
+        )
+        self.journal_bytes = registry.counter(
+            "fastmllp_journal_bytes_total", "Record bytes appended to the journal"
+        )
+        self.journal_fsyncs = registry.counter(
+            "fastmllp_journal_fsyncs_total", "Journal fsyncs, each committing a batch of frames"
+        )
+        self.journal_fsync_latency = registry.histogram(
+            "fastmllp_journal_fsync_seconds", "Time spent in journal fsyncs", LATENCY_BUCKETS
+        )
+        self.capture_frames = registry.counter(
+            "fastmllp_capture_frames_total", "Frames written to capture segments"
+        )
+        self.capture_bytes = registry.counter(
+            "fastmllp_capture_bytes_total", "Payload bytes written to capture segments"
+        )
+        self.capture_dropped = registry.counter(
+            "fastmllp_capture_dropped_total", "Frames not captured because the writer fell behind"
+        )
+        self.capture_segments = registry.counter(
+            "fastmllp_capture_segments_total", "Capture segments closed"
+        )
+        self.proxy_forwarded = registry.counter(
+            "fastmllp_proxy_forwarded_total", "Frames forwarded and ACKed by an upstream"
+        )
+        self.proxy_errors = registry.counter(
+            "fastmllp_proxy_errors_total", "Forwarded frames that failed or timed out upstream"
+        )
+        self.proxy_upstream_nacks = registry.counter(
+            "fastmllp_proxy_upstream_nacks_total", "Upstream ACKs with a code other than AA or CA"
+        )
+        self.proxy_in_flight = registry.gauge(
+            "fastmllp_proxy_in_flight", "Forwarded frames awaiting an upstream ACK"
+        )
+        self.proxy_latency = registry.histogram(
+            "fastmllp_proxy_upstream_latency_seconds",
+            "Time from forwarding a frame to its upstream ACK",
+            LATENCY_BUCKETS,
+        )
+        self.admission_throttled = registry.labeled_counter(
+            "fastmllp_admission_throttled_total",
+            "Reads delayed because the peer's token bucket was empty",
+            "peer",
+        )
+        self.admission_throttle_seconds = registry.labeled_counter(
+            "fastmllp_admission_throttle_seconds_total",
+            "Seconds reads were delayed by admission control",
+            "peer",
+        )
+        self.ack_latency = registry.histogram(
+            "fastmllp_ack_latency_seconds",
+            "Time from a complete frame to its ACK being written",
+            LATENCY_BUCKETS,
+        )
+        self.frame_size = registry.histogram(
+            "fastmllp_frame_size_bytes", "Received frame payload sizes", SIZE_BUCKETS
+        )
+
+    def snapshot(self) -> dict:
+        return self.registry.snapshot()
+
+
+class ClientMetrics:
+    """Metrics recorded by `MLLPClient` connections."""
+
+    def __init__(self, registry: MetricsRegistry | None = None) -> None:
+        self.registry = registry = registry or MetricsRegistry()
+        self.connections_opened = registry.counter(
+            "fastmllp_client_connections_opened_total", "Connections opened to peers"
+        )
+        self.messages_sent = registry.counter(
+            "fastmllp_client_messages_sent_total", "Frames written to peers"
+        )
+        self.acks_received = registry.counter(
+            "fastmllp_client_acks_received_total", "ACK frames received from peers"
+        )
+        self.bytes_sent = registry.counter(
+            "fastmllp_client_bytes_sent_total", "Bytes written to peer sockets"
+        )
+        self.bytes_received = registry.counter(
+            "fastmllp_client_bytes_received_total", "Bytes read from peer sockets"
+        )
+        self.tls_handshakes = registry.counter(
+            "fastmllp_client_tls_handshakes_total", "Completed TLS handshakes with peers"
+        )
+        self.tls_resumed = registry.counter(
+            "fastmllp_client_tls_resumed_total", "TLS handshakes that resumed a saved session"
+        )
+        self.ack_latency = registry.histogram(
+            "fastmllp_client_ack_latency_seconds",
+            "Time from writing a frame to reading its ACK",
+            LATENCY_BUCKETS,
+        )
+        self.spool_depth = registry.gauge(
+            "fastmllp_spool_depth", "Spooled messages not yet acknowledged by the peer"
+        )
+        self.spool_delivered = registry.counter(
+            "fastmllp_spool_delivered_total", "Spooled messages acknowledged by the peer"
+        )
+        self.spool_retries = registry.counter(
+            "fastmllp_spool_retries_total", "Spool delivery attempts that failed and backed off"
+        )
+        self.spool_lag = registry.histogram(
+            "fastmllp_spool_delivery_lag_seconds",
+            "Time from spooling a message to its ACK",
+            LAG_BUCKETS,
+        )
+
+    def snapshot(self) -> dict:
+        return self.registry.snapshot()
+
+
+def start_metrics_server(
+    registry: MetricsRegistry | MetricsAggregator,
+    host: str,
+    port: int,
+) -> ThreadingHTTPServer:
+    """Serve `registry` at `/metrics` from a daemon thread and return the HTTP server."""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: object) -> None:
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
@@ -1,11 +1,72 @@
+import array
+import itertools
+import mmap
+import os
+import socket
+import ssl
+import struct
+import sys
+from collections.abc import Iterable, Iterator, Sequence
+
+from .hl7 import ENVELOPE_SEGMENT, MESSAGE_START
+
 START_BLOCK = b"\x0b"
 END_BLOCK = b"\x1c"
 CARRIAGE_RETURN = b"\x0d"
+FRAME_END = END_BLOCK + CARRIAGE_RETURN
+VT = START_BLOCK[0]
+
+# Most buffers a single sendmsg accepts.
+try:
+    IOV_MAX = max(os.sysconf("SC_IOV_MAX"), 16)
+except (AttributeError, ValueError, OSError):  # pragma: no cover - platform dependent
+    IOV_MAX = 1024
+
+# Frame index files: magic, format version, indexed file size and mtime, frame count,
+# then a little-endian (start, end) uint64 pair per frame.
+INDEX_MAGIC = b"FMIX"
+INDEX_HEADER = struct.Struct("<4sH2xQQQ")
+INDEX_SUFFIX = ".idx"
 
 
 def frame(message: bytes) -> bytes:
     """Wrap payload bytes in MLLP framing."""
-    return START_BLOCK + message + END_BLOCK + CARRIAGE_RETURN
+    return START_BLOCK + message + FRAME_END
+
+
+def frame_buffers(payloads: Iterable[bytes]) -> list[bytes]:
+    """Return the framing and payload buffers of `payloads` for one gathered write."""
+    buffers: list[bytes] = []
+    for payload in payloads:
+        buffers += (START_BLOCK, payload, FRAME_END)
+    return buffers
+
+
+def send_buffers(sock: socket.socket, buffers: list[bytes]) -> int:
+    """Write `buffers` in order with as few `sendmsg` calls as possible.
+
+    Buffers are passed to the kernel as a scatter-gather list, so frames are
+    not concatenated first. Returns the number of bytes written. Sockets
+    without `sendmsg`, including TLS sockets, get a single `sendall` of the
+    joined buffers, which TLS encrypts as one record stream anyway.
+    """
+    buffers = [buffer for buffer in buffers if buffer]
+    total = sum(map(len, buffers))
+    if isinstance(sock, ssl.SSLSocket) or not hasattr(sock, "sendmsg"):
+        sock.sendall(b"".join(buffers))
+        return total
+    index = 0
+    while index < len(buffers):
+        sent = sock.sendmsg(buffers[index : index + IOV_MAX])
+        # Skip the buffers written in full and resume inside a partly written one.
+        while sent:
+            size = len(buffers[index])
+            if sent < size:
+                buffers[index] = memoryview(buffers[index])[sent:]
+                break
+            sent -= size
+            index += 1
+    return total
 
 
 def unframe_stream(buffer: bytes) -> tuple[list[bytes], bytes]:
@@ -48,3 +109,281 @@ def unframe_stream(buffer: bytes) -> tuple[list[bytes], bytes]:
             buffer = buffer[start:]
 
     return frames, b""
+
+
+class FrameTooLargeError(ValueError):
+    """Raised when a frame payload exceeds the decoder's `max_size`."""
+
+    def __init__(self, length: int) -> None:
+        super().__init__(f"frame payload of {length} bytes exceeds max_size")
+        self.length = length
+
+
+class MLLPDecoder:
+    """Incremental MLLP frame decoder.
+
+    Bytes are appended to an internal `bytearray` and the search for the end
+    block resumes where the previous `feed` stopped, so a frame that arrives in
+    many small chunks is scanned and copied once. Framing rules match
+    `unframe_stream`.
+    """
+
+    def __init__(self, max_size: int | None = None) -> None:
+        self.max_size = max_size
+        self._buffer = bytearray()
+        self._scan = 1
+
+    def feed(self, data: bytes | bytearray | memoryview) -> Iterator[bytes]:
+        """Buffer `data` and return an iterator over the frames it completes.
+
+        Raises `FrameTooLargeError` from the iterator once a complete or
+        partial frame payload exceeds `max_size`; frames before it are still
+        yielded first.
+        """
+        self._buffer += data
+        return self._drain()
+
+    def pending(self) -> int:
+        """Return the number of buffered bytes not yet returned as frames."""
+        return len(self._buffer)
+
+    def _drain(self) -> Iterator[bytes]:
+        buffer = self._buffer
+        while buffer:
+            if buffer[0] != VT:
+                start = buffer.find(START_BLOCK)
+                if start == -1:
+                    buffer.clear()
+                    self._scan = 1
+                    return
+                del buffer[:start]
+                self._scan = 1
+
+            end = buffer.find(END_BLOCK, self._scan)
+            if end == -1:
+                self._scan = len(buffer)
+                self._check_size(len(buffer) - 1)
+                return
+
+            self._check_size(end - 1)
+            with memoryview(buffer) as view:
+                payload = view[1:end].tobytes()
+            next_index = end + 1
+            if buffer[next_index:next_index + 1] == CARRIAGE_RETURN:
+                next_index += 1
+            # Deleting from the front of a bytearray only advances its start.
+            del buffer[:next_index]
+            self._scan = 1
+            yield payload
+
+    def _check_size(self, length: int) -> None:
+        if self.max_size is not None and length > self.max_size:
+            self._buffer.clear()
+            self._scan = 1
+            raise FrameTooLargeError(length)
+
+
+def detect_framing(data: bytes | mmap.mmap, *, probe: int = 65536) -> str:
+    """Return "mllp" if a start block precedes the first MSH in `data`, else "raw"."""
+    head = data[:probe]
+    start = head.find(START_BLOCK)
+    msh = head.find(b"MSH")
+    if start != -1 and (msh == -1 or start < msh):
+        return "mllp"
+    return "raw"
+
+
+def frame_spans(data: bytes | mmap.mmap, framing: str = "auto") -> Iterator[tuple[int, int]]:
+    """Yield the (start, end) offsets of each message in `data`.
+
+    MLLP frames follow `unframe_stream`: bytes outside frames are skipped and
+    a trailing frame without an end block is dropped. Raw input is split on
+    MSH segments like `hl7.iter_messages`, without batch envelope segments.
+    """
+    if framing == "auto":
+        framing = detect_framing(data)
+    if framing == "mllp":
+        position = data.find(START_BLOCK)
+        while position != -1:
+            end = data.find(END_BLOCK, position + 1)
+            if end == -1:
+                return
+            yield position + 1, end
+            position = data.find(START_BLOCK, end + 1)
+        return
+    if framing != "raw":
+        raise ValueError(f"unknown framing: {framing!r}")
+
+    starts = (match.start() for match in MESSAGE_START.finditer(data))
+    if data[:3] == b"MSH":
+        starts = itertools.chain((0,), starts)
+    start = next(starts, None)
+    while start is not None:
+        following = next(starts, None)
+        end = len(data) if following is None else following
+        envelope = ENVELOPE_SEGMENT.search(data, start, end)
+        yield start, end if envelope is None else envelope.start()
+        start = following
+
+
+class FrameFile:
+    """Messages in an MLLP capture or concatenated HL7 file, read through `mmap`.
+
+    Frames are returned as `memoryview` slices of the mapping, so the file is
+    never copied into memory; copy a frame with `bytes()` to keep it after
+    `close`. `framing` is "mllp", "raw" (MSH-delimited) or "auto" to decide
+    from the start of the file.
+
+    Iterating scans the file once. `len()`, indexing and `frames(start, stop)`
+    use an offset index instead: with `index=True` it is kept next to the
+    file in `<path>.idx` (or `index_path`), reused while the file's size and
+    mtime match, and otherwise rebuilt. Processes can then each take a slice
+    of a large file without scanning the rest.
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike,
+        *,
+        framing: str = "auto",
+        index: bool = False,
+        index_path: str | os.PathLike | None = None,
+    ) -> None:
+        if framing not in ("auto", "mllp", "raw"):
+            raise ValueError(f"unknown framing: {framing!r}")
+        self.path = os.fspath(path)
+        self.index_path = os.fspath(index_path) if index_path else self.path + INDEX_SUFFIX
+        self.persist_index = index
+        with open(self.path, "rb") as handle:
+            stat = os.fstat(handle.fileno())
+            self._stamp = (stat.st_size, stat.st_mtime_ns)
+            # mmap cannot map an empty file.
+            self._map = (
+                mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) if stat.st_size else b""
+            )
+        self.framing = detect_framing(self._map) if framing == "auto" else framing
+        self._offsets: Sequence[int] | None = None
+        self._index_map: mmap.mmap | None = None
+
+    def __enter__(self) -> "FrameFile":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def __iter__(self) -> Iterator[memoryview]:
+        if self._offsets is not None:
+            return self.frames()
+        return self._scan()
+
+    def __len__(self) -> int:
+        return len(self.offsets) // 2
+
+    def __getitem__(self, position: int) -> memoryview:
+        offsets = self.offsets
+        count = len(offsets) // 2
+        if position < 0:
+            position += count
+        if not 0 <= position < count:
+            raise IndexError("frame index out of range")
+        return memoryview(self._map)[offsets[2 * position] : offsets[2 * position + 1]]
+
+    def _scan(self) -> Iterator[memoryview]:
+        view = memoryview(self._map)
+        for start, end in frame_spans(self._map, self.framing):
+            yield view[start:end]
+
+    def frames(self, start: int = 0, stop: int | None = None) -> Iterator[memoryview]:
+        """Yield frames `start` to `stop` (exclusive) using the offset index."""
+        offsets = self.offsets
+        view = memoryview(self._map)
+        for position in range(*slice(start, stop).indices(len(offsets) // 2)):
+            yield view[offsets[2 * position] : offsets[2 * position + 1]]
+
+    @property
+    def offsets(self) -> Sequence[int]:
+        """Flat (start, end) payload offsets of every frame, built on first use."""
+        if self._offsets is None:
+            if self.persist_index:
+                self._offsets = self._load_index()
+            if self._offsets is None:
+                self._offsets = self._build_index()
+        return self._offsets
+
+    def _build_index(self) -> array.array:
+        offsets = array.array("Q")
+        for span in frame_spans(self._map, self.framing):
+            offsets.extend(span)
+        if self.persist_index:
+            self._write_index(offsets)
+        return offsets
+
+    def _write_index(self, offsets: array.array) -> None:
+        header = INDEX_HEADER.pack(INDEX_MAGIC, 1, *self._stamp, len(offsets) // 2)
+        if sys.byteorder != "little":  # pragma: no cover - big-endian hosts
+            offsets = array.array("Q", offsets)
+            offsets.byteswap()
+        temporary = f"{self.index_path}.tmp{os.getpid()}"
+        with open(temporary, "wb") as handle:
+            handle.write(header)
+            offsets.tofile(handle)
+        os.replace(temporary, self.index_path)
+
+    def _load_index(self) -> Sequence[int] | None:
+        """Map a current index file, or return None if it is missing or stale."""
+        try:
+            handle = open(self.index_path, "rb")
+        except FileNotFoundError:
+            return None
+        with handle:
+            size = os.fstat(handle.fileno()).st_size
+            if size < INDEX_HEADER.size:
+                return None
+            magic, version, *stamp, count = INDEX_HEADER.unpack(handle.read(INDEX_HEADER.size))
+            expected = INDEX_HEADER.size + 16 * count
+            if (magic, version, tuple(stamp), size) != (INDEX_MAGIC, 1, self._stamp, expected):
+                return None
+            if not count:
+                return array.array("Q")
+            if sys.byteorder != "little":  # pragma: no cover - big-endian hosts
+                offsets = array.array("Q")
+                offsets.fromfile(handle, 2 * count)
+                offsets.byteswap()
+                return offsets
+            self._index_map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(self._index_map)[INDEX_HEADER.size :].cast("Q")
+
+    def close(self) -> None:
+        """Unmap the file; frames still referenced keep their mapping until freed."""
+        if isinstance(self._offsets, memoryview):
+            self._offsets.release()
+        self._offsets = None
+        for mapping in (self._map, self._index_map):
+            if isinstance(mapping, mmap.mmap):
+                try:
+                    mapping.close()
+                except BufferError:
+                    pass
+
+
+def iter_frames(
+    path: str | os.PathLike,
+    start: int = 0,
+    stop: int | None = None,
+    *,
+    framing: str = "auto",
+    index: bool = False,
+) -> Iterator[memoryview]:
+    """Yield frames `start` to `stop` of a capture or HL7 file as `memoryview` slices.
+
+    See `FrameFile`. With `index=True`, the persisted offset index is used,
+    so skipping to `start` does not scan the frames before it.
+    """
+    frame_file = FrameFile(path, framing=framing, index=index)
+    try:
+        if index:
+            yield from frame_file.frames(start, stop)
+        else:
+            yield from itertools.islice(frame_file, start, stop)
+    finally:
+        frame_file.close()
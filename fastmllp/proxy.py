@@ -0,0 +1,344 @@
+import asyncio
+import collections
+import logging as std_logging
+import socket
+import threading
+import time
+from concurrent.futures import Future
+
+from .hl7 import parse_msa, parse_msh_bytes
+from .logging import log_event
+from .metrics import ServerMetrics
+from .mllp import MLLPDecoder, frame_buffers, send_buffers
+from .server import serve, serve_async
+
+ACK_MODES = ("local", "relay")
+# How long an upstream whose connect failed is skipped before it is tried again.
+RETRY_INTERVAL = 1.0
+
+SenderKey = tuple[str, str]
+
+
+class UpstreamConnection:
+    """One persistent upstream socket carrying pipelined frames.
+
+    Senders write frames under a lock and a reader thread matches ACKs to
+    them in order, as MLLP returns them, resolving each frame's future with
+    its ACK payload. A failed socket fails the futures of every frame still
+    awaiting an ACK on it and is reopened by the next send.
+    """
+
+    def __init__(self, upstream: "Upstream") -> None:
+        self.upstream = upstream
+        self.sock: socket.socket | None = None
+        # Futures and send times of the frames awaiting an ACK, oldest first.
+        self.pending: collections.deque[tuple[Future, float]] = collections.deque()
+        self.lock = threading.Lock()
+
+    def send(self, payload: bytes, future: Future) -> None:
+        """Write one frame; raises `OSError` only when the connection cannot be opened."""
+        with self.lock:
+            sock = self.sock
+            if sock is None:
+                sock = self.sock = self.upstream.connect()
+                threading.Thread(
+                    target=self.read, args=(sock,), name="fastmllp-upstream", daemon=True
+                ).start()
+            self.pending.append((future, time.monotonic()))
+            try:
+                send_buffers(sock, frame_buffers([payload]))
+                return
+            except OSError as exc:
+                error = exc
+        self.fail(sock, error)
+
+    def read(self, sock: socket.socket) -> None:
+        decoder = MLLPDecoder()
+        timeout = self.upstream.timeout
+        while True:
+            try:
+                chunk = sock.recv(65536)
+            except TimeoutError:
+                with self.lock:
+                    if self.sock is not sock:
+                        return
+                    if not self.pending or time.monotonic() - self.pending[0][1] < timeout:
+                        continue
+                self.fail(sock, TimeoutError("upstream ACK timed out"))
+                return
+            except OSError as exc:
+                self.fail(sock, exc)
+                return
+            if not chunk:
+                self.fail(sock, ConnectionError("upstream closed the connection"))
+                return
+            for ack in decoder.feed(chunk):
+                with self.lock:
+                    if not self.pending:
+                        continue
+                    future, _ = self.pending.popleft()
+                future.set_result(ack)
+
+    def fail(self, sock: socket.socket, exc: Exception) -> None:
+        with self.lock:
+            if self.sock is not sock:
+                return
+            self.sock = None
+            pending, self.pending = self.pending, collections.deque()
+        try:
+            # Shutting down wakes the reader thread if it is still waiting in recv.
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        sock.close()
+        for future, _ in pending:
+            future.set_exception(exc)
+
+    def close(self) -> None:
+        sock = self.sock
+        if sock is not None:
+            self.fail(sock, ConnectionError("proxy is closing"))
+
+
+class Upstream:
+    """An upstream destination with a fixed set of persistent connections."""
+
+    def __init__(
+        self, host: str, port: int, *, connections: int, max_in_flight: int, timeout: float
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.in_flight = 0
+        self.retry_at = 0.0
+        self.connections = [UpstreamConnection(self) for _ in range(connections)]
+
+    @property
+    def address(self) -> str:
+        return f"{self.host}:{self.port}"
+
+    def connect(self) -> socket.socket:
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        # Frames from many downstream connections are written one by one; Nagle would
+        # hold each behind the ACK for the one before.
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+
+    def least_loaded(self) -> UpstreamConnection:
+        return min(self.connections, key=lambda connection: len(connection.pending))
+
+
+class ForwardingPool:
+    """Forward frames over a bounded pool of pipelined upstream connections.
+
+    Each of `upstreams` gets `connections` persistent connections and at most
+    `max_in_flight` frames awaiting ACKs. A frame goes to the upstream with
+    the fewest frames in flight, skipping upstreams at their limit or whose
+    last connect failed within `RETRY_INTERVAL` seconds; when none can take
+    it, `submit` waits up to `timeout` seconds for one. While frames from a
+    sending application and facility (MSH-3, MSH-4) are in flight, later ones
+    follow them on the same connection, so each sender's order is kept.
+    """
+
+    def __init__(
+        self,
+        upstreams: list[tuple[str, int]],
+        *,
+        connections: int = 2,
+        max_in_flight: int = 64,
+        timeout: float = 10.0,
+        encoding: str = "utf-8",
+        metrics: ServerMetrics | None = None,
+    ) -> None:
+        if not upstreams:
+            raise ValueError("at least one upstream is required")
+        if connections <= 0 or max_in_flight <= 0:
+            raise ValueError("connections and max_in_flight must be positive")
+        self.upstreams = [
+            Upstream(
+                host,
+                port,
+                connections=connections,
+                max_in_flight=max_in_flight,
+                timeout=timeout,
+            )
+            for host, port in upstreams
+        ]
+        self.timeout = timeout
+        self.encoding = encoding
+        self.metrics = metrics or ServerMetrics()
+        self._logger = std_logging.getLogger("fastmllp")
+        self._cond = threading.Condition()
+        self._next = 0
+        # Sender -> [connection carrying its frames, frames in flight].
+        self._affinity: dict[SenderKey, list] = {}
+
+    def submit(self, payload: bytes) -> Future:
+        """Send `payload` upstream and return a future resolved with its ACK payload.
+
+        Raises `TimeoutError` when no upstream can take the frame within
+        `timeout` seconds, or `ConnectionError` when none can be connected.
+        """
+        msh = parse_msh_bytes(payload, self.encoding)
+        key = (msh["sending_app"], msh["sending_fac"])
+        deadline = time.monotonic() + self.timeout
+        while True:
+            connection = self._acquire(key, deadline)
+            upstream = connection.upstream
+            future: Future = Future()
+            started = time.perf_counter()
+            try:
+                connection.send(payload, future)
+            except OSError as exc:
+                upstream.retry_at = time.monotonic() + RETRY_INTERVAL
+                self._release(connection, key)
+                log_event(
+                    self._logger,
+                    std_logging.WARNING,
+                    "upstream_connect_error",
+                    upstream=upstream.address,
+                    error=str(exc),
+                )
+                continue
+            future.add_done_callback(
+                lambda done: self._finish(connection, key, done, started)
+            )
+            return future
+
+    def relay(self, payload: bytes) -> bytes:
+        """Message handler for relay mode: return the upstream's ACK message."""
+        return self.submit(payload).result(self.timeout)
+
+    def forward(self, payload: bytes) -> None:
+        """Message handler for local mode: ACK AA once the frame is written upstream."""
+        self.submit(payload)
+
+    def close(self) -> None:
+        for upstream in self.upstreams:
+            for connection in upstream.connections:
+                connection.close()
+
+    def _acquire(self, key: SenderKey, deadline: float) -> UpstreamConnection:
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                entry = self._affinity.get(key)
+                if entry is not None:
+                    upstream = entry[0].upstream
+                    if upstream.in_flight < upstream.max_in_flight:
+                        entry[1] += 1
+                        upstream.in_flight += 1
+                        self.metrics.proxy_in_flight.inc()
+                        return entry[0]
+                else:
+                    upstream = self._choose(now)
+                    if upstream is not None:
+                        connection = upstream.least_loaded()
+                        self._affinity[key] = [connection, 1]
+                        upstream.in_flight += 1
+                        self.metrics.proxy_in_flight.inc()
+                        return connection
+                if now >= deadline:
+                    if all(upstream.retry_at > now for upstream in self.upstreams):
+                        raise ConnectionError("no upstream is reachable")
+                    raise TimeoutError("upstreams are at their in-flight limit")
+                retry_at = min(upstream.retry_at for upstream in self.upstreams)
+                wake = min(retry_at, deadline) if retry_at > now else deadline
+                self._cond.wait(wake - now)
+
+    def _choose(self, now: float) -> Upstream | None:
+        count = len(self.upstreams)
+        best = None
+        for offset in range(count):
+            # Rotating the starting point spreads ties across upstreams.
+            upstream = self.upstreams[(self._next + offset) % count]
+            if upstream.retry_at > now or upstream.in_flight >= upstream.max_in_flight:
+                continue
+            if best is None or upstream.in_flight < best.in_flight:
+                best = upstream
+        self._next += 1
+        return best
+
+    def _release(self, connection: UpstreamConnection, key: SenderKey) -> None:
+        with self._cond:
+            connection.upstream.in_flight -= 1
+            entry = self._affinity[key]
+            entry[1] -= 1
+            if not entry[1]:
+                del self._affinity[key]
+            self._cond.notify_all()
+        self.metrics.proxy_in_flight.dec()
+
+    def _finish(
+        self, connection: UpstreamConnection, key: SenderKey, future: Future, started: float
+    ) -> None:
+        self._release(connection, key)
+        exc = future.exception()
+        if exc is not None:
+            self.metrics.proxy_errors.inc()
+            log_event(
+                self._logger,
+                std_logging.WARNING,
+                "upstream_error",
+                upstream=connection.upstream.address,
+                error=str(exc),
+            )
+            return
+        self.metrics.proxy_forwarded.inc()
+        self.metrics.proxy_latency.observe(time.perf_counter() - started)
+        msa = parse_msa(future.result().decode(self.encoding, errors="replace"))
+        if msa["ack_code"] not in ("AA", "CA"):
+            self.metrics.proxy_upstream_nacks.inc()
+
+
+def serve_proxy(
+    host: str,
+    port: int,
+    upstreams: list[tuple[str, int]],
+    *,
+    ack_mode: str = "relay",
+    upstream_connections: int = 2,
+    upstream_in_flight: int = 64,
+    engine: str = "threaded",
+    metrics: ServerMetrics | None = None,
+    **options,
+) -> None:
+    """Accept MLLP like `serve` and forward every frame through a `ForwardingPool`.
+
+    With `ack_mode` "relay" each frame is ACKed with its upstream ACK; with
+    "local" it is ACKed AA (built by `AckBuilder`) as soon as it is written
+    upstream, and frames that then fail upstream are logged and counted, not
+    retried. Frames the pool cannot take within `timeout` are ACKed AE. Each
+    downstream connection forwards one frame at a time, so its order is kept;
+    upstream pipelining comes from many connections sharing the pool. Other
+    `options` go to `serve` or `serve_async`, chosen by `engine`.
+    """
+    if ack_mode not in ACK_MODES:
+        raise ValueError(f"ack_mode must be one of: {', '.join(ACK_MODES)}")
+    metrics = metrics or ServerMetrics()
+    pool = ForwardingPool(
+        upstreams,
+        connections=upstream_connections,
+        max_in_flight=upstream_in_flight,
+        timeout=options.get("timeout", 10.0),
+        encoding=options.get("encoding", "utf-8"),
+        metrics=metrics,
+    )
+    options["handler"] = pool.relay if ack_mode == "relay" else pool.forward
+    if engine == "asyncio":
+        # Forwarding blocks, so it runs on threads rather than the event loop.
+        options.update(
+            handler_mode="thread",
+            handler_workers=len(upstreams) * upstream_in_flight,
+            max_in_flight=1,
+        )
+    else:
+        options["handler_mode"] = "inline"
+    try:
+        if engine == "asyncio":
+            asyncio.run(serve_async(host, port, metrics=metrics, **options))
+        else:
+            serve(host, port, metrics=metrics, **options)
+    finally:
+        pool.close()
@@ -0,0 +1,328 @@
+import collections
+import queue
+import socket
+import ssl
+import threading
+import time
+from collections.abc import Iterable
+
+from .bench import Histogram, latency_summary
+from .capture import CaptureRecord
+from .hl7 import parse_msa
+from .mllp import MLLPDecoder, frame_buffers, send_buffers
+
+# Scheduled messages buffered per connection ahead of their send time.
+LANE_QUEUE_SIZE = 1024
+# How often a connection with ACKs outstanding checks for newly scheduled messages.
+POLL_INTERVAL = 0.001
+
+
+def parse_speed(value: str) -> float:
+    """Parse a replay speed such as `1`, `10x` or `max` (returned as 0)."""
+    text = value.strip().lower()
+    if text == "max":
+        return 0.0
+    try:
+        speed = float(text.removesuffix("x"))
+    except ValueError:
+        raise ValueError(f"invalid replay speed: {value!r}") from None
+    if speed <= 0:
+        raise ValueError("replay speed must be positive")
+    return speed
+
+
+class ReplayLane(threading.Thread):
+    """Send scheduled messages in order over one connection, `window` in flight.
+
+    Messages arrive on `queue` as (send offset, payload) pairs, with None to
+    finish. ACKs are matched to messages in order, as MLLP returns them. A
+    failed connection counts its outstanding messages as errors and is
+    reopened for the next message; messages due while it cannot be reopened
+    are counted as errors without being sent.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        *,
+        window: int,
+        timeout: float,
+        encoding: str,
+        paced: bool,
+        ssl_context: ssl.SSLContext | None = None,
+        server_hostname: str | None = None,
+    ) -> None:
+        super().__init__(daemon=True)
+        self.host = host
+        self.port = port
+        self.window = window
+        self.timeout = timeout
+        self.encoding = encoding
+        self.paced = paced
+        self.ssl_context = ssl_context
+        self.server_hostname = server_hostname or host
+        self.queue: queue.Queue[tuple[float, bytes] | None] = queue.Queue(LANE_QUEUE_SIZE)
+        self.start_time = 0.0
+        self.histogram = Histogram()
+        self.lag = Histogram()
+        self.sent = 0
+        self.acked = 0
+        self.nacks = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.last_send = 0.0
+        self.sock: socket.socket | None = None
+        self.retry_at = 0.0
+        # Latency start time and send time of each message awaiting its ACK.
+        self.inflight: collections.deque[tuple[float, float]] = collections.deque()
+        self.decoder = MLLPDecoder()
+        self.aborted = False
+
+    def abort(self) -> None:
+        """Stop sending and drop the messages still queued."""
+        self.aborted = True
+        while True:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                return
+
+    def connect(self) -> bool:
+        """Open the connection unless a connect failed in the last second."""
+        now = time.monotonic()
+        if now < self.retry_at:
+            return False
+        try:
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            if self.ssl_context is not None:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                sock = self.ssl_context.wrap_socket(sock, server_hostname=self.server_hostname)
+        except OSError:
+            self.retry_at = now + 1.0
+            return False
+        self.sock = sock
+        self.decoder = MLLPDecoder()
+        return True
+
+    def disconnect(self, *, timed_out: bool = False) -> None:
+        if timed_out:
+            self.timeouts += len(self.inflight)
+        else:
+            self.errors += len(self.inflight)
+        self.inflight.clear()
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def run(self) -> None:
+        pending: tuple[float, bytes] | None = None
+        finished = False
+        try:
+            while not self.aborted:
+                if pending is None and not finished:
+                    try:
+                        # Block only when there are no ACKs to read meanwhile.
+                        pending = self.queue.get(block=not self.inflight)
+                    except queue.Empty:
+                        pass
+                    else:
+                        finished = pending is None
+                if finished and not self.inflight:
+                    return
+
+                now = time.monotonic()
+                wait = POLL_INTERVAL if pending is None and not finished else self.timeout
+                if pending is not None and len(self.inflight) < self.window:
+                    due = self.start_time + pending[0]
+                    if now >= due:
+                        self.send(pending[1], due, now)
+                        pending = None
+                        continue
+                    wait = due - now
+                if not self.inflight:
+                    # Wake up now and then to notice an abort during long gaps.
+                    time.sleep(min(wait, 0.1))
+                    continue
+                self.receive(wait)
+        finally:
+            self.disconnect()
+
+    def send(self, payload: bytes, due: float, now: float) -> None:
+        if self.sock is None and not self.connect():
+            self.errors += 1
+            return
+        try:
+            self.sock.settimeout(self.timeout)
+            send_buffers(self.sock, frame_buffers([payload]))
+        except OSError:
+            self.errors += 1
+            self.disconnect()
+            return
+        self.sent += 1
+        self.last_send = now
+        if self.paced:
+            self.lag.record(int((now - due) * 1_000_000))
+        # Paced replays measure from the scheduled send time, like `fastmllp bench`.
+        self.inflight.append((due if self.paced else now, now))
+
+    def receive(self, wait: float) -> None:
+        now = time.monotonic()
+        oldest_sent = self.inflight[0][1]
+        self.sock.settimeout(max(min(wait, oldest_sent + self.timeout - now), 0.0001))
+        try:
+            chunk = self.sock.recv(65536)
+        except TimeoutError:
+            if time.monotonic() - oldest_sent >= self.timeout:
+                self.disconnect(timed_out=True)
+            return
+        except OSError:
+            self.disconnect()
+            return
+        if not chunk:
+            self.disconnect()
+            return
+        received_at = time.monotonic()
+        for ack in self.decoder.feed(chunk):
+            if not self.inflight:
+                self.errors += 1
+                continue
+            started, _ = self.inflight.popleft()
+            self.acked += 1
+            msa = parse_msa(ack.decode(self.encoding, errors="replace"))
+            if msa["ack_code"] not in ("AA", "CA"):
+                self.nacks += 1
+            self.histogram.record(int((received_at - started) * 1_000_000))
+
+
+def run_replay(
+    records: Iterable[CaptureRecord],
+    host: str,
+    port: int,
+    *,
+    connections: int = 1,
+    speed: float = 1.0,
+    rate: float = 0.0,
+    window: int = 1,
+    timeout: float = 10.0,
+    encoding: str = "utf-8",
+    ssl_context: ssl.SSLContext | None = None,
+    server_hostname: str | None = None,
+) -> dict:
+    """Replay captured messages to an MLLP target and return a rate and latency report.
+
+    Messages are sent at their captured times divided by `speed`, at a fixed
+    `rate` in messages per second when it is positive, or as fast as the
+    target ACKs them when both are 0. Each captured connection is assigned to
+    one of `connections` persistent connections, so its messages keep their
+    order. Records without timestamps need a `rate` or a `speed` of 0.
+    """
+    if connections <= 0 or window <= 0:
+        raise ValueError("connections and window must be positive")
+    if speed < 0 or rate < 0:
+        raise ValueError("speed and rate must not be negative")
+    paced = rate > 0 or speed > 0
+    lanes = [
+        ReplayLane(
+            host,
+            port,
+            window=window,
+            timeout=timeout,
+            encoding=encoding,
+            paced=paced,
+            ssl_context=ssl_context,
+            server_hostname=server_hostname,
+        )
+        for _ in range(connections)
+    ]
+    for lane in lanes:
+        lane.connect()
+    start = time.monotonic()
+    for lane in lanes:
+        lane.start_time = start
+        lane.start()
+
+    lane_of: dict[int, int] = {}
+    count = 0
+    last_offset = offset = 0.0
+    first_timestamp = None
+    try:
+        for record in records:
+            if rate > 0:
+                offset = count / rate
+            elif speed > 0:
+                if record.timestamp is None:
+                    raise ValueError("capture has no timestamps; use --rate or --speed max")
+                if first_timestamp is None:
+                    first_timestamp = record.timestamp
+                offset = max((record.timestamp - first_timestamp) / speed, 0.0)
+            lane = lanes[lane_of.setdefault(record.connection, len(lane_of) % connections)]
+            lane.queue.put((offset, record.payload))
+            last_offset = max(last_offset, offset)
+            count += 1
+    except BaseException:
+        for lane in lanes:
+            lane.abort()
+        raise
+    finally:
+        for lane in lanes:
+            lane.queue.put(None)
+        for lane in lanes:
+            lane.join()
+    elapsed = max(time.monotonic() - start, 1e-9)
+
+    histogram = Histogram()
+    lag = Histogram()
+    for lane in lanes:
+        histogram.merge(lane.histogram)
+        lag.merge(lane.lag)
+    sent = sum(lane.sent for lane in lanes)
+    acked = sum(lane.acked for lane in lanes)
+    send_elapsed = max(max(lane.last_send for lane in lanes) - start, 1e-9)
+    return {
+        "target": f"{host}:{port}",
+        "connections": connections,
+        "window": window,
+        "speed": speed,
+        "rate": rate,
+        "records": count,
+        "elapsed": elapsed,
+        "sent": sent,
+        "acked": acked,
+        "nacks": sum(lane.nacks for lane in lanes),
+        "errors": sum(lane.errors for lane in lanes),
+        "timeouts": sum(lane.timeouts for lane in lanes),
+        "target_rate": (count - 1) / last_offset if paced and last_offset > 0 else 0.0,
+        "achieved_rate": (sent - 1) / send_elapsed if sent > 1 else 0.0,
+        "throughput": acked / elapsed,
+        "latency_ms": latency_summary(histogram),
+        "schedule_lag_ms": {
+            "mean": lag.mean() / 1000,
+            "p99": lag.percentile(99.0) / 1000,
+            "max": lag.maximum / 1000,
+        },
+    }
+
+
+def format_replay_report(report: dict) -> str:
+    if report["rate"]:
+        schedule = f"rate={report['rate']:g} msg/s"
+    elif report["speed"]:
+        schedule = f"speed={report['speed']:g}x"
+    else:
+        schedule = "speed=max"
+    target_rate = f"{report['target_rate']:.1f} msg/s" if report["target_rate"] else "max"
+    lag = report["schedule_lag_ms"]
+    lines = [
+        f"target      {report['target']}  connections={report['connections']} "
+        f"window={report['window']} {schedule}",
+        f"messages    records={report['records']} sent={report['sent']} "
+        f"acked={report['acked']} nacks={report['nacks']} errors={report['errors']} "
+        f"timeouts={report['timeouts']}",
+        f"send rate   target={target_rate} achieved={report['achieved_rate']:.1f} msg/s "
+        f"lag mean={lag['mean']:.3f} p99={lag['p99']:.3f} max={lag['max']:.3f} ms",
+        f"throughput  {report['throughput']:.1f} msg/s over {report['elapsed']:.2f}s",
+        "latency ms  "
+        + " ".join(f"{key}={value:.3f}" for key, value in report["latency_ms"].items()),
+    ]
+    return "\n".join(lines) + "\n"
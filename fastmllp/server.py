@@ -1,11 +1,488 @@
+import asyncio
+import contextlib
 import itertools
 import logging as std_logging
+import select
+import signal
 import socket
+import ssl
 import threading
+import time
+from collections import deque
+from collections.abc import Callable, Iterator
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from concurrent.futures import wait as wait_futures
 
-from .ack import build_ack
+from .ack import AckBuilder
+from .capture import DEFAULT_SEGMENT_SECONDS as CAPTURE_SEGMENT_SECONDS
+from .capture import DEFAULT_SEGMENT_SIZE as CAPTURE_SEGMENT_SIZE
+from .capture import CaptureRecorder
+from .dedupe import DedupeCache, MessageKey, message_key
+from .handler import HANDLER_MODES, MessageHandler, ack_code_for, create_handler_pool
+from .hl7 import decode_message
+from .journal import DEFAULT_SEGMENT_SIZE, Journal
+from .limits import AdmissionControl
 from .logging import configure_logging, log_event
-from .mllp import START_BLOCK, frame, unframe_stream
+from .metrics import ServerMetrics
+from .mllp import FrameTooLargeError, MLLPDecoder, frame, send_buffers
+from .tls import ServerTLS, describe_tls
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+OVERLOAD_POLICIES = ("wait", "close")
+
+
+def get_logger() -> std_logging.Logger:
+    logger = std_logging.getLogger("fastmllp")
+    if not logger.handlers:
+        logger = configure_logging("info")
+    return logger
+
+
+def build_ack_frame(
+    logger: std_logging.Logger,
+    payload: bytes,
+    conn_id: int,
+    *,
+    ack_builder: AckBuilder,
+    log_message: bool,
+    metrics: ServerMetrics,
+    ack_code: str | bytes = "AA",
+) -> bytes:
+    """Log a received payload and return the framed ACK bytes for it.
+
+    `ack_code` is an MSA-1 code, or a complete ACK message to frame as is.
+    """
+    metrics.frames_received.inc()
+    metrics.frame_size.observe(len(payload))
+    if log_message and logger.isEnabledFor(std_logging.INFO):
+        log_event(
+            logger,
+            std_logging.INFO,
+            "message_received",
+            conn_id=conn_id,
+            length=len(payload),
+            message=decode_message(payload, ack_builder.encoding),
+        )
+    else:
+        log_event(
+            logger,
+            std_logging.INFO,
+            "message_received",
+            conn_id=conn_id,
+            length=len(payload),
+        )
+
+    if isinstance(ack_code, bytes):
+        return frame(ack_code)
+    try:
+        return ack_builder.build(payload, ack_code=ack_code)
+    except Exception:
+        metrics.ack_build_errors.inc()
+        log_event(
+            logger,
+            std_logging.ERROR,
+            "ack_build_error",
+            conn_id=conn_id,
+        )
+        return ack_builder.build(b"", ack_code=ack_code)
+
+
+def handler_ack_code(
+    logger: std_logging.Logger,
+    metrics: ServerMetrics,
+    conn_id: int,
+    outcome: Callable[[], object],
+) -> str | bytes:
+    """Return the ACK code (or ACK message) for a handler `outcome`, or AE if it failed."""
+    try:
+        return ack_code_for(outcome())
+    except Exception as exc:
+        metrics.handler_errors.inc()
+        log_event(logger, std_logging.ERROR, "handler_error", conn_id=conn_id, error=repr(exc))
+        return "AE"
+
+
+class SharedTLSSocket:
+    """A TLS socket read by a connection's thread while its ACK writer thread writes.
+
+    An OpenSSL connection must not be used by two threads at once, so reads
+    and writes take a lock. Reads are non-blocking and wait for the socket
+    outside the lock, so the writer is never held up by an idle reader.
+    """
+
+    def __init__(self, sock: ssl.SSLSocket, timeout: float) -> None:
+        self.sock = sock
+        self.timeout = timeout
+        self._lock = threading.Lock()
+
+    def recv_into(self, buffer: bytearray) -> int:
+        deadline = time.monotonic() + self.timeout
+        while True:
+            with self._lock:
+                self.sock.setblocking(False)
+                try:
+                    return self.sock.recv_into(buffer)
+                except ssl.SSLWantReadError:
+                    pass
+                finally:
+                    self.sock.settimeout(self.timeout)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([self.sock], [], [], remaining)[0]:
+                raise TimeoutError("timed out")
+
+    def sendall(self, data: bytes) -> None:
+        with self._lock:
+            self.sock.sendall(data)
+
+    def shutdown(self, how: int) -> None:
+        self.sock.shutdown(how)
+
+
+class OrderedAcks:
+    """Send one connection's ACKs in frame order as pooled handler results complete.
+
+    At most `max_in_flight` frames are outstanding; `submit` blocks the reader
+    beyond that. A per-connection writer thread waits on each result in turn
+    and passes it to `send_results` together with any later results that are
+    already done, so their ACKs share a write and socket writes never run on
+    pool threads. A handler that has not finished `timeout` seconds after its
+    frame arrived closes the connection.
+    """
+
+    def __init__(
+        self,
+        conn: socket.socket | SharedTLSSocket,
+        max_in_flight: int,
+        timeout: float,
+        send_results: Callable[[list[tuple[Future, bytes, float]]], None],
+        on_timeout: Callable[[], None],
+    ) -> None:
+        self.conn = conn
+        self.timeout = timeout
+        self._send_results = send_results
+        self._on_timeout = on_timeout
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._pending: deque[tuple[Future, bytes, float]] = deque()
+        self._ready = threading.Condition()
+        self._closing = False
+        self._failed = False
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    def submit(self, pool: Executor, handler: MessageHandler, payload: bytes) -> None:
+        started = time.perf_counter()
+        self._slots.acquire()
+        self._append(pool.submit(handler, payload), payload, started)
+
+    def submit_result(self, payload: bytes, ack_code: str) -> None:
+        """Queue an ACK whose code is already known behind the frames before it."""
+        started = time.perf_counter()
+        self._slots.acquire()
+        future: Future = Future()
+        future.set_result(ack_code)
+        self._append(future, payload, started)
+
+    def _append(self, future: Future, payload: bytes, started: float) -> None:
+        with self._ready:
+            self._pending.append((future, payload, started))
+            self._ready.notify()
+
+    def close(self) -> None:
+        """Send the ACKs of outstanding frames, waiting at most `timeout` for each."""
+        with self._ready:
+            self._closing = True
+            self._ready.notify()
+        self._writer.join()
+
+    def _write_loop(self) -> None:
+        while True:
+            with self._ready:
+                while not self._pending and not self._closing:
+                    self._ready.wait()
+                if not self._pending:
+                    return
+                batch = [self._pending.popleft()]
+            future, _, started = batch[0]
+            try:
+                if self._failed:
+                    future.cancel()
+                    continue
+                remaining = started + self.timeout - time.perf_counter()
+                if not wait_futures((future,), max(remaining, 0.0)).done:
+                    future.cancel()
+                    self._on_timeout()
+                    self._fail()
+                    continue
+                with self._ready:
+                    while self._pending and self._pending[0][0].done():
+                        batch.append(self._pending.popleft())
+                self._send_results(batch)
+            except OSError:
+                self._fail()
+            finally:
+                for _ in batch:
+                    self._slots.release()
+
+    def _fail(self) -> None:
+        # Later results are dropped and the reader is woken; the connection is unusable.
+        self._failed = True
+        try:
+            self.conn.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+def report_stats(
+    logger: std_logging.Logger,
+    metrics: ServerMetrics,
+    stats_callback: Callable[[dict], None],
+) -> None:
+    try:
+        stats_callback(metrics.snapshot())
+    except Exception as exc:
+        log_event(logger, std_logging.ERROR, "stats_callback_error", error=str(exc))
+
+
+def raise_nofile_limit() -> None:
+    """Raise the soft open-file limit to the hard limit where supported."""
+    if resource is None:
+        return
+    try:
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if hard == resource.RLIM_INFINITY or soft < hard:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    except (ValueError, OSError):
+        pass
+
+
+def validate_handler_options(handler_mode: str, max_in_flight: int) -> None:
+    if handler_mode not in HANDLER_MODES:
+        raise ValueError(f"handler_mode must be one of: {', '.join(HANDLER_MODES)}")
+    if max_in_flight <= 0:
+        raise ValueError("max_in_flight must be positive")
+
+
+@contextlib.contextmanager
+def exit_on_sigterm() -> Iterator[None]:
+    """Raise `SystemExit` on SIGTERM so servers clean up in `finally` (main thread only)."""
+    if threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def on_sigterm(signum: int, frame: object) -> None:
+        raise SystemExit(0)
+
+    previous = signal.signal(signal.SIGTERM, on_sigterm)
+    try:
+        yield
+    finally:
+        signal.signal(signal.SIGTERM, previous)
+
+
+def create_listener(
+    host: str,
+    port: int,
+    *,
+    reuse_port: bool = False,
+    backlog: int = socket.SOMAXCONN,
+) -> socket.socket:
+    """Bind a listening TCP socket, optionally with `SO_REUSEPORT` for worker sharding."""
+    server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if reuse_port:
+            server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        server_socket.bind((host, port))
+        server_socket.listen(backlog)
+    except BaseException:
+        server_socket.close()
+        raise
+    return server_socket
+
+
+def decode_frames(
+    decoder: MLLPDecoder, data: bytes | memoryview
+) -> tuple[list[bytes], FrameTooLargeError | None]:
+    """Return the frames completed by one read, and the error that ended it, if any."""
+    frames = []
+    try:
+        for payload in decoder.feed(data):
+            frames.append(payload)
+    except FrameTooLargeError as exc:
+        return frames, exc
+    return frames, None
+
+
+def commit_frames(journal: Journal, frames: list[bytes]) -> None:
+    """Append a read's frames to the journal and wait until they are durable."""
+    seq = 0
+    for payload in frames:
+        seq = journal.write(payload)
+    if seq:
+        journal.sync(seq)
+
+
+def open_journal(
+    journal_dir: str | None,
+    segment_size: int,
+    commit_window: float,
+    metrics: ServerMetrics,
+) -> Journal | None:
+    if journal_dir is None:
+        return None
+    if commit_window < 0:
+        raise ValueError("journal_commit_window must not be negative")
+    return Journal(
+        journal_dir,
+        segment_size=segment_size,
+        commit_window=commit_window,
+        metrics=metrics,
+    )
+
+
+def open_capture(
+    capture_dir: str | None,
+    segment_size: int,
+    segment_seconds: float,
+    compress: bool,
+    metrics: ServerMetrics,
+) -> CaptureRecorder | None:
+    if capture_dir is None:
+        return None
+    return CaptureRecorder(
+        capture_dir,
+        segment_size=segment_size,
+        segment_seconds=segment_seconds,
+        compress=compress,
+        metrics=metrics,
+    )
+
+
+def format_peer(addr: object) -> str:
+    """Return a peername as `host:port`, or `str(addr)` for other socket families."""
+    if isinstance(addr, tuple) and len(addr) >= 2:
+        return f"{addr[0]}:{addr[1]}"
+    return str(addr)
+
+
+def peer_host(addr: object) -> str:
+    """Return the source IP of a peername, or `str(addr)` for other socket families."""
+    if isinstance(addr, tuple) and addr:
+        return str(addr[0])
+    return str(addr)
+
+
+def open_admission(
+    rate: float, burst: float | None, key: str, metrics: ServerMetrics
+) -> AdmissionControl | None:
+    if rate < 0:
+        raise ValueError("limit_rate must not be negative")
+    if not rate:
+        return None
+    return AdmissionControl(rate, burst, key=key, metrics=metrics)
+
+
+def admission_delay(
+    admission: AdmissionControl,
+    logger: std_logging.Logger,
+    conn_id: int,
+    host: str,
+    frames: list[bytes],
+    encoding: str,
+) -> float:
+    """Charge a read's frames and return how long to wait before handling them."""
+    key, delay = admission.admit(host, frames, encoding)
+    if delay > 0:
+        log_event(
+            logger, std_logging.INFO, "throttled", conn_id=conn_id, key=key, delay=round(delay, 3)
+        )
+    return delay
+
+
+def open_dedupe(
+    enabled: bool, ttl: float, capacity: int, max_bytes: int, metrics: ServerMetrics
+) -> DedupeCache | None:
+    if not enabled:
+        return None
+    return DedupeCache(capacity=capacity, ttl=ttl, max_bytes=max_bytes, metrics=metrics)
+
+
+def claim_message(
+    dedupe: DedupeCache,
+    logger: std_logging.Logger,
+    conn_id: int,
+    payload: bytes,
+    encoding: str,
+) -> tuple[MessageKey | None, str | None]:
+    """Return a frame's dedupe key and, for a duplicate, the ACK code to repeat."""
+    key = message_key(payload, encoding)
+    code = dedupe.claim(key)
+    if code is not None:
+        log_event(
+            logger,
+            std_logging.INFO,
+            "duplicate",
+            conn_id=conn_id,
+            control_id=key[2],
+            ack_code=code,
+        )
+    return key, code
+
+
+def log_acks_sent(
+    logger: std_logging.Logger,
+    metrics: ServerMetrics,
+    conn_id: int,
+    acks: list[tuple[bytes, float]],
+) -> None:
+    now = time.perf_counter()
+    for ack, started in acks:
+        metrics.ack_latency.observe(now - started)
+        log_event(logger, std_logging.INFO, "ack_sent", conn_id=conn_id, length=len(ack))
+
+
+def tls_settings(
+    tls: ServerTLS | ssl.SSLContext | None,
+) -> tuple[ssl.SSLContext | None, ServerTLS | None]:
+    """Return the context to serve with and, if it can be reloaded, its `ServerTLS`."""
+    if isinstance(tls, ServerTLS):
+        return tls.context, tls if tls.reload_interval > 0 else None
+    return tls, None
+
+
+def reload_certificates(
+    logger: std_logging.Logger, metrics: ServerMetrics, tls: ServerTLS
+) -> None:
+    try:
+        if tls.reload_if_changed():
+            metrics.tls_reloads.inc()
+            log_event(logger, std_logging.INFO, "tls_reloaded", certfile=tls.certfile)
+    except (OSError, ValueError) as exc:
+        # The current certificate stays in use until the files load cleanly.
+        log_event(logger, std_logging.ERROR, "tls_reload_error", error=str(exc))
+
+
+def log_tls_handshake(
+    logger: std_logging.Logger,
+    metrics: ServerMetrics,
+    conn_id: int,
+    ssl_object: ssl.SSLSocket | ssl.SSLObject,
+) -> None:
+    metrics.tls_handshakes.inc()
+    if ssl_object.session_reused:
+        metrics.tls_resumed.inc()
+    fields = describe_tls(ssl_object)
+    log_event(logger, std_logging.INFO, "tls_handshake", conn_id=conn_id, **fields)
+
+
+def log_frame_too_large(
+    logger: std_logging.Logger, conn_id: int, exc: FrameTooLargeError
+) -> None:
+    log_event(logger, std_logging.WARNING, "frame_too_large", conn_id=conn_id, length=exc.length)
 
 
 def serve(
@@ -16,98 +493,536 @@ def serve(
     encoding: str = "utf-8",
     max_size: int = 1048576,
     log_message: bool = False,
+    recv_buffer: int = 65536,
+    metrics: ServerMetrics | None = None,
+    stats_callback: Callable[[dict], None] | None = None,
+    stats_interval: float = 10.0,
+    sock: socket.socket | None = None,
+    max_connections: int = 1024,
+    overload: str = "wait",
+    backlog: int = socket.SOMAXCONN,
+    handler: MessageHandler | None = None,
+    handler_mode: str = "inline",
+    handler_workers: int | None = None,
+    max_in_flight: int = 8,
+    journal_dir: str | None = None,
+    journal_segment_size: int = DEFAULT_SEGMENT_SIZE,
+    journal_commit_window: float = 0.0,
+    capture_dir: str | None = None,
+    capture_segment_size: int = CAPTURE_SEGMENT_SIZE,
+    capture_segment_seconds: float = CAPTURE_SEGMENT_SECONDS,
+    capture_compress: bool = False,
+    dedupe: bool = False,
+    dedupe_ttl: float = 300.0,
+    dedupe_capacity: int = 100000,
+    dedupe_max_bytes: int = 64 * 1024 * 1024,
+    limit_rate: float = 0.0,
+    limit_burst: float | None = None,
+    limit_key: str = "peer",
+    tls: ServerTLS | ssl.SSLContext | None = None,
 ) -> None:
-    """Run a blocking MLLP server that ACKs complete frames."""
-    logger = std_logging.getLogger("fastmllp")
-    if not logger.handlers:
-        logger = configure_logging("info")
+    """Run a blocking MLLP server that ACKs complete frames.
 
-    server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    server_socket.bind((host, port))
-    server_socket.listen()
+    Connections are handled on a pool of at most `max_connections` threads.
+    At the limit the server either stops accepting until a connection closes
+    (`overload="wait"`, new clients queue in the listen `backlog`) or accepts
+    and immediately closes new connections (`overload="close"`).
+
+    Each payload is passed to `handler`, whose return value (AA, AE or AR;
+    None means AA) becomes the ACK code; a `bytes` return value is a complete
+    ACK message, framed and sent as it is. With `handler_mode` "thread" or
+    "process" handlers run on a shared pool of `handler_workers`, with up to
+    `max_in_flight` frames per connection outstanding; ACKs are still sent in
+    the order frames arrived.
+
+    With `journal_dir`, every frame is appended to a `Journal` there and ACKed
+    (or passed to the handler) only once an fsync has made it durable.
+    Concurrent connections share fsyncs, waiting up to `journal_commit_window`
+    seconds for a batch to fill.
+
+    With `capture_dir`, every received frame is recorded with its receive
+    time, connection number and peer address by a `CaptureRecorder`, whose
+    segments rotate after `capture_segment_size` bytes or
+    `capture_segment_seconds` seconds and are gzipped when `capture_compress`
+    is set. Recording runs on a background thread and never delays ACKs.
+
+    With `dedupe`, a frame whose sending application, facility and control ID
+    (MSH-3, MSH-4, MSH-10) were seen in the last `dedupe_ttl` seconds is ACKed
+    again with the code sent before, without calling the handler. At most
+    `dedupe_capacity` keys, using about `dedupe_max_bytes`, are remembered.
+    A duplicate of a frame still being handled is ACKed AA, and frames ACKed
+    AE are forgotten so their retransmissions are handled again.
+
+    With a positive `limit_rate`, each source IP (or, with `limit_key`
+    "sender", each MSH-3/MSH-4 sender) may send `limit_rate` frames per
+    second with bursts of `limit_burst` (default: one second's worth). A
+    connection whose frames empty its bucket waits before handling them and
+    reading more, so TCP backpressure slows the sender; nothing is dropped.
+
+    With `tls`, a `ServerTLS` or an `ssl.SSLContext`, connections use TLS;
+    the handshake runs on the connection's thread within `timeout`. A
+    `ServerTLS` certificate is reloaded when its files change, checked every
+    `reload_interval` seconds, without dropping connections or sessions.
+
+    Counters and histograms are recorded in `metrics`; when `stats_callback` is
+    given it is called with a metrics snapshot every `stats_interval` seconds.
+    A pre-bound listening `sock` is used instead of binding `host` and `port`.
+    """
+    if max_connections <= 0:
+        raise ValueError("max_connections must be positive")
+    if overload not in OVERLOAD_POLICIES:
+        raise ValueError(f"overload must be one of: {', '.join(OVERLOAD_POLICIES)}")
+    validate_handler_options(handler_mode, max_in_flight)
+    logger = get_logger()
+    ack_builder = AckBuilder(encoding)
+    metrics = metrics or ServerMetrics()
+    journal = open_journal(journal_dir, journal_segment_size, journal_commit_window, metrics)
+    capture = open_capture(
+        capture_dir, capture_segment_size, capture_segment_seconds, capture_compress, metrics
+    )
+    dedupe_cache = open_dedupe(dedupe, dedupe_ttl, dedupe_capacity, dedupe_max_bytes, metrics)
+    admission = open_admission(limit_rate, limit_burst, limit_key, metrics)
+    handler_pool = create_handler_pool(handler_mode, handler_workers) if handler else None
+    ssl_context, reloadable = tls_settings(tls)
+
+    server_socket = sock if sock is not None else create_listener(host, port, backlog=backlog)
+    executor = ThreadPoolExecutor(max_connections, thread_name_prefix="fastmllp-conn")
+    slots = threading.BoundedSemaphore(max_connections)
+    open_conns: set[socket.socket] = set()
+    open_conns_lock = threading.Lock()
 
     conn_counter = itertools.count(1)
+    stopped = threading.Event()
+
+    def stats_loop() -> None:
+        while not stopped.wait(stats_interval):
+            report_stats(logger, metrics, stats_callback)
+
+    def reload_loop() -> None:
+        while not stopped.wait(reloadable.reload_interval):
+            reload_certificates(logger, metrics, reloadable)
+
+    def ack_frame(conn_id: int, payload: bytes, ack_code: str | bytes) -> bytes:
+        return build_ack_frame(
+            logger,
+            payload,
+            conn_id,
+            ack_builder=ack_builder,
+            log_message=log_message,
+            metrics=metrics,
+            ack_code=ack_code,
+        )
+
+    def start_tls(conn: socket.socket, conn_id: int) -> ssl.SSLSocket | None:
+        """Wrap `conn` and run the handshake; returns None if it fails."""
+        # Handshake flights and the first ACK are small writes that Nagle would delay.
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        tls_conn = ssl_context.wrap_socket(conn, server_side=True, do_handshake_on_connect=False)
+        # Track the wrapped socket so shutdown can still wake this thread.
+        with open_conns_lock:
+            open_conns.discard(conn)
+            open_conns.add(tls_conn)
+        try:
+            tls_conn.do_handshake()
+        except OSError as exc:
+            metrics.tls_handshake_errors.inc()
+            log_event(
+                logger, std_logging.WARNING, "tls_handshake_error", conn_id=conn_id, error=str(exc)
+            )
+            tls_conn.close()
+            with open_conns_lock:
+                open_conns.discard(tls_conn)
+            return None
+        log_tls_handshake(logger, metrics, conn_id, tls_conn)
+        return tls_conn
+
+    def send_acks(
+        conn: socket.socket | SharedTLSSocket, conn_id: int, acks: list[tuple[bytes, float]]
+    ) -> None:
+        # One gathered write for all ACKs ready together, rather than one per frame.
+        sent = send_buffers(conn, [ack for ack, _ in acks])
+        metrics.ack_writes.inc()
+        metrics.bytes_sent.inc(sent)
+        log_acks_sent(logger, metrics, conn_id, acks)
 
     def handle_client(conn: socket.socket, addr: tuple[str, int], conn_id: int) -> None:
+        metrics.connections_total.inc()
+        metrics.connections_active.inc()
         log_event(logger, std_logging.INFO, "connect", conn_id=conn_id, addr=addr)
-        buffer = b""
+        peer = format_peer(addr)
+        host = peer_host(addr)
+        decoder = MLLPDecoder(max_size)
+        read_buffer = bytearray(recv_buffer)
+        read_view = memoryview(read_buffer)
+        ordered = None
         try:
             conn.settimeout(timeout)
+            if ssl_context is not None:
+                tls_conn = start_tls(conn, conn_id)
+                if tls_conn is None:
+                    return
+                conn = tls_conn
+            stream = conn
+            if handler_pool is not None:
+                if ssl_context is not None:
+                    stream = SharedTLSSocket(conn, timeout)
+
+                def send_results(results: list[tuple[Future, bytes, float]]) -> None:
+                    acks = []
+                    for future, payload, started in results:
+                        code = handler_ack_code(logger, metrics, conn_id, future.result)
+                        if dedupe_cache is not None:
+                            dedupe_cache.resolve(message_key(payload, encoding), code)
+                        acks.append((ack_frame(conn_id, payload, code), started))
+                    send_acks(stream, conn_id, acks)
+
+                def on_timeout() -> None:
+                    metrics.handler_errors.inc()
+                    log_event(logger, std_logging.ERROR, "handler_timeout", conn_id=conn_id)
+
+                ordered = OrderedAcks(stream, max_in_flight, timeout, send_results, on_timeout)
             while True:
                 try:
-                    chunk = conn.recv(4096)
+                    received = stream.recv_into(read_buffer)
                 except TimeoutError:
                     log_event(logger, std_logging.INFO, "timeout", conn_id=conn_id)
                     break
 
-                if not chunk:
+                if not received:
                     break
 
-                buffer += chunk
-                frames, buffer = unframe_stream(buffer)
-
-                for payload in frames:
-                    if len(payload) > max_size:
-                        log_event(
-                            logger,
-                            std_logging.WARNING,
-                            "frame_too_large",
-                            conn_id=conn_id,
-                            length=len(payload),
-                        )
+                metrics.bytes_received.inc(received)
+                frames, too_large = decode_frames(decoder, read_view[:received])
+                started = time.perf_counter()
+                if capture is not None and frames:
+                    capture.record(frames, conn_id, peer)
+                if admission is not None and frames:
+                    delay = admission_delay(admission, logger, conn_id, host, frames, encoding)
+                    # Not reading meanwhile fills the socket buffers and stalls the sender.
+                    if delay and stopped.wait(delay):
                         return
-                    message_text = payload.decode(encoding, errors="replace")
-                    if log_message:
-                        log_event(
-                            logger,
-                            std_logging.INFO,
-                            "message_received",
-                            conn_id=conn_id,
-                            length=len(payload),
-                            message=message_text,
-                        )
-                    else:
-                        log_event(
-                            logger,
-                            std_logging.INFO,
-                            "message_received",
-                            conn_id=conn_id,
-                            length=len(payload),
-                        )
-
+                if journal is not None and frames:
                     try:
-                        ack_text = build_ack(message_text)
-                    except Exception:
-                        ack_text = build_ack("")
+                        commit_frames(journal, frames)
+                    except OSError as exc:
+                        # Nothing from this read is ACKed, so the sender will retry it.
                         log_event(
                             logger,
                             std_logging.ERROR,
-                            "ack_build_error",
+                            "journal_error",
                             conn_id=conn_id,
+                            error=str(exc),
                         )
+                        return
+                acks = []
+                for payload in frames:
+                    key = code = None
+                    if dedupe_cache is not None:
+                        key, code = claim_message(dedupe_cache, logger, conn_id, payload, encoding)
+                    if ordered is not None:
+                        if code is not None:
+                            ordered.submit_result(payload, code)
+                        else:
+                            ordered.submit(handler_pool, handler, payload)
+                        continue
+                    if code is None:
+                        code = "AA"
+                        if handler is not None:
+                            code = handler_ack_code(
+                                logger, metrics, conn_id, lambda: handler(payload)
+                            )
+                        if dedupe_cache is not None:
+                            dedupe_cache.resolve(key, code)
+                    acks.append((ack_frame(conn_id, payload, code), started))
+                if acks:
+                    send_acks(stream, conn_id, acks)
+                if too_large is not None:
+                    metrics.frames_too_large.inc()
+                    log_frame_too_large(logger, conn_id, too_large)
+                    return
+        except OSError as exc:
+            # Errors caused by the server shutting the socket down are expected.
+            if not stopped.is_set():
+                log_event(
+                    logger,
+                    std_logging.ERROR,
+                    "connection_error",
+                    conn_id=conn_id,
+                    error=str(exc),
+                )
+        finally:
+            if ordered is not None:
+                ordered.close()
+            conn.close()
+            with open_conns_lock:
+                open_conns.discard(conn)
+            slots.release()
+            metrics.connections_active.dec()
+            log_event(logger, std_logging.INFO, "disconnect", conn_id=conn_id)
 
-                    ack_bytes = frame(ack_text.encode(encoding, errors="replace"))
-                    conn.sendall(ack_bytes)
+    def wait_for_slot() -> None:
+        if slots.acquire(blocking=False):
+            return
+        metrics.accept_pauses.inc()
+        log_event(logger, std_logging.WARNING, "accept_paused", max_connections=max_connections)
+        slots.acquire()
+        log_event(logger, std_logging.INFO, "accept_resumed")
+
+    if stats_callback is not None:
+        threading.Thread(target=stats_loop, daemon=True).start()
+    if reloadable is not None:
+        threading.Thread(target=reload_loop, daemon=True).start()
+    with exit_on_sigterm():
+        try:
+            while True:
+                if overload == "wait":
+                    wait_for_slot()
+                conn, addr = server_socket.accept()
+                if overload == "close" and not slots.acquire(blocking=False):
+                    metrics.connections_rejected.inc()
                     log_event(
                         logger,
-                        std_logging.INFO,
-                        "ack_sent",
-                        conn_id=conn_id,
-                        length=len(ack_bytes),
+                        std_logging.WARNING,
+                        "connection_rejected",
+                        addr=addr,
+                        max_connections=max_connections,
                     )
+                    conn.close()
+                    continue
+                with open_conns_lock:
+                    open_conns.add(conn)
+                executor.submit(handle_client, conn, addr, next(conn_counter))
+        finally:
+            stopped.set()
+            server_socket.close()
+            # Shutting client sockets down wakes handlers blocked in recv so the pool can
+            # exit; close() alone leaves them waiting for the idle timeout.
+            with open_conns_lock:
+                for conn in open_conns:
+                    try:
+                        conn.shutdown(socket.SHUT_RDWR)
+                    except OSError:
+                        pass
+            executor.shutdown(wait=False, cancel_futures=True)
+            if handler_pool is not None:
+                handler_pool.shutdown(wait=True, cancel_futures=True)
+            if journal is not None:
+                journal.close()
+            if capture is not None:
+                capture.close()
+
+
+async def serve_async(
+    host: str,
+    port: int,
+    *,
+    timeout: float = 10.0,
+    encoding: str = "utf-8",
+    max_size: int = 1048576,
+    log_message: bool = False,
+    recv_buffer: int = 65536,
+    metrics: ServerMetrics | None = None,
+    stats_callback: Callable[[dict], None] | None = None,
+    stats_interval: float = 10.0,
+    sock: socket.socket | None = None,
+    backlog: int = socket.SOMAXCONN,
+    handler: MessageHandler | None = None,
+    handler_mode: str = "inline",
+    handler_workers: int | None = None,
+    max_in_flight: int = 8,
+    journal_dir: str | None = None,
+    journal_segment_size: int = DEFAULT_SEGMENT_SIZE,
+    journal_commit_window: float = 0.0,
+    capture_dir: str | None = None,
+    capture_segment_size: int = CAPTURE_SEGMENT_SIZE,
+    capture_segment_seconds: float = CAPTURE_SEGMENT_SECONDS,
+    capture_compress: bool = False,
+    dedupe: bool = False,
+    dedupe_ttl: float = 300.0,
+    dedupe_capacity: int = 100000,
+    dedupe_max_bytes: int = 64 * 1024 * 1024,
+    limit_rate: float = 0.0,
+    limit_burst: float | None = None,
+    limit_key: str = "peer",
+    tls: ServerTLS | ssl.SSLContext | None = None,
+) -> None:
+    """Run an asyncio MLLP server that ACKs complete frames.
+
+    Connections are served as coroutines on a single event loop instead of one
+    OS thread each, so idle feeds cost a socket and a small buffer only.
+    Metrics, `stats_callback`, `sock`, the handler, journal, capture, dedupe,
+    limit and `tls` options behave as in `serve`; inline handlers run on the event loop, so
+    slow ones should use a pool. Journal writes and fsyncs run on the loop's
+    default executor. Failed TLS handshakes are dropped by the event loop
+    before a connection is reported, so they are not counted.
+    """
+    validate_handler_options(handler_mode, max_in_flight)
+    logger = get_logger()
+    ack_builder = AckBuilder(encoding)
+    metrics = metrics or ServerMetrics()
+    journal = open_journal(journal_dir, journal_segment_size, journal_commit_window, metrics)
+    capture = open_capture(
+        capture_dir, capture_segment_size, capture_segment_seconds, capture_compress, metrics
+    )
+    dedupe_cache = open_dedupe(dedupe, dedupe_ttl, dedupe_capacity, dedupe_max_bytes, metrics)
+    admission = open_admission(limit_rate, limit_burst, limit_key, metrics)
+    handler_pool = create_handler_pool(handler_mode, handler_workers) if handler else None
+    raise_nofile_limit()
+    ssl_context, reloadable = tls_settings(tls)
+
+    conn_counter = itertools.count(1)
+    connections: dict[asyncio.Task, asyncio.StreamWriter] = {}
 
-                if buffer.startswith(START_BLOCK):
-                    payload_len = max(len(buffer) - 1, 0)
-                    if payload_len > max_size:
+    def ack_frame(conn_id: int, payload: bytes, ack_code: str | bytes) -> bytes:
+        return build_ack_frame(
+            logger,
+            payload,
+            conn_id,
+            ack_builder=ack_builder,
+            log_message=log_message,
+            metrics=metrics,
+            ack_code=ack_code,
+        )
+
+    async def write_acks(
+        writer: asyncio.StreamWriter, conn_id: int, acks: list[tuple[bytes, float]]
+    ) -> None:
+        # writelines hands the transport all ACKs at once: one send when the buffer is empty.
+        writer.writelines([ack for ack, _ in acks])
+        await writer.drain()
+        metrics.ack_writes.inc()
+        metrics.bytes_sent.inc(sum(len(ack) for ack, _ in acks))
+        log_acks_sent(logger, metrics, conn_id, acks)
+
+    async def write_results(
+        writer: asyncio.StreamWriter,
+        conn_id: int,
+        results: asyncio.Queue,
+        slots: asyncio.Semaphore,
+    ) -> None:
+        # Awaits handler results in arrival order, so ACK order matches frame order.
+        # Results already done behind the awaited one are written with it.
+        failed = False
+        queued: deque = deque()
+        while True:
+            item = queued.popleft() if queued else await results.get()
+            if item is None:
+                return
+            batch = [item]
+            future, _, started = item
+            try:
+                if failed:
+                    future.cancel()
+                    continue
+                remaining = started + timeout - time.perf_counter()
+                done, _ = await asyncio.wait((future,), timeout=max(remaining, 0.0))
+                if not done:
+                    future.cancel()
+                    metrics.handler_errors.inc()
+                    log_event(logger, std_logging.ERROR, "handler_timeout", conn_id=conn_id)
+                    failed = True
+                    writer.transport.abort()
+                    continue
+                while queued or not results.empty():
+                    if not queued:
+                        queued.append(results.get_nowait())
+                    if queued[0] is None or not queued[0][0].done():
+                        break
+                    batch.append(queued.popleft())
+                acks = []
+                for future, payload, started in batch:
+                    code = handler_ack_code(logger, metrics, conn_id, future.result)
+                    if dedupe_cache is not None:
+                        dedupe_cache.resolve(message_key(payload, encoding), code)
+                    acks.append((ack_frame(conn_id, payload, code), started))
+                await write_acks(writer, conn_id, acks)
+            except OSError:
+                failed = True
+                writer.transport.abort()
+            finally:
+                for _ in batch:
+                    slots.release()
+
+    async def handle_stream(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        conn_id = next(conn_counter)
+        connections[asyncio.current_task()] = writer
+        addr = writer.get_extra_info("peername")
+        metrics.connections_total.inc()
+        metrics.connections_active.inc()
+        log_event(logger, std_logging.INFO, "connect", conn_id=conn_id, addr=addr)
+        peer = format_peer(addr)
+        host = peer_host(addr)
+        ssl_object = writer.get_extra_info("ssl_object")
+        if ssl_object is not None:
+            log_tls_handshake(logger, metrics, conn_id, ssl_object)
+        decoder = MLLPDecoder(max_size)
+        results: asyncio.Queue = asyncio.Queue()
+        slots = asyncio.Semaphore(max_in_flight)
+        results_task = None
+        if handler_pool is not None:
+            results_task = asyncio.create_task(write_results(writer, conn_id, results, slots))
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(reader.read(recv_buffer), timeout)
+                except asyncio.TimeoutError:
+                    log_event(logger, std_logging.INFO, "timeout", conn_id=conn_id)
+                    break
+
+                if not chunk:
+                    break
+
+                metrics.bytes_received.inc(len(chunk))
+                frames, too_large = decode_frames(decoder, chunk)
+                started = time.perf_counter()
+                if capture is not None and frames:
+                    capture.record(frames, conn_id, peer)
+                if admission is not None and frames:
+                    delay = admission_delay(admission, logger, conn_id, host, frames, encoding)
+                    if delay:
+                        await asyncio.sleep(delay)
+                if journal is not None and frames:
+                    try:
+                        await loop.run_in_executor(None, commit_frames, journal, frames)
+                    except OSError as exc:
                         log_event(
                             logger,
-                            std_logging.WARNING,
-                            "frame_too_large",
+                            std_logging.ERROR,
+                            "journal_error",
                             conn_id=conn_id,
-                            length=payload_len,
+                            error=str(exc),
                         )
                         return
+                acks = []
+                for payload in frames:
+                    key = code = None
+                    if dedupe_cache is not None:
+                        key, code = claim_message(dedupe_cache, logger, conn_id, payload, encoding)
+                    if results_task is not None:
+                        await slots.acquire()
+                        if code is not None:
+                            future = loop.create_future()
+                            future.set_result(code)
+                        else:
+                            future = loop.run_in_executor(handler_pool, handler, payload)
+                        results.put_nowait((future, payload, started))
+                        continue
+                    if code is None:
+                        code = "AA"
+                        if handler is not None:
+                            code = handler_ack_code(
+                                logger, metrics, conn_id, lambda: handler(payload)
+                            )
+                        if dedupe_cache is not None:
+                            dedupe_cache.resolve(key, code)
+                    acks.append((ack_frame(conn_id, payload, code), started))
+                if acks:
+                    await write_acks(writer, conn_id, acks)
+                if too_large is not None:
+                    metrics.frames_too_large.inc()
+                    log_frame_too_large(logger, conn_id, too_large)
+                    return
         except OSError as exc:
             log_event(
                 logger,
@@ -117,18 +1032,80 @@ def serve(
                 error=str(exc),
             )
         finally:
-            conn.close()
+            if results_task is not None:
+                results.put_nowait(None)
+                await results_task
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+            connections.pop(asyncio.current_task(), None)
+            metrics.connections_active.dec()
             log_event(logger, std_logging.INFO, "disconnect", conn_id=conn_id)
 
-    try:
+    tls_options = {}
+    if ssl_context is not None:
+        tls_options = {"ssl": ssl_context, "ssl_handshake_timeout": timeout}
+    if sock is not None:
+        server = await asyncio.start_server(handle_stream, sock=sock, **tls_options)
+    else:
+        server = await asyncio.start_server(
+            handle_stream,
+            host,
+            port,
+            reuse_address=True,
+            backlog=backlog,
+            **tls_options,
+        )
+
+    async def stats_loop() -> None:
         while True:
-            conn, addr = server_socket.accept()
-            conn_id = next(conn_counter)
-            thread = threading.Thread(
-                target=handle_client,
-                args=(conn, addr, conn_id),
-                daemon=True,
-            )
-            thread.start()
+            await asyncio.sleep(stats_interval)
+            report_stats(logger, metrics, stats_callback)
+
+    async def reload_loop() -> None:
+        while True:
+            await asyncio.sleep(reloadable.reload_interval)
+            reload_certificates(logger, metrics, reloadable)
+
+    stats_task = asyncio.create_task(stats_loop()) if stats_callback is not None else None
+    reload_task = asyncio.create_task(reload_loop()) if reloadable is not None else None
+    loop = asyncio.get_running_loop()
+    serving = asyncio.current_task()
+    terminated = False
+
+    def on_sigterm() -> None:
+        nonlocal terminated
+        terminated = True
+        serving.cancel()
+
+    try:
+        # Stop from the event loop rather than raising inside arbitrary loop code.
+        loop.add_signal_handler(signal.SIGTERM, on_sigterm)
+    except (NotImplementedError, RuntimeError, ValueError):
+        pass
+    try:
+        async with server:
+            await server.serve_forever()
+    except asyncio.CancelledError:
+        if not terminated:
+            raise
     finally:
-        server_socket.close()
+        with contextlib.suppress(NotImplementedError, RuntimeError, ValueError):
+            loop.remove_signal_handler(signal.SIGTERM)
+        if stats_task is not None:
+            stats_task.cancel()
+        if reload_task is not None:
+            reload_task.cancel()
+        if terminated:
+            # Drop open connections so their handlers finish instead of being cancelled.
+            for writer in list(connections.values()):
+                writer.transport.abort()
+            await asyncio.gather(*connections, return_exceptions=True)
+        if handler_pool is not None:
+            handler_pool.shutdown(wait=True, cancel_futures=True)
+        if journal is not None:
+            journal.close()
+        if capture is not None:
+            capture.close()
@@ -0,0 +1,349 @@
+import json
+import logging as std_logging
+import os
+import random
+import socket
+import ssl
+import struct
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from pathlib import Path
+
+from .client import CLIENT_METRICS, CLIENT_SESSIONS, Connection, encode_message
+from .journal import RECORD_HEADER, SEGMENT_MAGIC, Journal, iter_segment, segment_paths
+from .logging import log_event
+from .metrics import ClientMetrics
+
+# Spool records are the enqueue time (seconds since the epoch) followed by the message.
+SPOOL_HEADER = struct.Struct(">d")
+CURSOR_FILE = "CURSOR"
+# Delivery progress is saved at most this often, and whenever the spool drains.
+CURSOR_INTERVAL = 0.5
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+DEFAULT_SEGMENT_SIZE = 16 * 1024 * 1024
+
+
+class SpoolFullError(OSError):
+    """Raised when a message would take the spool past its size limit."""
+
+
+def backoff_delay(attempt: int, initial: float, maximum: float) -> float:
+    """Return the delay before retry `attempt` (from 0): exponential, half of it jittered."""
+    delay = min(maximum, initial * 2 ** min(attempt, 32))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class SpoolingSender:
+    """Durably queue outbound messages on disk and deliver them in order.
+
+    `submit` appends messages to a journal in `directory` and returns once
+    they are on disk. A background thread sends spooled messages over one
+    persistent connection, pipelining up to `window` frames, and drops them
+    from the spool once ACKed, whatever the ACK code; `on_ack` is called with
+    each message and its ACK. Connection errors and timeouts are retried
+    indefinitely, with jittered exponential backoff from `backoff_initial` up
+    to `backoff_max` seconds.
+
+    Delivery is at least once: messages in flight when a connection fails, or
+    ACKed just before the process stopped, are sent again. The spool holds
+    about `max_bytes` of messages; beyond that `submit` raises
+    `SpoolFullError`. A directory is used by one sender at a time.
+
+    With `ssl_context` the connection uses TLS, and reconnects resume the
+    previous session from `CLIENT_SESSIONS`.
+    """
+
+    def __init__(
+        self,
+        directory: str | os.PathLike,
+        host: str,
+        port: int,
+        *,
+        timeout: float = 10.0,
+        encoding: str = "utf-8",
+        window: int = 8,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        segment_size: int = DEFAULT_SEGMENT_SIZE,
+        backoff_initial: float = 0.5,
+        backoff_max: float = 30.0,
+        recv_buffer: int = 4096,
+        metrics: ClientMetrics | None = None,
+        on_ack: Callable[[bytes, bytes], None] | None = None,
+        ssl_context: ssl.SSLContext | None = None,
+        server_hostname: str | None = None,
+    ) -> None:
+        if window <= 0:
+            raise ValueError("window must be positive")
+        if max_bytes <= 0:
+            raise ValueError("max_bytes must be positive")
+        if backoff_initial <= 0:
+            raise ValueError("backoff_initial must be positive")
+        if backoff_max < backoff_initial:
+            raise ValueError("backoff_max must be at least backoff_initial")
+        self.directory = Path(directory)
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.encoding = encoding
+        self.window = window
+        self.max_bytes = max_bytes
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.recv_buffer = recv_buffer
+        self.metrics = metrics or CLIENT_METRICS
+        self.on_ack = on_ack
+        self.ssl_context = ssl_context
+        self.server_hostname = server_hostname
+        self._logger = std_logging.getLogger("fastmllp")
+        self._journal = Journal(directory, segment_size=segment_size)
+        self._cond = threading.Condition()
+        self._cursor = self._load_cursor()
+        self._cursor_saved = time.monotonic()
+        self._depth = sum(1 for _ in self._records_from(self._cursor))
+        self._bytes = sum(path.stat().st_size for path in segment_paths(self.directory))
+        self._closing = False
+        self._conn: Connection | None = None
+        self.metrics.spool_depth.inc(self._depth)
+        self._thread = threading.Thread(
+            target=self._deliver_loop, name="fastmllp-spool", daemon=True
+        )
+        self._thread.start()
+
+    def __enter__(self) -> "SpoolingSender":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def submit(self, message: str | bytes) -> None:
+        """Spool one message, returning once it is on disk."""
+        self.submit_many([message])
+
+    def submit_many(self, messages: Iterable[str | bytes]) -> int:
+        """Spool several messages with a single fsync and return how many were spooled."""
+        enqueued = SPOOL_HEADER.pack(time.time())
+        records = [enqueued + encode_message(message, self.encoding) for message in messages]
+        size = sum(RECORD_HEADER.size + len(record) for record in records)
+        with self._cond:
+            if self._closing:
+                raise ValueError("spool is closed")
+            if self._bytes + size > self.max_bytes:
+                raise SpoolFullError(f"spool is full ({self._bytes} of {self.max_bytes} bytes)")
+            self._bytes += size
+        seq = 0
+        for record in records:
+            seq = self._journal.write(record)
+        if seq:
+            self._journal.sync(seq)
+        with self._cond:
+            self._depth += len(records)
+            self._cond.notify_all()
+        self.metrics.spool_depth.inc(len(records))
+        return len(records)
+
+    def depth(self) -> int:
+        """Return the number of spooled messages not yet ACKed."""
+        with self._cond:
+            return max(self._depth, 0)
+
+    def lag(self) -> float:
+        """Return how long the oldest undelivered message has been spooled, in seconds."""
+        with self._cond:
+            if self._depth <= 0:
+                return 0.0
+            cursor = self._cursor
+        for _, _, record in self._records_from(cursor):
+            (enqueued,) = SPOOL_HEADER.unpack_from(record)
+            return max(time.time() - enqueued, 0.0)
+        return 0.0
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Wait until every spooled message is ACKed; return False on timeout."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._depth <= 0 or self._closing, timeout)
+            return self._depth <= 0
+
+    def close(self) -> None:
+        """Stop delivering; undelivered messages stay spooled for the next sender."""
+        with self._cond:
+            if self._closing:
+                return
+            self._closing = True
+            self._cond.notify_all()
+            conn = self._conn
+        if conn is not None:
+            # Wake the delivery thread if it is waiting for an ACK.
+            try:
+                conn.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        self._thread.join()
+        self._save_cursor()
+        self._journal.close()
+        self.metrics.spool_depth.dec(self.depth())
+
+    def _deliver_loop(self) -> None:
+        attempt = 0
+        while True:
+            with self._cond:
+                while self._depth <= 0 and not self._closing:
+                    self._cond.wait()
+                if self._closing:
+                    break
+            try:
+                delivered = self._deliver()
+                attempt = 0
+            except OSError as exc:
+                self._drop_connection()
+                if self._closing:
+                    break
+                delay = backoff_delay(attempt, self.backoff_initial, self.backoff_max)
+                attempt += 1
+                self.metrics.spool_retries.inc()
+                log_event(
+                    self._logger,
+                    std_logging.WARNING,
+                    "spool_retry",
+                    host=self.host,
+                    port=self.port,
+                    error=str(exc),
+                    delay=round(delay, 3),
+                )
+                with self._cond:
+                    self._cond.wait_for(lambda: self._closing, delay)
+                continue
+            if not delivered:
+                # Counted messages that are not readable yet; do not spin.
+                with self._cond:
+                    self._cond.wait(CURSOR_INTERVAL)
+        self._drop_connection()
+
+    def _deliver(self) -> int:
+        conn = self._connection()
+        inflight: deque[tuple[str, int, float, bytes]] = deque()
+
+        def payloads() -> Iterator[bytes]:
+            for name, end, record in self._records_from(self._cursor):
+                if self._closing:
+                    return
+                (enqueued,) = SPOOL_HEADER.unpack_from(record)
+                payload = record[SPOOL_HEADER.size :]
+                inflight.append((name, end, enqueued, payload))
+                yield payload
+
+        delivered = 0
+        for ack in conn.pipeline(payloads(), window=self.window, encoding=self.encoding):
+            name, end, enqueued, payload = inflight.popleft()
+            if self.on_ack is not None:
+                try:
+                    self.on_ack(payload, ack)
+                except Exception as exc:
+                    log_event(
+                        self._logger, std_logging.ERROR, "spool_callback_error", error=str(exc)
+                    )
+            self._advance(name, end, enqueued)
+            delivered += 1
+        return delivered
+
+    def _connection(self) -> Connection:
+        with self._cond:
+            conn = self._conn
+        if conn is not None and conn.is_alive():
+            return conn
+        self._drop_connection()
+        conn = Connection(
+            self.host,
+            self.port,
+            timeout=self.timeout,
+            recv_buffer=self.recv_buffer,
+            metrics=self.metrics,
+            ssl_context=self.ssl_context,
+            server_hostname=self.server_hostname,
+            sessions=CLIENT_SESSIONS,
+        )
+        with self._cond:
+            self._conn = conn
+            if self._closing:
+                raise ConnectionError("spool is closed")
+        return conn
+
+    def _drop_connection(self) -> None:
+        with self._cond:
+            conn, self._conn = self._conn, None
+        if conn is not None:
+            conn.close()
+
+    def _advance(self, name: str, end: int, enqueued: float) -> None:
+        with self._cond:
+            previous = self._cursor[0]
+            self._cursor = (name, end)
+            self._depth -= 1
+            drained = self._depth <= 0
+            self._cond.notify_all()
+        self.metrics.spool_depth.dec()
+        self.metrics.spool_delivered.inc()
+        self.metrics.spool_lag.observe(max(time.time() - enqueued, 0.0))
+        if name != previous or drained:
+            self._remove_delivered_segments()
+        if drained or time.monotonic() - self._cursor_saved >= CURSOR_INTERVAL:
+            self._save_cursor()
+
+    def _records_from(self, cursor: tuple[str, int]) -> Iterator[tuple[str, int, bytes]]:
+        """Yield (segment name, end offset, record) for each record after `cursor`."""
+        name, offset = cursor
+        for path in segment_paths(self.directory):
+            if path.name < name:
+                continue
+            start = offset if path.name == name else None
+            try:
+                size = path.stat().st_size
+            except FileNotFoundError:
+                continue
+            for record in iter_segment(path, size, start):
+                end = record.offset + RECORD_HEADER.size + len(record.payload)
+                yield path.name, end, record.payload
+
+    def _remove_delivered_segments(self) -> None:
+        # Only the newest segment is still written to, so older ones are complete.
+        segments = segment_paths(self.directory)
+        name, offset = self._cursor
+        delivered = []
+        for index, path in enumerate(segments[:-1]):
+            if path.name < name:
+                delivered.append(path)
+            elif path.name == name and offset >= path.stat().st_size:
+                delivered.append(path)
+                with self._cond:
+                    self._cursor = (segments[index + 1].name, len(SEGMENT_MAGIC))
+        if not delivered:
+            return
+        self._save_cursor()
+        for path in delivered:
+            size = path.stat().st_size
+            path.unlink()
+            with self._cond:
+                self._bytes -= size
+
+    def _load_cursor(self) -> tuple[str, int]:
+        segments = segment_paths(self.directory)
+        first = (segments[0].name, len(SEGMENT_MAGIC))
+        try:
+            with open(self.directory / CURSOR_FILE, encoding="utf-8") as handle:
+                saved = json.load(handle)
+            cursor = (str(saved["segment"]), int(saved["offset"]))
+        except (OSError, ValueError, KeyError, TypeError):
+            return first
+        # A cursor older than every segment means those segments were delivered.
+        return max(cursor, first)
+
+    def _save_cursor(self) -> None:
+        with self._cond:
+            name, offset = self._cursor
+        path = self.directory / CURSOR_FILE
+        temporary = path.with_suffix(".tmp")
+        with open(temporary, "w", encoding="utf-8") as handle:
+            json.dump({"segment": name, "offset": offset}, handle)
+        os.replace(temporary, path)
+        self._cursor_saved = time.monotonic()
@@ -0,0 +1,191 @@
+import asyncio
+import logging as std_logging
+import multiprocessing
+import os
+import queue
+import signal
+import socket
+import time
+from collections.abc import Callable
+from typing import Any
+
+from .logging import log_event
+from .metrics import MetricsAggregator, ServerMetrics, start_metrics_server
+from .server import create_listener, get_logger, serve, serve_async
+
+RESTART_DELAY = 1.0
+SHUTDOWN_TIMEOUT = 5.0
+
+
+def run_worker(
+    host: str,
+    port: int,
+    listener: socket.socket | None,
+    engine: str,
+    stats: Any,
+    stats_interval: float,
+    options: dict[str, Any],
+) -> None:
+    # The supervisor owns Ctrl+C and stops workers with SIGTERM; forked workers
+    # must not keep the supervisor's handlers.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    for name in ("SIGTERM", "SIGHUP"):
+        if hasattr(signal, name):
+            signal.signal(getattr(signal, name), signal.SIG_DFL)
+    if listener is None:
+        backlog = options.get("backlog", socket.SOMAXCONN)
+        listener = create_listener(host, port, reuse_port=True, backlog=backlog)
+    sock = listener
+    pid = os.getpid()
+
+    def report(snapshot: dict) -> None:
+        stats.put((pid, snapshot))
+
+    options = {**options, "sock": sock, "stats_callback": report, "stats_interval": stats_interval}
+    if engine == "asyncio":
+        asyncio.run(serve_async(host, port, **options))
+    else:
+        serve(host, port, **options)
+
+
+def stop_workers(processes: dict[int, multiprocessing.Process]) -> None:
+    for process in processes.values():
+        if process.is_alive():
+            process.terminate()
+    deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+    for process in processes.values():
+        process.join(max(deadline - time.monotonic(), 0.0))
+        if process.is_alive():
+            process.kill()
+            process.join()
+
+
+def serve_workers(
+    host: str,
+    port: int,
+    *,
+    workers: int,
+    engine: str = "threaded",
+    metrics_port: int | None = None,
+    stats_interval: float = 1.0,
+    stats_callback: Callable[[dict], None] | None = None,
+    **options: Any,
+) -> None:
+    """Run `workers` server processes on one port under a restarting supervisor.
+
+    Each worker binds with `SO_REUSEPORT` where available so the kernel spreads
+    connections across processes; elsewhere the workers share one inherited
+    listening socket. Crashed workers are restarted, SIGTERM and SIGINT stop
+    all workers, and SIGHUP is forwarded so workers exit and are restarted.
+    Worker metrics are aggregated, served at `metrics_port`, and passed to
+    `stats_callback`. Other keyword arguments go to `serve` or `serve_async`;
+    a `journal_dir` or `capture_dir` gets one `worker-N` subdirectory per
+    worker, since each of those directories has a single writer.
+    """
+    if workers <= 0:
+        raise ValueError("workers must be positive")
+    logger = get_logger()
+    if hasattr(socket, "SO_REUSEPORT"):
+        listener = None
+        # Bind once up front so a busy port fails here rather than in every worker.
+        create_listener(host, port, reuse_port=True).close()
+    else:
+        listener = create_listener(host, port, backlog=options.get("backlog", socket.SOMAXCONN))
+
+    registry = ServerMetrics().registry
+    restarts = registry.counter("fastmllp_worker_restarts_total", "Worker processes restarted")
+    aggregator = MetricsAggregator(registry)
+    metrics_server = None
+    if metrics_port is not None:
+        metrics_server = start_metrics_server(aggregator, host, metrics_port)
+
+    stats: multiprocessing.Queue = multiprocessing.Queue()
+    processes: dict[int, multiprocessing.Process] = {}
+    started_at: dict[int, float] = {}
+    restart_due: dict[int, float] = {}
+    stopping = False
+
+    def start(worker_id: int) -> None:
+        worker_options = dict(options)
+        for key in ("journal_dir", "capture_dir"):
+            if options.get(key) is not None:
+                worker_options[key] = os.path.join(options[key], f"worker-{worker_id}")
+        process = multiprocessing.Process(
+            target=run_worker,
+            args=(host, port, listener, engine, stats, stats_interval, worker_options),
+            name=f"fastmllp-worker-{worker_id}",
+        )
+        process.start()
+        processes[worker_id] = process
+        started_at[worker_id] = time.monotonic()
+        log_event(logger, std_logging.INFO, "worker_started", worker=worker_id, pid=process.pid)
+
+    def on_signal(signum: int, frame: object) -> None:
+        nonlocal stopping
+        log_event(logger, std_logging.INFO, "signal", signal=signal.Signals(signum).name)
+        if signum != getattr(signal, "SIGHUP", None):
+            stopping = True
+            return
+        for process in processes.values():
+            if process.pid is not None and process.is_alive():
+                os.kill(process.pid, signum)
+
+    previous = {}
+    for name in ("SIGTERM", "SIGINT", "SIGHUP"):
+        signum = getattr(signal, name, None)
+        if signum is not None:
+            previous[signum] = signal.signal(signum, on_signal)
+
+    last_report = time.monotonic()
+    try:
+        for worker_id in range(workers):
+            start(worker_id)
+        while not stopping:
+            try:
+                pid, snapshot = stats.get(timeout=0.2)
+                # Snapshots still queued from a worker that already exited are dropped.
+                if any(process.pid == pid for process in processes.values()):
+                    aggregator.update(pid, snapshot)
+            except queue.Empty:
+                pass
+            except InterruptedError:
+                continue
+
+            now = time.monotonic()
+            for worker_id, process in list(processes.items()):
+                if stopping or process.is_alive():
+                    continue
+                process.join()
+                del processes[worker_id]
+                aggregator.retire(process.pid)
+                log_event(
+                    logger,
+                    std_logging.WARNING,
+                    "worker_exited",
+                    worker=worker_id,
+                    pid=process.pid,
+                    exitcode=process.exitcode,
+                )
+                # Back off so a worker that fails on startup does not spin.
+                restart_due[worker_id] = max(now, started_at[worker_id] + RESTART_DELAY)
+            for worker_id, due in list(restart_due.items()):
+                if not stopping and now >= due:
+                    del restart_due[worker_id]
+                    restarts.inc()
+                    start(worker_id)
+
+            if stats_callback is not None and now - last_report >= stats_interval:
+                last_report = now
+                try:
+                    stats_callback(aggregator.snapshot())
+                except Exception as exc:
+                    log_event(logger, std_logging.ERROR, "stats_callback_error", error=str(exc))
+    finally:
+        for signum, handler in previous.items():
+            signal.signal(signum, handler)
+        stop_workers(processes)
+        log_event(logger, std_logging.INFO, "workers_stopped", workers=len(processes))
+        if metrics_server is not None:
+            metrics_server.shutdown()
+        if listener is not None:
+            listener.close()
@@ -0,0 +1,188 @@
+import os
+import ssl
+import threading
+import weakref
+
+
+def server_context(
+    certfile: str,
+    keyfile: str | None = None,
+    *,
+    cafile: str | None = None,
+    require_client_cert: bool = False,
+    ciphers: str | None = None,
+    session_tickets: bool = True,
+) -> ssl.SSLContext:
+    """Return a server `ssl.SSLContext` for TLS 1.2 and later.
+
+    With `cafile`, client certificates signed by those CAs are verified when
+    offered, and required when `require_client_cert` is true (mutual TLS).
+    `ciphers` is an OpenSSL cipher string for TLS 1.2; TLS 1.3 suites are
+    OpenSSL's defaults. Resumption uses session tickets, or the server's
+    session cache when `session_tickets` is false.
+    """
+    if require_client_cert and cafile is None:
+        raise ValueError("require_client_cert needs a CA file to verify clients against")
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.minimum_version = ssl.TLSVersion.TLSv1_2
+    context.load_cert_chain(certfile, keyfile)
+    if cafile is not None:
+        context.load_verify_locations(cafile)
+        context.verify_mode = ssl.CERT_REQUIRED if require_client_cert else ssl.CERT_OPTIONAL
+    if ciphers:
+        context.set_ciphers(ciphers)
+    if not session_tickets:
+        context.options |= ssl.OP_NO_TICKET
+    return context
+
+
+def client_context(
+    *,
+    cafile: str | None = None,
+    certfile: str | None = None,
+    keyfile: str | None = None,
+    ciphers: str | None = None,
+    verify: bool = True,
+) -> ssl.SSLContext:
+    """Return a client `ssl.SSLContext` that verifies the server against `cafile`.
+
+    Without `cafile` the system CAs are trusted. `certfile` and `keyfile`
+    present a client certificate for mutual TLS. `verify=False` skips
+    certificate and host name checks, for testing only.
+    """
+    context = ssl.create_default_context(cafile=cafile)
+    context.minimum_version = ssl.TLSVersion.TLSv1_2
+    if certfile is not None:
+        context.load_cert_chain(certfile, keyfile)
+    if ciphers:
+        context.set_ciphers(ciphers)
+    if not verify:
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+def file_stamp(*paths: str | None) -> tuple:
+    """Return the modification time and size of each path, or None if missing."""
+    stamp = []
+    for path in paths:
+        try:
+            info = os.stat(path) if path is not None else None
+        except OSError:
+            info = None
+        stamp.append((info.st_mtime_ns, info.st_size) if info is not None else None)
+    return tuple(stamp)
+
+
+class ServerTLS:
+    """Server TLS settings and the `ssl.SSLContext` built from them.
+
+    `reload_if_changed` re-reads the certificate chain into the same context
+    when `certfile` or `keyfile` change on disk; servers call it every
+    `reload_interval` seconds (0 disables reloading). Keeping the context means
+    sessions issued before a reload still resume. A changed pair is loaded
+    into a scratch context first, so a half-written renewal leaves the current
+    certificate in use. Pickles as its settings, so worker processes that are
+    spawned rather than forked build their own context.
+    """
+
+    def __init__(
+        self,
+        certfile: str,
+        keyfile: str | None = None,
+        *,
+        cafile: str | None = None,
+        require_client_cert: bool = False,
+        ciphers: str | None = None,
+        session_tickets: bool = True,
+        reload_interval: float = 60.0,
+    ) -> None:
+        if reload_interval < 0:
+            raise ValueError("reload_interval must not be negative")
+        self.certfile = certfile
+        self.keyfile = keyfile
+        self.cafile = cafile
+        self.require_client_cert = require_client_cert
+        self.ciphers = ciphers
+        self.session_tickets = session_tickets
+        self.reload_interval = reload_interval
+        self._stamp = file_stamp(certfile, keyfile)
+        self.context = self._build()
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> dict:
+        return {
+            "certfile": self.certfile,
+            "keyfile": self.keyfile,
+            "cafile": self.cafile,
+            "require_client_cert": self.require_client_cert,
+            "ciphers": self.ciphers,
+            "session_tickets": self.session_tickets,
+            "reload_interval": self.reload_interval,
+        }
+
+    def __setstate__(self, state: dict) -> None:
+        certfile = state.pop("certfile")
+        self.__init__(certfile, **state)
+
+    def _build(self) -> ssl.SSLContext:
+        return server_context(
+            self.certfile,
+            self.keyfile,
+            cafile=self.cafile,
+            require_client_cert=self.require_client_cert,
+            ciphers=self.ciphers,
+            session_tickets=self.session_tickets,
+        )
+
+    def reload_if_changed(self) -> bool:
+        """Reload the certificate chain if its files changed; return True if reloaded.
+
+        Raises `ssl.SSLError` or `OSError` if the new files cannot be loaded,
+        leaving the current certificate in place; the next call tries again.
+        """
+        with self._lock:
+            stamp = file_stamp(self.certfile, self.keyfile)
+            if stamp == self._stamp:
+                return False
+            self._build()
+            self.context.load_cert_chain(self.certfile, self.keyfile)
+            self._stamp = stamp
+            return True
+
+
+class SessionCache:
+    """TLS sessions from earlier client connections, by context and server address.
+
+    Passing a saved session to the next connection to the same server lets
+    it resume with an abbreviated handshake. Sessions are only valid with the
+    context that created them, and are dropped with it.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._sessions: weakref.WeakKeyDictionary[
+            ssl.SSLContext, dict[tuple[str, int], ssl.SSLSession]
+        ] = weakref.WeakKeyDictionary()
+
+    def get(self, context: ssl.SSLContext, host: str, port: int) -> ssl.SSLSession | None:
+        with self._lock:
+            return self._sessions.get(context, {}).get((host, port))
+
+    def put(self, context: ssl.SSLContext, host: str, port: int, session: ssl.SSLSession) -> None:
+        with self._lock:
+            self._sessions.setdefault(context, {})[(host, port)] = session
+
+
+def describe_tls(ssl_object: ssl.SSLSocket | ssl.SSLObject) -> dict:
+    """Return the protocol, cipher, resumption and peer subject of a TLS connection."""
+    fields = {
+        "version": ssl_object.version(),
+        "cipher": (ssl_object.cipher() or ("",))[0],
+        "resumed": ssl_object.session_reused,
+    }
+    peer = ssl_object.getpeercert()
+    if peer:
+        subject = dict(item for rdn in peer.get("subject", ()) for item in rdn)
+        fields["peer"] = subject.get("commonName", "")
+    return fields
@@ -1,4 +1,5 @@
-from fastmllp.ack import build_ack
+from fastmllp.ack import AckBuilder, build_ack, next_control_id
+from fastmllp.hl7 import parse_msh
 
 
 def test_build_ack_from_msh() -> None:
@@ -37,3 +38,49 @@ def test_build_ack_without_msh() -> None:
     assert msh_fields[3] == "FASTMLLP"
     assert msh_fields[4] == "UNKNOWN"
     assert msh_fields[5] == "UNKNOWN"
+
+
+def ack_fields(ack: str) -> list[list[str]]:
+    return [segment.split("|") for segment in ack.strip("\r").split("\r")]
+
+
+def test_ack_builder_matches_build_ack() -> None:
+    messages = [
+        "MSH|^~\\&|SND|SF|RCV|RF|20240101120000||ADT^A01^ADT_A01|CTRL|T|2.5\rPID|1||123",
+        "MSH|^~\\&|SND|SF|||20240101120000||ORU|CTRL",
+        "MSH|^~\\&",
+        "PID|1",
+        "",
+    ]
+    builder = AckBuilder()
+    for message in messages:
+        framed = builder.build(message.encode())
+        assert framed.startswith(b"\x0b") and framed.endswith(b"\x1c\x0d")
+        fast = ack_fields(framed[1:-2].decode())
+        slow = ack_fields(build_ack(message))
+        # MSH-7 (timestamp) and MSH-10 (generated control ID) differ by design.
+        for fields in (fast, slow):
+            fields[0][6] = fields[0][9] = ""
+            if fields[1][2] and not parse_msh(message)["control_id"]:
+                fields[1][2] = ""
+        assert fast == slow
+
+
+def test_ack_builder_mirrors_custom_separators() -> None:
+    framed = AckBuilder().build(b"MSH#*~\\&#SND#SF#RCV#RF#20240101120000##ADT*A04#42#P#2.4\r")
+    msh, msa = framed[1:-2].decode().strip("\r").split("\r")
+    assert msh.startswith("MSH#*~\\&#RCV#RF#SND#SF#")
+    assert "#ACK*A04#" in msh
+    assert msa == "MSA#AA#42"
+
+
+def test_ack_builder_control_ids_are_unique_hex() -> None:
+    ids = {next_control_id() for _ in range(1000)}
+    assert len(ids) == 1000
+    assert all(len(value) == 32 and int(value, 16) >= 0 for value in ids)
+
+
+def test_ack_builder_falls_back_for_wide_encodings() -> None:
+    message = "MSH|^~\\&|SND|SF|RCV|RF|20240101120000||ADT^A01|CTRL|P|2.5"
+    framed = AckBuilder("utf-16").build(message.encode("utf-16"))
+    assert "MSA|AA|CTRL" in framed[1:-2].decode("utf-16")
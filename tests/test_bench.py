@@ -0,0 +1,45 @@
+import pytest
+
+from fastmllp.bench import Histogram, build_message, message_cycle, parse_mix
+from fastmllp.hl7 import parse_msh
+
+
+def test_histogram_percentiles_within_precision() -> None:
+    histogram = Histogram()
+    for value in range(1, 100001):
+        histogram.record(value)
+    assert histogram.total == 100000
+    assert histogram.minimum == 1
+    assert histogram.maximum == 100000
+    for percent, expected in ((50.0, 50000), (90.0, 90000), (99.0, 99000), (99.9, 99900)):
+        assert abs(histogram.percentile(percent) - expected) <= expected / 128
+
+
+def test_histogram_small_values_are_exact_and_merge() -> None:
+    left = Histogram()
+    right = Histogram()
+    for value in (1, 2, 3):
+        left.record(value)
+    right.record(200)
+    left.merge(right)
+    assert left.percentile(50.0) == 2
+    assert left.percentile(100.0) == 200
+    assert left.minimum == 1
+
+
+def test_parse_mix_and_cycle() -> None:
+    mix = parse_mix("ADT^A01:3, ORU^R01:1")
+    assert mix == [("ADT^A01", 3), ("ORU^R01", 1)]
+    cycle = message_cycle(mix)
+    assert sorted(cycle) == ["ADT^A01", "ADT^A01", "ADT^A01", "ORU^R01"]
+    with pytest.raises(ValueError):
+        parse_mix("ADT^A01:0")
+
+
+def test_build_message_is_parseable_and_sized() -> None:
+    message = build_message("ORU^R01", "C1", 2048)
+    assert len(message) >= 2048
+    parsed = parse_msh(message.decode())
+    assert parsed["message_type"] == "ORU"
+    assert parsed["trigger_event"] == "R01"
+    assert parsed["control_id"] == "C1"
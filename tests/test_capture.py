@@ -0,0 +1,99 @@
+import gzip
+import time
+
+import pytest
+
+from fastmllp.capture import (
+    CaptureError,
+    CaptureRecord,
+    CaptureRecorder,
+    CaptureWriter,
+    iter_capture,
+    merge_captures,
+)
+from fastmllp.metrics import ServerMetrics
+from fastmllp.mllp import frame
+
+MESSAGE = b"MSH|^~\\&|S|F|R|RF|||ADT^A01|%d|P|2.5\rPID|1\r"
+
+
+def test_capture_round_trip_ignores_torn_tail(tmp_path) -> None:
+    path = tmp_path / "traffic.capture"
+    with CaptureWriter(path) as writer:
+        writer.write(MESSAGE % 1, connection=7, timestamp=100.5)
+        writer.write(MESSAGE % 2, connection=8, timestamp=101.25, peer="10.0.0.8:4100")
+    with open(path, "ab") as handle:
+        handle.write(b"\x00" * 10)
+    assert list(iter_capture(path)) == [
+        CaptureRecord(100.5, 7, MESSAGE % 1),
+        CaptureRecord(101.25, 8, MESSAGE % 2, "10.0.0.8:4100"),
+    ]
+
+    data = bytearray(path.read_bytes())
+    data[-20] ^= 0xFF
+    path.write_bytes(bytes(data))
+    with pytest.raises(CaptureError):
+        list(iter_capture(path))
+
+
+def test_iter_capture_reads_plain_frame_files(tmp_path) -> None:
+    path = tmp_path / "dump.mllp"
+    path.write_bytes(frame(MESSAGE % 1) + frame(MESSAGE % 2))
+    assert list(iter_capture(path)) == [
+        CaptureRecord(None, 0, MESSAGE % 1),
+        CaptureRecord(None, 0, MESSAGE % 2),
+    ]
+
+
+def test_recorder_rotates_and_compresses_segments(tmp_path) -> None:
+    metrics = ServerMetrics()
+    with CaptureRecorder(tmp_path, segment_size=300, compress=True, metrics=metrics) as recorder:
+        for index in range(10):
+            recorder.record([MESSAGE % index], index % 2, f"10.0.0.{index % 2}:4000")
+            time.sleep(0.01)
+    names = sorted(path.name for path in tmp_path.iterdir())
+    assert len(names) > 1
+    assert all(name.endswith(".capture.gz") for name in names)
+    records = list(iter_capture(tmp_path))
+    assert [record.payload for record in records] == [MESSAGE % index for index in range(10)]
+    assert [record.connection for record in records] == [index % 2 for index in range(10)]
+    assert records[1].peer == "10.0.0.1:4000"
+    assert metrics.capture_frames.value() == 10
+    assert metrics.capture_segments.value() == len(names)
+
+    # A new recorder continues numbering after the existing segments.
+    with CaptureRecorder(tmp_path) as recorder:
+        recorder.record([MESSAGE % 10], 5)
+    assert [record.payload for record in iter_capture(tmp_path)][-1] == MESSAGE % 10
+
+
+def test_recorder_rotates_by_age_and_drops_beyond_max_pending(tmp_path) -> None:
+    recorder = CaptureRecorder(tmp_path, segment_seconds=0.05)
+    try:
+        recorder.record([MESSAGE % 1], 1)
+        deadline = time.monotonic() + 5
+        while not list(tmp_path.iterdir()) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.2)
+        recorder.record([MESSAGE % 2], 1)
+    finally:
+        recorder.close()
+    assert len(list(tmp_path.iterdir())) == 2
+    assert [record.payload for record in iter_capture(tmp_path)] == [MESSAGE % 1, MESSAGE % 2]
+
+    recorder = CaptureRecorder(tmp_path / "small", max_pending=len(MESSAGE % 1) * 2)
+    with recorder:
+        recorder.record([MESSAGE % index for index in range(5)], 1)
+    assert recorder.dropped == 3
+    assert len(list(iter_capture(tmp_path / "small"))) == 2
+
+
+def test_merge_captures_orders_by_timestamp(tmp_path) -> None:
+    for name, timestamps in (("a.capture", (1.0, 3.0)), ("b.capture", (2.0, 4.0))):
+        with CaptureWriter(tmp_path / name) as writer:
+            for timestamp in timestamps:
+                writer.write(MESSAGE % int(timestamp), timestamp=timestamp)
+    compressed = tmp_path / "b.capture.gz"
+    compressed.write_bytes(gzip.compress((tmp_path / "b.capture").read_bytes()))
+    paths = [tmp_path / "a.capture", compressed]
+    assert [record.timestamp for record in merge_captures(paths)] == [1.0, 2.0, 3.0, 4.0]
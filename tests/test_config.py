@@ -0,0 +1,329 @@
+import argparse
+
+import pytest
+
+from fastmllp.config import (
+    parse_address,
+    resolve_client_config,
+    resolve_proxy_config,
+    resolve_server_config,
+)
+
+
+def server_args(**overrides: object) -> argparse.Namespace:
+    values = {
+        "host": None,
+        "port": None,
+        "timeout": None,
+        "encoding": None,
+        "max_size": None,
+        "engine": None,
+        "recv_buffer": None,
+        "metrics_port": None,
+        "workers": None,
+        "max_connections": None,
+        "overload": None,
+        "backlog": None,
+        "handler": None,
+        "handler_mode": None,
+        "handler_workers": None,
+        "max_in_flight": None,
+        "journal_dir": None,
+        "journal_segment_size": None,
+        "journal_commit_window": None,
+        "capture_dir": None,
+        "capture_segment_size": None,
+        "capture_segment_seconds": None,
+        "capture_compress": None,
+        "dedupe": None,
+        "dedupe_ttl": None,
+        "dedupe_capacity": None,
+        "dedupe_max_bytes": None,
+        "limit_rate": None,
+        "limit_burst": None,
+        "limit_key": None,
+        "tls_cert": None,
+        "tls_key": None,
+        "tls_ca": None,
+        "tls_require_client_cert": None,
+        "tls_ciphers": None,
+        "tls_session_tickets": None,
+        "tls_reload_interval": None,
+        "log_level": None,
+        "log_message": None,
+        "log_format": None,
+        "log_queue": None,
+    }
+    values.update(overrides)
+    return argparse.Namespace(**values)
+
+
+def test_server_config_defaults() -> None:
+    resolved = resolve_server_config(server_args(), {})
+    assert resolved["engine"] == "threaded"
+    assert resolved["recv_buffer"] == 65536
+
+
+def test_server_config_precedence(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("FASTMLLP_RECV_BUFFER", "8192")
+    config = {"server": {"recv_buffer": 16384, "engine": "asyncio"}}
+    resolved = resolve_server_config(server_args(), config)
+    assert resolved["recv_buffer"] == 8192
+    assert resolved["engine"] == "asyncio"
+
+    resolved = resolve_server_config(server_args(recv_buffer=1024), config)
+    assert resolved["recv_buffer"] == 1024
+
+
+def test_server_config_rejects_invalid_values() -> None:
+    with pytest.raises(ValueError):
+        resolve_server_config(server_args(), {"server": {"engine": "forked"}})
+    with pytest.raises(ValueError):
+        resolve_server_config(server_args(), {"server": {"recv_buffer": 0}})
+
+
+def test_server_connection_limits(monkeypatch: pytest.MonkeyPatch) -> None:
+    resolved = resolve_server_config(server_args(), {})
+    assert resolved["max_connections"] == 1024
+    assert resolved["overload"] == "wait"
+
+    monkeypatch.setenv("FASTMLLP_OVERLOAD", "close")
+    config = {"server": {"max_connections": 64, "backlog": 16}}
+    resolved = resolve_server_config(server_args(backlog=32), config)
+    assert resolved["max_connections"] == 64
+    assert resolved["overload"] == "close"
+    assert resolved["backlog"] == 32
+
+    with pytest.raises(ValueError):
+        resolve_server_config(server_args(max_connections=0), {})
+    with pytest.raises(ValueError):
+        resolve_server_config(server_args(overload="drop"), {})
+
+
+def test_server_handler_options(monkeypatch: pytest.MonkeyPatch) -> None:
+    resolved = resolve_server_config(server_args(), {})
+    assert resolved["handler"] is None
+    assert resolved["handler_mode"] == "inline"
+    assert resolved["max_in_flight"] == 8
+
+    monkeypatch.setenv("FASTMLLP_HANDLER_MODE", "process")
+    config = {"server": {"handler": "app:check", "handler_workers": 4, "max_in_flight": 2}}
+    resolved = resolve_server_config(server_args(max_in_flight=16), config)
+    assert resolved["handler"] == "app:check"
+    assert resolved["handler_mode"] == "process"
+    assert resolved["handler_workers"] == 4
+    assert resolved["max_in_flight"] == 16
+
+    with pytest.raises(ValueError):
+        resolve_server_config(server_args(handler_mode="fiber"), {})
+
+
+def test_server_journal_options(monkeypatch: pytest.MonkeyPatch) -> None:
+    resolved = resolve_server_config(server_args(), {})
+    assert resolved["journal_dir"] is None
+    assert resolved["journal_commit_window"] == 0.0
+
+    monkeypatch.setenv("FASTMLLP_JOURNAL_COMMIT_WINDOW", "0.002")
+    config = {"server": {"journal_dir": "/var/lib/fastmllp", "journal_segment_size": 4096}}
+    resolved = resolve_server_config(server_args(journal_dir="journal"), config)
+    assert resolved["journal_dir"] == "journal"
+    assert resolved["journal_segment_size"] == 4096
+    assert resolved["journal_commit_window"] == 0.002
+
+    with pytest.raises(ValueError):
+        resolve_server_config(server_args(journal_commit_window=-1.0), {})
+
+
+def test_server_capture_options(monkeypatch: pytest.MonkeyPatch) -> None:
+    resolved = resolve_server_config(server_args(), {})
+    assert resolved["capture_dir"] is None
+    assert resolved["capture_segment_seconds"] == 3600.0
+    assert resolved["capture_compress"] is False
+
+    monkeypatch.setenv("FASTMLLP_CAPTURE_COMPRESS", "true")
+    config = {"server": {"capture_dir": "/var/lib/fastmllp/capture", "capture_segment_size": 4096}}
+    resolved = resolve_server_config(server_args(capture_segment_seconds=0.0), config)
+    assert resolved["capture_dir"] == "/var/lib/fastmllp/capture"
+    assert resolved["capture_segment_size"] == 4096
+    assert resolved["capture_segment_seconds"] == 0.0
+    assert resolved["capture_compress"] is True
+
+    with pytest.raises(ValueError):
+        resolve_server_config(server_args(capture_segment_size=0), {})
+
+
+def test_server_limit_options(monkeypatch: pytest.MonkeyPatch) -> None:
+    resolved = resolve_server_config(server_args(), {})
+    assert resolved["limit_rate"] == 0.0
+    assert resolved["limit_burst"] is None
+    assert resolved["limit_key"] == "peer"
+    for limits in ({"rate": -1}, {"burst": 0}, {"key": "connection"}, {"rate": "fast"}):
+        with pytest.raises(ValueError):
+            resolve_server_config(server_args(), {"server": {"limits": limits}})
+    with pytest.raises(ValueError):
+        resolve_server_config(server_args(), {"server": {"limits": 100}})
+
+    monkeypatch.setenv("FASTMLLP_LIMIT_BURST", "50")
+    config = {"server": {"limits": {"rate": 200, "burst": 20, "key": "sender"}}}
+    resolved = resolve_server_config(server_args(), config)
+    assert resolved["limit_rate"] == 200.0
+    assert resolved["limit_burst"] == 50.0
+    assert resolved["limit_key"] == "sender"
+    resolved = resolve_server_config(server_args(limit_rate=0.0), config)
+    assert resolved["limit_rate"] == 0.0
+
+
+def test_proxy_options(monkeypatch: pytest.MonkeyPatch) -> None:
+    def proxy_args(**overrides: object) -> argparse.Namespace:
+        values = {
+            "upstream": None,
+            "ack_mode": None,
+            "upstream_connections": None,
+            "upstream_in_flight": None,
+        }
+        values.update(overrides)
+        return server_args(**values)
+
+    with pytest.raises(ValueError):
+        resolve_proxy_config(proxy_args(), {})
+
+    monkeypatch.setenv("FASTMLLP_UPSTREAM_IN_FLIGHT", "16")
+    config = {
+        "server": {"port": 2600},
+        "proxy": {"port": 2700, "upstream": ["ehr-a:2575", "[::1]:2576"], "ack_mode": "local"},
+    }
+    resolved = resolve_proxy_config(proxy_args(upstream_connections=4), config)
+    assert resolved["port"] == 2700
+    assert resolved["upstream"] == [("ehr-a", 2575), ("::1", 2576)]
+    assert resolved["ack_mode"] == "local"
+    assert resolved["upstream_connections"] == 4
+    assert resolved["upstream_in_flight"] == 16
+
+    resolved = resolve_proxy_config(proxy_args(upstream="ehr-b:2575,ehr-c:2575"), {})
+    assert resolved["upstream"] == [("ehr-b", 2575), ("ehr-c", 2575)]
+    assert resolved["ack_mode"] == "relay"
+    with pytest.raises(ValueError):
+        resolve_proxy_config(proxy_args(upstream="ehr-b"), {})
+    with pytest.raises(ValueError):
+        resolve_proxy_config(proxy_args(upstream="ehr-b:2575", ack_mode="never"), {})
+
+
+def test_parse_address() -> None:
+    assert parse_address("0.0.0.0:2575") == ("0.0.0.0", 2575)
+    assert parse_address("[::]:2575") == ("::", 2575)
+    for value in ("2575", "host:", "host:99999"):
+        with pytest.raises(ValueError):
+            parse_address(value)
+
+
+def test_server_dedupe_options(monkeypatch: pytest.MonkeyPatch) -> None:
+    resolved = resolve_server_config(server_args(), {})
+    assert resolved["dedupe"] is False
+    assert resolved["dedupe_ttl"] == 300.0
+
+    monkeypatch.setenv("FASTMLLP_DEDUPE", "yes")
+    monkeypatch.setenv("FASTMLLP_DEDUPE_CAPACITY", "500")
+    config = {"server": {"dedupe": False, "dedupe_ttl": 60}}
+    resolved = resolve_server_config(server_args(dedupe_max_bytes=1024), config)
+    assert resolved["dedupe"] is True
+    assert resolved["dedupe_ttl"] == 60.0
+    assert resolved["dedupe_capacity"] == 500
+    assert resolved["dedupe_max_bytes"] == 1024
+
+    with pytest.raises(ValueError):
+        resolve_server_config(server_args(dedupe_ttl=0.0), {})
+
+
+def client_args(**overrides: object) -> argparse.Namespace:
+    values = {
+        "host": None,
+        "port": None,
+        "timeout": None,
+        "encoding": None,
+        "window": None,
+        "tls": None,
+        "tls_ca": None,
+        "tls_cert": None,
+        "tls_key": None,
+        "tls_ciphers": None,
+        "tls_server_name": None,
+        "tls_verify": None,
+        "log_level": None,
+        "log_message": None,
+        "log_format": None,
+        "log_queue": None,
+    }
+    values.update(overrides)
+    return argparse.Namespace(**values)
+
+
+def test_server_tls_options(monkeypatch: pytest.MonkeyPatch) -> None:
+    resolved = resolve_server_config(server_args(), {})
+    assert resolved["tls_cert"] is None
+    assert resolved["tls_session_tickets"] is True
+    assert resolved["tls_reload_interval"] == 60.0
+
+    monkeypatch.setenv("FASTMLLP_TLS_CA", "/etc/ca.pem")
+    monkeypatch.setenv("FASTMLLP_TLS_SESSION_TICKETS", "off")
+    config = {"server": {"tls_cert": "/etc/cert.pem", "tls_require_client_cert": True}}
+    resolved = resolve_server_config(server_args(tls_reload_interval=0.0), config)
+    assert resolved["tls_cert"] == "/etc/cert.pem"
+    assert resolved["tls_ca"] == "/etc/ca.pem"
+    assert resolved["tls_require_client_cert"] is True
+    assert resolved["tls_session_tickets"] is False
+    assert resolved["tls_reload_interval"] == 0.0
+
+    with pytest.raises(ValueError):
+        resolve_server_config(server_args(), {"server": {"tls_require_client_cert": True}})
+    with pytest.raises(ValueError):
+        resolve_server_config(server_args(tls_key="/etc/key.pem"), {})
+
+
+def test_client_tls_options(monkeypatch: pytest.MonkeyPatch) -> None:
+    resolved = resolve_client_config(client_args(), {})
+    assert resolved["tls"] is False
+    assert resolved["tls_verify"] is True
+
+    # A CA bundle turns TLS on without --tls.
+    resolved = resolve_client_config(client_args(), {"client": {"tls_ca": "/etc/ca.pem"}})
+    assert resolved["tls"] is True
+    monkeypatch.setenv("FASTMLLP_TLS_VERIFY", "false")
+    resolved = resolve_client_config(client_args(tls=True, tls_server_name="mllp.example"), {})
+    assert resolved["tls"] is True
+    assert resolved["tls_verify"] is False
+    assert resolved["tls_server_name"] == "mllp.example"
+
+
+def test_client_config_window(monkeypatch: pytest.MonkeyPatch) -> None:
+    args = client_args()
+    assert resolve_client_config(args, {})["window"] == 8
+    assert resolve_client_config(args, {"client": {"window": 32}})["window"] == 32
+    monkeypatch.setenv("FASTMLLP_WINDOW", "0")
+    with pytest.raises(ValueError):
+        resolve_client_config(args, {})
+
+
+def test_logging_config(monkeypatch: pytest.MonkeyPatch) -> None:
+    resolved = resolve_server_config(server_args(), {})
+    assert resolved["log_format"] == "text"
+    assert resolved["log_queue"] is False
+    assert resolved["log_sample"] == {}
+
+    config = {
+        "logging": {
+            "log_format": "json",
+            "log_sample": {"message_received": 100},
+            "log_rate_limit": {"connect": 50},
+        }
+    }
+    monkeypatch.setenv("FASTMLLP_LOG_QUEUE", "true")
+    resolved = resolve_server_config(server_args(), config)
+    assert resolved["log_format"] == "json"
+    assert resolved["log_queue"] is True
+    assert resolved["log_sample"] == {"message_received": 100}
+    assert resolved["log_rate_limit"] == {"connect": 50.0}
+
+    with pytest.raises(ValueError):
+        resolve_server_config(server_args(), {"logging": {"log_sample": {"connect": 0}}})
+    with pytest.raises(ValueError):
+        resolve_server_config(server_args(log_format="xml"), {})
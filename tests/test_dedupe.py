@@ -0,0 +1,87 @@
+import pytest
+
+from fastmllp.dedupe import DedupeCache, entry_size, message_key
+from fastmllp.metrics import ServerMetrics
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def key(control_id: str) -> tuple[str, str, str]:
+    return ("S", "F", control_id)
+
+
+def test_message_key() -> None:
+    payload = b"MSH|^~\\&|LAB|NORTH|R|RF|||ORU^R01|42|P|2.5\rPID|1"
+    assert message_key(payload) == ("LAB", "NORTH", "42")
+    assert message_key(b"MSH|^~\\&|LAB|NORTH|R|RF|||ORU^R01||P|2.5") is None
+
+
+def test_dedupe_repeats_recorded_ack_code() -> None:
+    metrics = ServerMetrics()
+    cache = DedupeCache(metrics=metrics)
+    assert cache.claim(key("1")) is None
+    # A duplicate of a frame still being handled is ACKed AA.
+    assert cache.claim(key("1")) == "AA"
+    cache.resolve(key("1"), "AR")
+    assert cache.claim(key("1")) == "AR"
+    # The same control ID from another sender is a different message.
+    assert cache.claim(("OTHER", "F", "1")) is None
+    assert cache.claim(None) is None
+    assert metrics.dedupe_hits.value() == 2
+    assert metrics.dedupe_misses.value() == 2
+    assert metrics.dedupe_entries.value() == 2
+
+
+def test_dedupe_forgets_rejected_messages() -> None:
+    metrics = ServerMetrics()
+    cache = DedupeCache(metrics=metrics)
+    cache.claim(key("1"))
+    cache.resolve(key("1"), "AE")
+    assert len(cache) == 0
+    assert metrics.dedupe_entries.value() == 0
+    assert cache.claim(key("1")) is None
+
+
+def test_dedupe_entries_expire() -> None:
+    clock = FakeClock()
+    metrics = ServerMetrics()
+    cache = DedupeCache(ttl=10.0, metrics=metrics, clock=clock)
+    cache.claim(key("1"))
+    clock.now = 5.0
+    cache.claim(key("2"))
+    assert cache.claim(key("1")) == "AA"
+    clock.now = 12.0
+    assert cache.claim(key("1")) is None
+    assert cache.claim(key("2")) == "AA"
+    clock.now = 30.0
+    cache.claim(key("3"))
+    assert len(cache) == 1
+    assert metrics.dedupe_entries.value() == 1
+
+
+def test_dedupe_evicts_least_recently_seen() -> None:
+    cache = DedupeCache(capacity=2)
+    cache.claim(key("1"))
+    cache.claim(key("2"))
+    cache.claim(key("1"))
+    cache.claim(key("3"))
+    assert cache.claim(key("1")) == "AA"
+    assert cache.claim(key("2")) is None
+
+    cache = DedupeCache(max_bytes=entry_size(key("1")) * 3)
+    for index in range(10):
+        cache.claim(key(str(index)))
+    assert len(cache) == 3
+
+
+def test_dedupe_rejects_invalid_limits() -> None:
+    with pytest.raises(ValueError):
+        DedupeCache(capacity=0)
+    with pytest.raises(ValueError):
+        DedupeCache(ttl=0.0)
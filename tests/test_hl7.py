@@ -1,4 +1,15 @@
-from fastmllp.hl7 import parse_msh
+import io
+
+import pytest
+
+from fastmllp.hl7 import (
+    HL7Message,
+    decode_message,
+    iter_messages,
+    parse_msa,
+    parse_msh,
+    parse_msh_bytes,
+)
 
 
 def test_parse_msh_fields() -> None:
@@ -25,3 +36,102 @@ def test_parse_msh_defaults_when_missing() -> None:
     assert parsed["field_sep"] == "|"
     assert parsed["encoding_chars"] == "^~\\&"
     assert parsed["sending_app"] == ""
+
+
+def test_parse_msa_uses_msh_field_separator() -> None:
+    ack = "MSH#^~\\&#R#RF#S#F#20240101120000##ACK^A01#ABC#P#2.3\rMSA#AE#123#bad\r"
+    parsed = parse_msa(ack)
+    assert parsed["ack_code"] == "AE"
+    assert parsed["control_id"] == "123"
+    assert parsed["text"] == "bad"
+
+
+def test_parse_msa_defaults_when_missing() -> None:
+    assert parse_msa("MSH|^~\\&|R")["control_id"] == ""
+
+
+def test_iter_messages_splits_on_msh_across_chunks() -> None:
+    data = (
+        b"FHS|^~\\&\rBHS|^~\\&\r"
+        b"MSH|^~\\&|A|||||||1\rPID|1\r"
+        b"MSH|^~\\&|B|||||||2\nPID|MSH\n"
+        b"MSH|^~\\&|C|||||||3\r"
+        b"BTS|3\rFTS|1\r"
+    )
+    for chunk_size in (1, 2, 5, 4096):
+        messages = list(iter_messages(io.BytesIO(data), chunk_size=chunk_size))
+        assert messages == [
+            b"MSH|^~\\&|A|||||||1\rPID|1\r",
+            b"MSH|^~\\&|B|||||||2\nPID|MSH\n",
+            b"MSH|^~\\&|C|||||||3\r",
+        ]
+
+
+def test_iter_messages_skips_input_without_msh() -> None:
+    assert list(iter_messages(io.BytesIO(b"PID|1\rOBX|1\r"))) == []
+
+
+def test_parse_msh_bytes_matches_parse_msh() -> None:
+    message = b"MSH|^~\\&|SND|SF|RCV|RF|20240101120000||ADT^A01|123|P|2.3\rPID|1||" + b"X" * 5000
+    expected = parse_msh(message.decode())
+    assert parse_msh_bytes(message) == expected
+    assert parse_msh_bytes(memoryview(message)) == expected
+    assert parse_msh_bytes(memoryview(b"PID|1")) == parse_msh("PID|1")
+
+
+def test_parse_msh_bytes_honours_msh18_charset() -> None:
+    message = "MSH|^~\\&|MÜNCHEN|SF|RCV|RF|||ADT^A01|1|P|2.5||||||8859/1\rPID|1||Ä".encode(
+        "latin-1"
+    )
+    parsed = parse_msh_bytes(message)
+    assert parsed["sending_app"] == "MÜNCHEN"
+    assert parsed["charset"] == "8859/1"
+    assert decode_message(message).endswith("PID|1||Ä")
+
+
+def test_parse_msh_bytes_long_segment_in_memoryview() -> None:
+    message = b"MSH|^~\\&|" + b"A" * 3000 + b"|SF|RCV|RF|||ADT^A01|9|P|2.5\rPID|1"
+    assert parse_msh_bytes(memoryview(message))["control_id"] == "9"
+
+
+def test_hl7_message_field_paths() -> None:
+    message = HL7Message(
+        b"MSH|^~\\&|LAB|HOSP|EHR|HOSP|20240101||ORU^R01|MSG1|P|2.5\r"
+        b"PID|1||123^^^HOSP&1.2.3&ISO^MR~456^^^SSA^SS||DOE^JANE\r"
+        b"OBX|1|NM|WBC||7.2\r"
+        b"OBX|2|NM|RBC||4.5\n"
+        b"ZPD\r"
+    )
+    assert len(message) == 5
+    assert message["MSH-1"] == "|"
+    assert message["MSH-2"] == "^~\\&"
+    assert message["MSH-9.2"] == "R01"
+    assert message["MSH-10"] == "MSG1"
+    assert message["PID-3"] == "123^^^HOSP&1.2.3&ISO^MR~456^^^SSA^SS"
+    assert message["PID-3.1"] == "123"
+    assert message["PID-3.4.2"] == "1.2.3"
+    assert message["PID-5.2"] == "JANE"
+    assert message["OBX-5"] == "7.2"
+    assert message["OBX(2)-5"] == "4.5"
+    assert message["OBX(3)-5"] == ""
+    assert message["PID-30"] == ""
+    assert message["PV1-2"] == ""
+    assert [segment[3] for segment in message.segments("OBX")] == ["WBC", "RBC"]
+    assert [segment.name for segment in message] == ["MSH", "PID", "OBX", "OBX", "ZPD"]
+    assert message.segment("ZPD").fields() == ["ZPD"]
+    assert message.segment("PID").repetitions(3)[1] == "456^^^SSA^SS"
+    with pytest.raises(ValueError):
+        message["PID3"]
+
+
+def test_hl7_message_custom_separators_and_charset() -> None:
+    message = HL7Message(
+        "MSH#*!$%#MÜNCHEN#SF#####ADT*A01#9#P#2.5######8859/1\rPID#1##7*X!8*Y".encode("latin-1")
+    )
+    assert message.field_sep == "#"
+    assert message.component_sep == "*"
+    assert message["MSH-3"] == "MÜNCHEN"
+    assert message["MSH-9.2"] == "A01"
+    assert message["PID-3.2"] == "X"
+    assert message.segment("PID").repetitions(3) == ["7*X", "8*Y"]
+    assert HL7Message("MSH|^~\\&|S\rPID|1||Ä")["PID-3"] == "Ä"
@@ -1,17 +1,133 @@
+import asyncio
+import functools
+import json
 import multiprocessing
 import socket
+import threading
 import time
+import urllib.request
+from pathlib import Path
 
 import pytest
 
-from fastmllp.client import send
-from fastmllp.server import serve
+from fastmllp.bench import run_bench
+from fastmllp.capture import iter_capture
+from fastmllp.cli import main
+from fastmllp.client import MLLPClient, send
+from fastmllp.hl7 import parse_msa, parse_msh_bytes
+from fastmllp.metrics import ClientMetrics, ServerMetrics, start_metrics_server
+from fastmllp.mllp import MLLPDecoder, frame, unframe_stream
+from fastmllp.server import serve, serve_async
+from fastmllp.supervisor import serve_workers
 
 
 def run_server(port: int) -> None:
     serve("127.0.0.1", port, timeout=1.0, max_size=1024)
 
 
+def run_metrics_server(port: int, metrics_port: int) -> None:
+    metrics = ServerMetrics()
+    start_metrics_server(metrics.registry, "127.0.0.1", metrics_port)
+    serve("127.0.0.1", port, timeout=1.0, max_size=1024, metrics=metrics)
+
+
+def run_limited_server(port: int, overload: str) -> None:
+    serve("127.0.0.1", port, timeout=5.0, max_connections=1, overload=overload, backlog=8)
+
+
+def check_message(payload: bytes) -> str | None:
+    control_id = int(parse_msh_bytes(payload)["control_id"])
+    # Earlier messages finish last, so pooled results complete out of order.
+    time.sleep((10 - control_id % 10) * 0.002)
+    if control_id % 7 == 6:
+        raise RuntimeError("invalid message")
+    return "AR" if control_id % 2 else None
+
+
+def run_idle_server(port: int) -> None:
+    serve("127.0.0.1", port, timeout=30.0)
+
+
+def run_handler_server(port: int, engine: str, handler_mode: str) -> None:
+    options = {"timeout": 2.0, "handler": check_message, "handler_mode": handler_mode}
+    if engine == "asyncio":
+        asyncio.run(serve_async("127.0.0.1", port, **options, handler_workers=4))
+    else:
+        serve("127.0.0.1", port, **options, handler_workers=4, max_in_flight=4)
+
+
+def stuck_handler(payload: bytes) -> str:
+    time.sleep(3.0)
+    return "AA"
+
+
+def run_journal_server(port: int, engine: str, journal_dir: str) -> None:
+    options = {"timeout": 2.0, "journal_dir": journal_dir, "journal_commit_window": 0.001}
+    if engine == "asyncio":
+        asyncio.run(serve_async("127.0.0.1", port, **options))
+    else:
+        serve("127.0.0.1", port, **options)
+
+
+def run_capture_server(port: int, engine: str, capture_dir: str) -> None:
+    options = {"timeout": 2.0, "capture_dir": capture_dir, "capture_compress": True}
+    if engine == "asyncio":
+        asyncio.run(serve_async("127.0.0.1", port, **options))
+    else:
+        serve("127.0.0.1", port, **options)
+
+
+def run_rate_limited_server(port: int, metrics_port: int, engine: str) -> None:
+    metrics = ServerMetrics()
+    start_metrics_server(metrics.registry, "127.0.0.1", metrics_port)
+    options = {"timeout": 5.0, "metrics": metrics, "limit_rate": 40.0, "limit_burst": 4.0}
+    if engine == "asyncio":
+        asyncio.run(serve_async("127.0.0.1", port, **options))
+    else:
+        serve("127.0.0.1", port, **options)
+
+
+def record_message(path: str, payload: bytes) -> str | None:
+    control_id = parse_msh_bytes(payload)["control_id"]
+    with open(path, "a", encoding="utf-8") as handle:
+        handle.write(control_id + "\n")
+    if control_id == "3":
+        raise RuntimeError("invalid message")
+    return "AR" if control_id == "2" else None
+
+
+def run_dedupe_server(port: int, engine: str, handler_mode: str, path: str) -> None:
+    options = {
+        "timeout": 2.0,
+        "handler": functools.partial(record_message, path),
+        "handler_mode": handler_mode,
+        "dedupe": True,
+    }
+    if engine == "asyncio":
+        asyncio.run(serve_async("127.0.0.1", port, **options))
+    else:
+        serve("127.0.0.1", port, **options)
+
+
+def run_stuck_handler_server(port: int) -> None:
+    serve("127.0.0.1", port, timeout=0.3, handler=stuck_handler, handler_mode="thread")
+
+
+def run_worker_server(port: int, metrics_port: int) -> None:
+    serve_workers(
+        "127.0.0.1",
+        port,
+        workers=2,
+        metrics_port=metrics_port,
+        stats_interval=0.1,
+        timeout=1.0,
+    )
+
+
+def run_async_server(port: int) -> None:
+    asyncio.run(serve_async("127.0.0.1", port, timeout=1.0, max_size=1024))
+
+
 def get_free_port() -> int:
     sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     sock.bind(("127.0.0.1", 0))
@@ -31,6 +147,21 @@ def wait_for_port(host: str, port: int, timeout: float = 2.0) -> bool:
     return False
 
 
+def send_and_hold(port: int, data: bytes, timeout: float = 2.0) -> socket.socket:
+    deadline = time.time() + timeout
+    while True:
+        sock = socket.create_connection(("127.0.0.1", port), timeout=timeout)
+        try:
+            sock.sendall(data)
+            if sock.recv(4096):
+                return sock
+        except ConnectionError:
+            if time.time() > deadline:
+                raise
+        sock.close()
+        time.sleep(0.05)
+
+
 def test_client_server_round_trip() -> None:
     port = get_free_port()
     process = multiprocessing.Process(target=run_server, args=(port,), daemon=True)
@@ -63,3 +194,650 @@ def test_server_rejects_oversize_payload() -> None:
     finally:
         process.terminate()
         process.join(timeout=2)
+
+
+def test_async_server_round_trip() -> None:
+    port = get_free_port()
+    process = multiprocessing.Process(target=run_async_server, args=(port,), daemon=True)
+    process.start()
+    try:
+        assert wait_for_port("127.0.0.1", port)
+        message = (
+            "MSH|^~\\&|S|F|R|RF|20240101120000||ADT^A01|123|P|2.3\r"
+            "PID|1||123"
+        )
+        ack = send(message, "127.0.0.1", port, timeout=2.0)
+        assert "MSA|AA|123" in ack
+    finally:
+        process.terminate()
+        process.join(timeout=2)
+
+
+def test_async_server_acks_concurrent_connections_in_order() -> None:
+    port = get_free_port()
+    process = multiprocessing.Process(target=run_async_server, args=(port,), daemon=True)
+    process.start()
+    sockets: list[socket.socket] = []
+    try:
+        assert wait_for_port("127.0.0.1", port)
+        for index in range(50):
+            sock = socket.create_connection(("127.0.0.1", port), timeout=2.0)
+            sockets.append(sock)
+            data = b"".join(
+                frame(f"MSH|^~\\&|S|F|R|RF|||ADT^A01|{index}-{n}|P|2.3".encode())
+                for n in range(3)
+            )
+            sock.sendall(data)
+        for index, sock in enumerate(sockets):
+            buffer = b""
+            acks: list[bytes] = []
+            while len(acks) < 3:
+                chunk = sock.recv(4096)
+                assert chunk
+                frames, buffer = unframe_stream(buffer + chunk)
+                acks.extend(frames)
+            for n, ack in enumerate(acks):
+                assert f"MSA|AA|{index}-{n}".encode() in ack
+    finally:
+        for sock in sockets:
+            sock.close()
+        process.terminate()
+        process.join(timeout=2)
+
+
+def test_async_server_rejects_oversize_payload() -> None:
+    port = get_free_port()
+    process = multiprocessing.Process(target=run_async_server, args=(port,), daemon=True)
+    process.start()
+    try:
+        assert wait_for_port("127.0.0.1", port)
+        payload = "MSH|^~\\&|S|F|R|RF|20240101120000||ADT^A01|123|P|2.3\r" + ("X" * 2000)
+        with pytest.raises(ConnectionError):
+            send(payload, "127.0.0.1", port, timeout=1.0)
+    finally:
+        process.terminate()
+        process.join(timeout=2)
+
+
+def test_client_reuses_pooled_connection() -> None:
+    port = get_free_port()
+    process = multiprocessing.Process(target=run_server, args=(port,), daemon=True)
+    process.start()
+    try:
+        assert wait_for_port("127.0.0.1", port)
+        with MLLPClient(timeout=2.0) as client:
+            for control_id in ("1", "2", "3"):
+                message = f"MSH|^~\\&|S|F|R|RF|||ADT^A01|{control_id}|P|2.3"
+                assert f"MSA|AA|{control_id}" in client.send(message, "127.0.0.1", port)
+            idle = list(client.pool("127.0.0.1", port)._idle)
+            assert len(idle) == 1
+            assert idle[0].exchanges == 3
+    finally:
+        process.terminate()
+        process.join(timeout=2)
+
+
+def test_client_reconnects_after_server_idle_timeout() -> None:
+    port = get_free_port()
+    process = multiprocessing.Process(target=run_server, args=(port,), daemon=True)
+    process.start()
+    try:
+        assert wait_for_port("127.0.0.1", port)
+        message = "MSH|^~\\&|S|F|R|RF|||ADT^A01|123|P|2.3"
+        with MLLPClient(timeout=2.0) as client:
+            client.send(message, "127.0.0.1", port)
+            first = client.pool("127.0.0.1", port)._idle[0]
+            time.sleep(1.3)
+            assert "MSA|AA|123" in client.send(message, "127.0.0.1", port)
+            second = client.pool("127.0.0.1", port)._idle[0]
+            assert second is not first
+    finally:
+        process.terminate()
+        process.join(timeout=2)
+
+
+def test_client_pipelines_messages_in_order() -> None:
+    port = get_free_port()
+    process = multiprocessing.Process(target=run_server, args=(port,), daemon=True)
+    process.start()
+    try:
+        assert wait_for_port("127.0.0.1", port)
+        messages = [f"MSH|^~\\&|S|F|R|RF|||ADT^A01|{index}|P|2.3" for index in range(100)]
+        with MLLPClient(timeout=2.0) as client:
+            acks = list(client.send_many(messages, "127.0.0.1", port, window=16))
+        assert [ack.split("\r")[1] for ack in acks] == [
+            f"MSA|AA|{index}" for index in range(100)
+        ]
+    finally:
+        process.terminate()
+        process.join(timeout=2)
+
+
+def test_client_pipeline_reorders_out_of_order_acks() -> None:
+    listener = socket.create_server(("127.0.0.1", 0))
+    port = listener.getsockname()[1]
+    batches: list[int] = []
+
+    def reversing_peer() -> None:
+        conn, _ = listener.accept()
+        decoder = MLLPDecoder()
+        pending: list[bytes] = []
+        with conn:
+            while True:
+                chunk = conn.recv(4096)
+                if not chunk:
+                    return
+                pending.extend(decoder.feed(chunk))
+                if not batches and len(pending) < 2:
+                    continue
+                batches.append(len(pending))
+                for payload in reversed(pending):
+                    control_id = payload.split(b"|")[9]
+                    ack = b"MSH|^~\\&|R|RF|S|F|||ACK|X|P|2.3\rMSA|AA|" + control_id
+                    conn.sendall(frame(ack))
+                pending.clear()
+
+    thread = threading.Thread(target=reversing_peer, daemon=True)
+    thread.start()
+    try:
+        messages = [f"MSH|^~\\&|S|F|R|RF|||ADT^A01|{index}|P|2.3" for index in range(5)]
+        with MLLPClient(timeout=2.0) as client:
+            acks = list(client.send_many(messages, "127.0.0.1", port, window=2))
+        assert [ack.split("\r")[1] for ack in acks] == [f"MSA|AA|{index}" for index in range(5)]
+        # After the reordered pair the client falls back to stop-and-wait.
+        assert batches == [2, 1, 1, 1]
+    finally:
+        listener.close()
+
+
+def test_client_pipeline_discards_uncorrelated_acks() -> None:
+    listener = socket.create_server(("127.0.0.1", 0))
+    port = listener.getsockname()[1]
+
+    def stray_ack_peer() -> None:
+        conn, _ = listener.accept()
+        decoder = MLLPDecoder()
+        with conn:
+            conn.sendall(frame(b"MSH|^~\\&|R|RF|S|F|||ACK|X|P|2.3\rMSA|AA|ZZZ"))
+            while True:
+                chunk = conn.recv(4096)
+                if not chunk:
+                    return
+                for payload in decoder.feed(chunk):
+                    control_id = payload.split(b"|")[9]
+                    ack = b"MSH|^~\\&|R|RF|S|F|||ACK|X|P|2.3\rMSA|AA|" + control_id
+                    conn.sendall(frame(ack))
+
+    thread = threading.Thread(target=stray_ack_peer, daemon=True)
+    thread.start()
+    try:
+        messages = [f"MSH|^~\\&|S|F|R|RF|||ADT^A01|{index}|P|2.3" for index in range(1, 4)]
+        with MLLPClient(timeout=2.0) as client:
+            connection = client.pool("127.0.0.1", port).connect()
+            payloads = [message.encode() for message in messages]
+            acks = list(connection.pipeline(payloads, window=3, encoding="utf-8"))
+            connection.close()
+        assert [ack.split(b"\r")[1] for ack in acks] == [b"MSA|AA|1", b"MSA|AA|2", b"MSA|AA|3"]
+    finally:
+        listener.close()
+
+
+def test_cli_batch_send_writes_ndjson(tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    port = get_free_port()
+    process = multiprocessing.Process(target=run_server, args=(port,), daemon=True)
+    process.start()
+    try:
+        assert wait_for_port("127.0.0.1", port)
+        batch = tmp_path / "batch.hl7"
+        batch.write_bytes(
+            b"".join(
+                f"MSH|^~\\&|S|F|R|RF|||ADT^A01|{index}|P|2.3\rPID|1||{index}\r".encode()
+                for index in range(25)
+            )
+        )
+        exit_code = main(
+            [
+                "send",
+                "--batch",
+                "--no-progress",
+                "--host",
+                "127.0.0.1",
+                "--port",
+                str(port),
+                "--file",
+                str(batch),
+            ]
+        )
+        captured = capsys.readouterr()
+        assert exit_code == 0
+        records = [json.loads(line) for line in captured.out.splitlines()]
+        assert [record["control_id"] for record in records] == [str(i) for i in range(25)]
+        assert all(record["ack_code"] == "AA" for record in records)
+        assert "sent 25 messages" in captured.err
+    finally:
+        process.terminate()
+        process.join(timeout=2)
+
+
+def test_bench_against_server() -> None:
+    port = get_free_port()
+    process = multiprocessing.Process(target=run_server, args=(port,), daemon=True)
+    process.start()
+    try:
+        assert wait_for_port("127.0.0.1", port)
+        report = run_bench("127.0.0.1", port, connections=2, window=4, count=50, size=256)
+        assert report["sent"] == report["acked"] == 50
+        assert report["errors"] == report["timeouts"] == 0
+        assert 0 < report["latency_ms"]["p50"] <= report["latency_ms"]["p99.9"]
+    finally:
+        process.terminate()
+        process.join(timeout=2)
+
+
+def test_server_and_client_metrics() -> None:
+    port = get_free_port()
+    metrics_port = get_free_port()
+    process = multiprocessing.Process(
+        target=run_metrics_server,
+        args=(port, metrics_port),
+        daemon=True,
+    )
+    process.start()
+    try:
+        assert wait_for_port("127.0.0.1", port)
+        client_metrics = ClientMetrics()
+        messages = [f"MSH|^~\\&|S|F|R|RF|||ADT^A01|{index}|P|2.3" for index in range(10)]
+        with MLLPClient(timeout=2.0, metrics=client_metrics) as client:
+            assert len(list(client.send_many(messages, "127.0.0.1", port))) == 10
+            client.send(messages[0], "127.0.0.1", port)
+        with pytest.raises(ConnectionError):
+            send("MSH|^~\\&|S|F|R|RF|||ADT^A01|1|P|2.3" + "X" * 2000, "127.0.0.1", port)
+
+        url = f"http://127.0.0.1:{metrics_port}/metrics"
+        with urllib.request.urlopen(url, timeout=2.0) as response:
+            body = response.read().decode()
+        assert "# TYPE fastmllp_frames_received_total counter" in body
+        assert "fastmllp_frames_received_total 11" in body
+        # The wait_for_port probe, the pooled client, and the oversize send.
+        assert "fastmllp_connections_total 3" in body
+        assert "fastmllp_frames_too_large_total 1" in body
+        assert 'fastmllp_ack_latency_seconds_bucket{le="+Inf"} 11' in body
+
+        snapshot = client_metrics.snapshot()
+        assert snapshot["fastmllp_client_messages_sent_total"] == 11
+        assert snapshot["fastmllp_client_acks_received_total"] == 11
+        assert snapshot["fastmllp_client_connections_opened_total"] == 1
+        assert snapshot["fastmllp_client_ack_latency_seconds"]["count"] == 11
+    finally:
+        process.terminate()
+        process.join(timeout=2)
+
+
+def test_server_stats_callback() -> None:
+    port = get_free_port()
+    snapshots: multiprocessing.Queue = multiprocessing.Queue()
+    process = multiprocessing.Process(
+        target=serve,
+        args=("127.0.0.1", port),
+        kwargs={"timeout": 1.0, "stats_callback": snapshots.put, "stats_interval": 0.05},
+        daemon=True,
+    )
+    process.start()
+    try:
+        assert wait_for_port("127.0.0.1", port)
+        send("MSH|^~\\&|S|F|R|RF|||ADT^A01|1|P|2.3", "127.0.0.1", port, timeout=2.0)
+        deadline = time.time() + 2
+        while time.time() < deadline:
+            snapshot = snapshots.get(timeout=1.0)
+            if snapshot["fastmllp_frames_received_total"] == 1:
+                break
+        assert snapshot["fastmllp_frames_received_total"] == 1
+        assert snapshot["fastmllp_frame_size_bytes"]["count"] == 1
+    finally:
+        process.terminate()
+        process.join(timeout=2)
+
+
+def run_stats_server(port: int, engine: str, snapshots: multiprocessing.Queue) -> None:
+    options = {"timeout": 1.0, "stats_callback": snapshots.put, "stats_interval": 0.05}
+    if engine == "asyncio":
+        asyncio.run(serve_async("127.0.0.1", port, **options))
+    else:
+        serve("127.0.0.1", port, **options)
+
+
+@pytest.mark.parametrize("engine", ["threaded", "asyncio"])
+def test_server_coalesces_acks_for_one_read(engine: str) -> None:
+    port = get_free_port()
+    snapshots: multiprocessing.Queue = multiprocessing.Queue()
+    process = multiprocessing.Process(
+        target=run_stats_server, args=(port, engine, snapshots), daemon=True
+    )
+    process.start()
+    try:
+        assert wait_for_port("127.0.0.1", port)
+        messages = [f"MSH|^~\\&|S|F|R|RF|||ADT^A01|{index}|P|2.3" for index in range(20)]
+        acks = []
+        with socket.create_connection(("127.0.0.1", port), timeout=2.0) as sock:
+            sock.sendall(b"".join(frame(message.encode()) for message in messages))
+            decoder = MLLPDecoder()
+            while len(acks) < len(messages):
+                acks.extend(decoder.feed(sock.recv(65536)))
+        assert [parse_msa(ack.decode())["control_id"] for ack in acks] == [
+            str(index) for index in range(20)
+        ]
+        deadline = time.time() + 2
+        while time.time() < deadline:
+            snapshot = snapshots.get(timeout=1.0)
+            if snapshot["fastmllp_bytes_sent_total"] == sum(len(frame(ack)) for ack in acks):
+                break
+        # Loopback delivers the burst in one or two reads, so a handful of writes at most.
+        assert 1 <= snapshot["fastmllp_ack_writes_total"] <= 4
+    finally:
+        process.terminate()
+        process.join(timeout=2)
+
+
+def test_worker_processes_share_port_and_aggregate_metrics() -> None:
+    port = get_free_port()
+    metrics_port = get_free_port()
+    process = multiprocessing.Process(
+        target=run_worker_server,
+        args=(port, metrics_port),
+    )
+    process.start()
+    try:
+        assert wait_for_port("127.0.0.1", port)
+        for index in range(20):
+            message = f"MSH|^~\\&|S|F|R|RF|||ADT^A01|{index}|P|2.3"
+            assert f"MSA|AA|{index}" in send(message, "127.0.0.1", port, timeout=2.0)
+
+        url = f"http://127.0.0.1:{metrics_port}/metrics"
+        deadline = time.time() + 3
+        while time.time() < deadline:
+            with urllib.request.urlopen(url, timeout=2.0) as response:
+                body = response.read().decode()
+            if "fastmllp_frames_received_total 20" in body:
+                break
+            time.sleep(0.1)
+        assert "fastmllp_frames_received_total 20" in body
+        assert "fastmllp_worker_restarts_total 0" in body
+    finally:
+        process.terminate()
+        process.join(timeout=7)
+    assert process.exitcode == 0
+
+
+@pytest.mark.parametrize("overload", ["wait", "close"])
+def test_threaded_server_connection_limit(overload: str) -> None:
+    port = get_free_port()
+    process = multiprocessing.Process(
+        target=run_limited_server,
+        args=(port, overload),
+        daemon=True,
+    )
+    process.start()
+    message = "MSH|^~\\&|S|F|R|RF|||ADT^A01|1|P|2.3"
+    try:
+        assert wait_for_port("127.0.0.1", port)
+        # The wait_for_port probe may still hold the only slot for a moment.
+        first = send_and_hold(port, frame(message.encode()))
+        with first:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5) as second:
+                if overload == "close":
+                    assert second.recv(4096) == b""
+                else:
+                    second.sendall(frame(message.encode()))
+                    # The second client waits in the backlog until the first leaves.
+                    with pytest.raises(socket.timeout):
+                        second.recv(4096)
+                    first.close()
+                    second.settimeout(2.0)
+                    assert b"MSA|AA|1" in second.recv(4096)
+    finally:
+        process.terminate()
+        process.join(timeout=2)
+
+
+def test_threaded_server_stops_promptly_with_idle_connection() -> None:
+    port = get_free_port()
+    process = multiprocessing.Process(target=run_idle_server, args=(port,), daemon=True)
+    process.start()
+    try:
+        assert wait_for_port("127.0.0.1", port)
+        with socket.create_connection(("127.0.0.1", port), timeout=2.0):
+            time.sleep(0.2)
+            process.terminate()
+            process.join(timeout=3)
+            assert process.exitcode == 0
+    finally:
+        process.kill()
+        process.join(timeout=2)
+
+
+@pytest.mark.parametrize(
+    ("engine", "handler_mode"),
+    [
+        ("threaded", "inline"),
+        ("threaded", "thread"),
+        ("threaded", "process"),
+        ("asyncio", "thread"),
+        ("asyncio", "process"),
+    ],
+)
+def test_handler_ack_codes_in_frame_order(engine: str, handler_mode: str) -> None:
+    port = get_free_port()
+    # Not a daemon: daemonic processes cannot start a process pool.
+    process = multiprocessing.Process(
+        target=run_handler_server,
+        args=(port, engine, handler_mode),
+    )
+    process.start()
+    try:
+        assert wait_for_port("127.0.0.1", port)
+        messages = [f"MSH|^~\\&|S|F|R|RF|||ADT^A01|{index}|P|2.3" for index in range(20)]
+        acks = []
+        with socket.create_connection(("127.0.0.1", port), timeout=5.0) as sock:
+            sock.sendall(b"".join(frame(message.encode()) for message in messages))
+            decoder = MLLPDecoder(1 << 16)
+            while len(acks) < len(messages):
+                data = sock.recv(4096)
+                assert data
+                acks.extend(parse_msa(ack.decode()) for ack in decoder.feed(data))
+        assert [ack["control_id"] for ack in acks] == [str(index) for index in range(20)]
+        for index, ack in enumerate(acks):
+            expected = "AE" if index % 7 == 6 else "AR" if index % 2 else "AA"
+            assert ack["ack_code"] == expected
+    finally:
+        process.terminate()
+        process.join(timeout=5)
+    # SIGTERM lets the server shut its handler pool down and exit cleanly.
+    assert process.exitcode == 0
+
+
+@pytest.mark.parametrize("engine", ["threaded", "asyncio"])
+def test_server_journals_frames_before_ack(
+    engine: str, tmp_path: Path, capsys: pytest.CaptureFixture[str]
+) -> None:
+    port = get_free_port()
+    replay_port = get_free_port()
+    journal_dir = tmp_path / "journal"
+    process = multiprocessing.Process(
+        target=run_journal_server,
+        args=(port, engine, str(journal_dir)),
+        daemon=True,
+    )
+    replay_process = multiprocessing.Process(target=run_server, args=(replay_port,), daemon=True)
+    process.start()
+    replay_process.start()
+    try:
+        assert wait_for_port("127.0.0.1", port)
+        assert wait_for_port("127.0.0.1", replay_port)
+        messages = [f"MSH|^~\\&|S|F|R|RF|||ADT^A01|{index}|P|2.3" for index in range(10)]
+        with MLLPClient(timeout=2.0) as client:
+            acks = list(client.send_many(messages, "127.0.0.1", port, window=4))
+        assert [parse_msa(ack)["control_id"] for ack in acks] == [str(i) for i in range(10)]
+        # Each ACK was sent after its frame was synced, so the journal holds them all.
+        assert main(["journal", "scan", str(journal_dir)]) == 0
+        captured = capsys.readouterr()
+        records = [json.loads(line) for line in captured.out.splitlines()]
+        assert [record["control_id"] for record in records] == [str(i) for i in range(10)]
+
+        exit_code = main(
+            [
+                "journal",
+                "replay",
+                "--no-progress",
+                "--host",
+                "127.0.0.1",
+                "--port",
+                str(replay_port),
+                str(journal_dir),
+            ]
+        )
+        captured = capsys.readouterr()
+        assert exit_code == 0
+        assert "sent 10 messages" in captured.err
+    finally:
+        process.terminate()
+        replay_process.terminate()
+        process.join(timeout=2)
+        replay_process.join(timeout=2)
+
+
+@pytest.mark.parametrize("engine", ["threaded", "asyncio"])
+def test_server_captures_frames_for_replay(
+    engine: str, tmp_path: Path, capsys: pytest.CaptureFixture[str]
+) -> None:
+    port = get_free_port()
+    replay_port = get_free_port()
+    capture_dir = tmp_path / "capture"
+    process = multiprocessing.Process(
+        target=run_capture_server,
+        args=(port, engine, str(capture_dir)),
+        daemon=True,
+    )
+    replay_process = multiprocessing.Process(target=run_server, args=(replay_port,), daemon=True)
+    process.start()
+    replay_process.start()
+    try:
+        assert wait_for_port("127.0.0.1", port)
+        assert wait_for_port("127.0.0.1", replay_port)
+        messages = [f"MSH|^~\\&|S|F|R|RF|||ADT^A01|{index}|P|2.3" for index in range(10)]
+        with MLLPClient(timeout=2.0) as client:
+            acks = list(client.send_many(messages, "127.0.0.1", port, window=4))
+        assert len(acks) == 10
+        # SIGTERM stops the server, which flushes and compresses the open segment.
+        process.terminate()
+        process.join(timeout=5)
+        assert [path.name for path in capture_dir.iterdir()] == ["0000000001.capture.gz"]
+        records = list(iter_capture(capture_dir))
+        assert [parse_msh_bytes(record.payload)["control_id"] for record in records] == [
+            str(index) for index in range(10)
+        ]
+        assert len({record.connection for record in records}) == 1
+        assert all(record.peer.startswith("127.0.0.1:") for record in records)
+
+        exit_code = main(
+            [
+                "replay",
+                "--host",
+                "127.0.0.1",
+                "--port",
+                str(replay_port),
+                "--speed",
+                "max",
+                str(capture_dir),
+            ]
+        )
+        captured = capsys.readouterr()
+        assert exit_code == 0
+        assert "acked=10" in captured.out
+    finally:
+        process.terminate()
+        replay_process.terminate()
+        process.join(timeout=2)
+        replay_process.join(timeout=2)
+
+
+@pytest.mark.parametrize(
+    ("engine", "handler_mode"),
+    [
+        ("threaded", "inline"),
+        ("threaded", "thread"),
+        ("asyncio", "inline"),
+        ("asyncio", "thread"),
+    ],
+)
+def test_server_reacks_duplicates_without_handling(
+    engine: str, handler_mode: str, tmp_path: Path
+) -> None:
+    port = get_free_port()
+    handled = tmp_path / "handled.txt"
+    process = multiprocessing.Process(
+        target=run_dedupe_server,
+        args=(port, engine, handler_mode, str(handled)),
+        daemon=True,
+    )
+    process.start()
+    try:
+        assert wait_for_port("127.0.0.1", port)
+        control_ids = ["1", "2", "1", "3", "2", "3"]
+        messages = [f"MSH|^~\\&|S|F|R|RF|||ADT^A01|{index}|P|2.3" for index in control_ids]
+        # One at a time, so each duplicate arrives after the original was handled.
+        with MLLPClient(timeout=2.0) as client:
+            acks = [parse_msa(client.send(message, "127.0.0.1", port)) for message in messages]
+        assert [ack["control_id"] for ack in acks] == control_ids
+        assert [ack["ack_code"] for ack in acks] == ["AA", "AR", "AA", "AE", "AR", "AE"]
+        # AE results are not cached, so the retransmitted 3 is handled again.
+        assert handled.read_text().split() == ["1", "2", "3", "3"]
+    finally:
+        process.terminate()
+        process.join(timeout=2)
+
+
+def test_stuck_handler_closes_connection_after_timeout() -> None:
+    port = get_free_port()
+    process = multiprocessing.Process(target=run_stuck_handler_server, args=(port,), daemon=True)
+    process.start()
+    try:
+        assert wait_for_port("127.0.0.1", port)
+        with socket.create_connection(("127.0.0.1", port), timeout=2.0) as sock:
+            sock.sendall(frame(b"MSH|^~\\&|S|F|R|RF|||ADT^A01|1|P|2.3"))
+            started = time.monotonic()
+            try:
+                assert sock.recv(4096) == b""
+            except ConnectionResetError:
+                pass
+            assert time.monotonic() - started < 1.5
+    finally:
+        process.terminate()
+        process.join(timeout=5)
+
+
+@pytest.mark.parametrize("engine", ["threaded", "asyncio"])
+def test_server_slows_peer_over_rate_limit(engine: str) -> None:
+    port = get_free_port()
+    metrics_port = get_free_port()
+    process = multiprocessing.Process(
+        target=run_rate_limited_server, args=(port, metrics_port, engine), daemon=True
+    )
+    process.start()
+    try:
+        assert wait_for_port("127.0.0.1", port)
+        messages = [f"MSH|^~\\&|S|F|R|RF|||ADT^A01|{index}|P|2.3" for index in range(24)]
+        start = time.monotonic()
+        with MLLPClient(timeout=5.0) as client:
+            acks = list(client.send_many(messages, "127.0.0.1", port, window=8))
+        elapsed = time.monotonic() - start
+        # Nothing is dropped; frames beyond the burst of 4 are paced at 40 per second.
+        assert [parse_msa(ack)["ack_code"] for ack in acks] == ["AA"] * 24
+        assert elapsed >= 0.4
+
+        url = f"http://127.0.0.1:{metrics_port}/metrics"
+        with urllib.request.urlopen(url, timeout=2.0) as response:
+            body = response.read().decode()
+        assert 'fastmllp_admission_throttled_total{peer="127.0.0.1"}' in body
+    finally:
+        process.terminate()
+        process.join(timeout=5)
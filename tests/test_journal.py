@@ -0,0 +1,101 @@
+import threading
+from pathlib import Path
+
+import pytest
+
+from fastmllp.journal import Journal, JournalError, iter_journal, segment_paths
+from fastmllp.metrics import ServerMetrics
+
+
+def test_journal_round_trip(tmp_path: Path) -> None:
+    with Journal(tmp_path) as journal:
+        assert journal.append(b"first") == 1
+        seq = journal.write(b"second")
+        journal.sync(seq)
+    assert [record.payload for record in iter_journal(tmp_path)] == [b"first", b"second"]
+
+    # A reopened journal starts a new segment after the existing ones.
+    with Journal(tmp_path) as journal:
+        journal.append(b"third")
+    assert len(segment_paths(tmp_path)) == 2
+    assert [record.payload for record in iter_journal(tmp_path)] == [
+        b"first",
+        b"second",
+        b"third",
+    ]
+
+
+def test_journal_rotates_segments_by_size(tmp_path: Path) -> None:
+    payloads = [bytes([index]) * 40 for index in range(10)]
+    with Journal(tmp_path, segment_size=128) as journal:
+        for payload in payloads:
+            journal.write(payload)
+    assert len(segment_paths(tmp_path)) == 5
+    assert [record.payload for record in iter_journal(tmp_path)] == payloads
+
+
+def test_journal_reader_stops_at_torn_tail(tmp_path: Path) -> None:
+    with Journal(tmp_path) as journal:
+        journal.append(b"complete")
+        journal.append(b"torn record")
+    segment = segment_paths(tmp_path)[0]
+    data = segment.read_bytes()
+    segment.write_bytes(data[:-4])
+    assert [record.payload for record in iter_journal(tmp_path)] == [b"complete"]
+
+
+def test_journal_reader_rejects_corrupt_record(tmp_path: Path) -> None:
+    with Journal(tmp_path) as journal:
+        journal.append(b"payload")
+    segment = segment_paths(tmp_path)[0]
+    data = bytearray(segment.read_bytes())
+    data[-1] ^= 0xFF
+    segment.write_bytes(bytes(data))
+    with pytest.raises(JournalError, match="CRC mismatch"):
+        list(iter_journal(tmp_path))
+
+    segment.write_bytes(b"not a journal")
+    with pytest.raises(JournalError, match="not a journal segment"):
+        list(iter_journal(tmp_path))
+
+
+def test_journal_groups_concurrent_syncs(tmp_path: Path) -> None:
+    metrics = ServerMetrics()
+    writers = 8
+    barrier = threading.Barrier(writers)
+    with Journal(tmp_path, commit_window=0.05, metrics=metrics) as journal:
+
+        def write_one(index: int) -> None:
+            barrier.wait()
+            journal.append(f"message {index}".encode())
+
+        threads = [threading.Thread(target=write_one, args=(i,)) for i in range(writers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    assert len(list(iter_journal(tmp_path))) == writers
+    assert metrics.journal_fsyncs.value() < writers
+    assert metrics.journal_fsync_latency.sample()["count"] == metrics.journal_fsyncs.value()
+
+
+def test_journal_has_a_single_writer(tmp_path: Path) -> None:
+    with Journal(tmp_path):
+        with pytest.raises(JournalError, match="in use"):
+            Journal(tmp_path)
+    journal = Journal(tmp_path)
+    journal.close()
+    with pytest.raises(JournalError, match="closed"):
+        journal.write(b"late")
+
+
+def test_journal_reader_ignores_records_appended_while_reading(tmp_path: Path) -> None:
+    with Journal(tmp_path) as journal:
+        journal.append(b"first")
+        journal.append(b"second")
+        seen = []
+        for record in iter_journal(tmp_path):
+            seen.append(record.payload)
+            journal.append(record.payload)
+    assert seen == [b"first", b"second"]
+    assert len(list(iter_journal(tmp_path))) == 4
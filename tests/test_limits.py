@@ -0,0 +1,75 @@
+import pytest
+
+from fastmllp.limits import AdmissionControl, sender_key
+from fastmllp.metrics import ServerMetrics
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def message(sender: str) -> bytes:
+    return f"MSH|^~\\&|{sender}|NORTH|R|RF|||ORU^R01|1|P|2.5\rPID|1".encode()
+
+
+def test_sender_key() -> None:
+    assert sender_key(message("LAB")) == "LAB/NORTH"
+
+
+def test_bucket_allows_burst_then_paces_at_rate() -> None:
+    clock = FakeClock()
+    admission = AdmissionControl(10.0, 5.0, clock=clock)
+    assert [admission.charge("10.0.0.1") for _ in range(5)] == [0.0] * 5
+    # Frames beyond the burst go into debt, each waiting one more interval.
+    assert admission.charge("10.0.0.1") == pytest.approx(0.1)
+    assert admission.charge("10.0.0.1", 2) == pytest.approx(0.3)
+    # Other peers have their own bucket.
+    assert admission.charge("10.0.0.2") == 0.0
+
+    clock.now = 0.3
+    assert admission.charge("10.0.0.1") == pytest.approx(0.1)
+    clock.now = 10.0
+    # Refilling stops at the burst.
+    assert admission.charge("10.0.0.1", 5) == 0.0
+    assert admission.charge("10.0.0.1") == pytest.approx(0.1)
+
+
+def test_admit_charges_peer_or_senders_and_counts_throttles() -> None:
+    clock = FakeClock()
+    metrics = ServerMetrics()
+    admission = AdmissionControl(2.0, 2.0, metrics=metrics, clock=clock)
+    assert admission.admit("10.0.0.1", [message("A")] * 2) == ("10.0.0.1", 0.0)
+    assert admission.admit("10.0.0.1", [message("A")] * 2) == ("10.0.0.1", 1.0)
+    assert metrics.admission_throttled.value("10.0.0.1") == 1
+    assert metrics.admission_throttle_seconds.value("10.0.0.1") == 1.0
+
+    admission = AdmissionControl(2.0, 2.0, key="sender", metrics=metrics, clock=clock)
+    frames = [message("A"), message("A"), message("B"), message("A")]
+    assert admission.admit("10.0.0.1", frames) == ("A/NORTH", 0.5)
+    assert admission.admit("10.0.0.9", [message("B")]) == ("10.0.0.9", 0.0)
+    assert metrics.admission_throttled.value("A/NORTH") == 1
+
+
+def test_least_recently_charged_buckets_are_forgotten() -> None:
+    admission = AdmissionControl(1.0, 1.0, max_buckets=2, clock=FakeClock())
+    admission.charge("a")
+    admission.charge("b")
+    admission.charge("a")
+    admission.charge("c")
+    assert len(admission) == 2
+    # "b" was forgotten, so it starts again with a full bucket.
+    assert admission.charge("b") == 0.0
+    assert admission.charge("c") == pytest.approx(1.0)
+
+
+def test_admission_rejects_invalid_limits() -> None:
+    with pytest.raises(ValueError):
+        AdmissionControl(0.0)
+    with pytest.raises(ValueError):
+        AdmissionControl(1.0, 0.0)
+    with pytest.raises(ValueError):
+        AdmissionControl(1.0, key="connection")
@@ -0,0 +1,70 @@
+import io
+import json
+import logging as std_logging
+from collections.abc import Iterator
+
+import pytest
+
+from fastmllp import logging as fastmllp_logging
+from fastmllp.logging import EventLimiter, configure_logging, log_event, stop_queue_listener
+
+
+@pytest.fixture
+def fresh_logger(monkeypatch: pytest.MonkeyPatch) -> Iterator[std_logging.Logger]:
+    logger = std_logging.getLogger("fastmllp")
+    handlers = logger.handlers[:]
+    level = logger.level
+    propagate = logger.propagate
+    logger.handlers.clear()
+    # pytest attaches its capture handlers to non-propagating loggers.
+    logger.propagate = True
+    monkeypatch.setattr(fastmllp_logging, "_limiter", EventLimiter())
+    yield logger
+    stop_queue_listener()
+    logger.handlers[:] = handlers
+    logger.setLevel(level)
+    logger.propagate = propagate
+
+
+class Explosive:
+    def __str__(self) -> str:
+        raise AssertionError("formatted a disabled event")
+
+
+def test_disabled_events_are_not_formatted(fresh_logger: std_logging.Logger) -> None:
+    stream = io.StringIO()
+    configure_logging("warning", stream=stream)
+    log_event(fresh_logger, std_logging.INFO, "message_received", conn_id=1, value=Explosive())
+    log_event(fresh_logger, std_logging.WARNING, "frame_too_large", conn_id=1, length=9)
+    assert stream.getvalue().endswith("WARNING event=frame_too_large conn_id=1 length=9\n")
+
+
+def test_json_lines_through_queue(fresh_logger: std_logging.Logger) -> None:
+    stream = io.StringIO()
+    configure_logging("info", log_format="json", log_queue=True, stream=stream)
+    log_event(fresh_logger, std_logging.INFO, "connect", conn_id=3, addr=("127.0.0.1", 5))
+    stop_queue_listener()
+    record = json.loads(stream.getvalue())
+    assert record["level"] == "INFO"
+    assert record["event"] == "connect"
+    assert record["conn_id"] == 3
+    assert record["addr"] == ["127.0.0.1", 5]
+
+
+def test_event_sampling_and_rate_limit(fresh_logger: std_logging.Logger) -> None:
+    stream = io.StringIO()
+    configure_logging(
+        "info",
+        stream=stream,
+        log_sample={"message_received": 10},
+        log_rate_limit={"connect": 3},
+    )
+    for _ in range(25):
+        log_event(fresh_logger, std_logging.INFO, "message_received", conn_id=1)
+        log_event(fresh_logger, std_logging.INFO, "connect", conn_id=1)
+        log_event(fresh_logger, std_logging.INFO, "disconnect", conn_id=1)
+    lines = stream.getvalue().splitlines()
+    assert sum("event=message_received" in line for line in lines) == 3
+    assert sum("event=connect" in line for line in lines) <= 6
+    assert sum("event=disconnect" in line for line in lines) == 25
+
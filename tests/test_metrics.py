@@ -0,0 +1,94 @@
+import threading
+
+from fastmllp.metrics import MetricsAggregator, MetricsRegistry, ServerMetrics
+
+
+def test_counter_sums_threads_after_they_exit() -> None:
+    registry = MetricsRegistry()
+    counter = registry.counter("test_total", "Test counter")
+
+    def work() -> None:
+        for _ in range(1000):
+            counter.inc()
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    counter.inc(5)
+    assert counter.value() == 8005
+    assert len(counter._cells._cells) == 1
+
+
+def test_histogram_buckets_and_exposition() -> None:
+    registry = MetricsRegistry()
+    gauge = registry.gauge("test_active", "Test gauge")
+    histogram = registry.histogram("test_seconds", "Test histogram", (0.1, 1.0))
+    gauge.inc()
+    gauge.inc()
+    gauge.dec()
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value)
+
+    sample = registry.snapshot()["test_seconds"]
+    assert sample["buckets"] == {0.1: 2, 1.0: 1}
+    assert sample["count"] == 4
+    assert registry.render().splitlines() == [
+        "# HELP test_active Test gauge",
+        "# TYPE test_active gauge",
+        "test_active 1",
+        "# HELP test_seconds Test histogram",
+        "# TYPE test_seconds histogram",
+        'test_seconds_bucket{le="0.1"} 2',
+        'test_seconds_bucket{le="1"} 3',
+        'test_seconds_bucket{le="+Inf"} 4',
+        "test_seconds_sum 3.65",
+        "test_seconds_count 4",
+    ]
+
+
+def test_aggregator_keeps_retired_counters_but_not_gauges() -> None:
+    aggregator = MetricsAggregator(ServerMetrics().registry)
+    worker = ServerMetrics()
+    worker.connections_active.inc()
+    worker.frames_received.inc(3)
+    worker.frame_size.observe(100)
+    aggregator.update("a", worker.snapshot())
+    aggregator.update("b", worker.snapshot())
+
+    snapshot = aggregator.snapshot()
+    assert snapshot["fastmllp_frames_received_total"] == 6
+    assert snapshot["fastmllp_connections_active"] == 2
+    assert snapshot["fastmllp_frame_size_bytes"]["count"] == 2
+
+    aggregator.retire("a")
+    snapshot = aggregator.snapshot()
+    assert snapshot["fastmllp_frames_received_total"] == 6
+    assert snapshot["fastmllp_connections_active"] == 1
+    assert "fastmllp_frames_received_total 6" in aggregator.render()
+
+
+def test_labeled_counter_exposition_and_merge() -> None:
+    registry = MetricsRegistry()
+    counter = registry.labeled_counter("test_throttled_total", "Test labeled counter", "peer")
+    counter.max_values = 2
+    counter.inc("10.0.0.1")
+    counter.inc("10.0.0.1", 2)
+    counter.inc('odd"peer')
+    counter.inc("10.0.0.3")
+    assert counter.value("10.0.0.1") == 3
+    assert registry.render().splitlines() == [
+        "# HELP test_throttled_total Test labeled counter",
+        "# TYPE test_throttled_total counter",
+        'test_throttled_total{peer="10.0.0.1"} 3',
+        'test_throttled_total{peer="odd\\"peer"} 1',
+        'test_throttled_total{peer="other"} 1',
+    ]
+
+    aggregator = MetricsAggregator(MetricsRegistry())
+    aggregator.update("a", registry.snapshot())
+    aggregator.update("b", registry.snapshot())
+    aggregator.retire("a")
+    labels = aggregator.snapshot()["test_throttled_total"]["labels"]
+    assert labels == {"10.0.0.1": 6, 'odd"peer': 2, "other": 2}
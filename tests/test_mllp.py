@@ -1,4 +1,9 @@
+import os
+
+import pytest
+
 from fastmllp import mllp
+from fastmllp.hl7 import iter_messages
 
 
 def test_frame_wraps_payload() -> None:
@@ -41,3 +46,123 @@ def test_unframe_skips_garbage_between_frames() -> None:
     frames, remainder = mllp.unframe_stream(data)
     assert frames == [b"A", b"B"]
     assert remainder == b""
+
+
+def test_decoder_reassembles_frame_across_chunks() -> None:
+    decoder = mllp.MLLPDecoder()
+    assert list(decoder.feed(b"\x0bAB")) == []
+    assert list(decoder.feed(b"C\x1c")) == [b"ABC"]
+    assert list(decoder.feed(b"\x0d\x0bD\x1c\x0d")) == [b"D"]
+    assert decoder.pending() == 0
+
+
+def test_decoder_matches_unframe_stream_byte_by_byte() -> None:
+    data = b"junk\x0bA\x0bB\x1c\x0dgarbage\x0bC\x1c\x0bD\x1c\x0d\x0bpartial"
+    decoder = mllp.MLLPDecoder()
+    frames: list[bytes] = []
+    for index in range(len(data)):
+        frames.extend(decoder.feed(data[index:index + 1]))
+    expected, remainder = mllp.unframe_stream(data)
+    assert frames == expected == [b"A\x0bB", b"C", b"D"]
+    assert decoder.pending() == len(remainder)
+
+
+def test_decoder_rejects_oversize_partial_frame() -> None:
+    decoder = mllp.MLLPDecoder(max_size=4)
+    assert list(decoder.feed(b"\x0bABCD")) == []
+    with pytest.raises(mllp.FrameTooLargeError) as excinfo:
+        list(decoder.feed(b"E"))
+    assert excinfo.value.length == 5
+
+
+def test_decoder_yields_frames_before_oversize_frame() -> None:
+    decoder = mllp.MLLPDecoder(max_size=4)
+    frames = decoder.feed(b"\x0bOK\x1c\x0d\x0bTOOLONG\x1c\x0d")
+    assert next(frames) == b"OK"
+    with pytest.raises(mllp.FrameTooLargeError):
+        next(frames)
+
+
+def test_decoder_accepts_memoryview_slices() -> None:
+    read_buffer = bytearray(b"\x0bABC\x1c\x0d\x0bDE")
+    view = memoryview(read_buffer)
+    decoder = mllp.MLLPDecoder()
+    frames = list(decoder.feed(view[:6]))
+    assert frames == [b"ABC"]
+    assert isinstance(frames[0], bytes)
+    read_buffer[:4] = b"\x0bXYZ"
+    assert list(decoder.feed(view[6:])) == []
+    assert decoder.pending() == 3
+
+
+class ShortWriteSocket:
+    """Accepts at most `limit` bytes per sendmsg, like a full socket buffer."""
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self.calls = 0
+        self.data = bytearray()
+
+    def sendmsg(self, buffers: list) -> int:
+        self.calls += 1
+        data = b"".join(bytes(buffer) for buffer in buffers)[: self.limit]
+        self.data += data
+        return len(data)
+
+
+def test_send_buffers_gathers_frames_and_resumes_short_writes() -> None:
+    payloads = [b"first", b"", b"third message"]
+    buffers = mllp.frame_buffers(payloads)
+    sock = ShortWriteSocket(limit=1 << 16)
+    assert mllp.send_buffers(sock, buffers) == len(sock.data)
+    assert sock.calls == 1
+    assert bytes(sock.data) == b"".join(mllp.frame(payload) for payload in payloads)
+
+    sock = ShortWriteSocket(limit=4)
+    assert mllp.send_buffers(sock, buffers) == len(sock.data)
+    assert bytes(sock.data) == b"".join(mllp.frame(payload) for payload in payloads)
+    assert buffers[2] == mllp.FRAME_END
+
+
+MESSAGES = [b"MSH|^~\\&|A|B|C|D|20240101||ADT^A01|%d|P|2.5\rPID|1\r" % i for i in range(5)]
+
+
+def test_iter_frames_reads_mllp_capture(tmp_path) -> None:
+    path = tmp_path / "capture.mllp"
+    framed = b"".join(mllp.frame(message) + b"\n" for message in MESSAGES)
+    path.write_bytes(b"noise" + framed + b"\x0bMSH|truncated")
+    assert [bytes(payload) for payload in mllp.iter_frames(path)] == MESSAGES
+    assert [bytes(payload) for payload in mllp.iter_frames(path, 1, 3)] == MESSAGES[1:3]
+    assert all(isinstance(payload, memoryview) for payload in mllp.iter_frames(path))
+
+
+def test_iter_frames_splits_raw_batches_like_iter_messages(tmp_path) -> None:
+    path = tmp_path / "batch.hl7"
+    path.write_bytes(b"FHS|^~\\&\rBHS|^~\\&\r" + b"".join(MESSAGES) + b"BTS|5\rFTS|1\r")
+    with open(path, "rb") as handle:
+        expected = list(iter_messages(handle))
+    assert [bytes(payload) for payload in mllp.iter_frames(path)] == expected == MESSAGES
+    empty = tmp_path / "empty.hl7"
+    empty.write_bytes(b"")
+    assert list(mllp.iter_frames(empty, index=True)) == []
+
+
+def test_frame_file_persists_and_refreshes_offset_index(tmp_path) -> None:
+    path = tmp_path / "capture.mllp"
+    path.write_bytes(b"".join(map(mllp.frame, MESSAGES)))
+    with mllp.FrameFile(path, index=True) as frame_file:
+        assert len(frame_file) == 5
+        assert bytes(frame_file[-1]) == MESSAGES[-1]
+    index_path = tmp_path / "capture.mllp.idx"
+    assert index_path.exists()
+
+    with mllp.FrameFile(path, index=True) as frame_file:
+        assert isinstance(frame_file.offsets, memoryview)
+        assert [bytes(payload) for payload in frame_file.frames(3)] == MESSAGES[3:]
+        with pytest.raises(IndexError):
+            frame_file[5]
+
+    # A changed file no longer matches the index, which is rebuilt.
+    path.write_bytes(b"".join(map(mllp.frame, MESSAGES[:2])))
+    os.utime(path, ns=(0, 0))
+    assert [bytes(payload) for payload in mllp.iter_frames(path, index=True)] == MESSAGES[:2]
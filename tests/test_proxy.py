@@ -0,0 +1,209 @@
+import multiprocessing
+import socket
+import threading
+import time
+
+import pytest
+
+from fastmllp.ack import build_ack
+from fastmllp.cli import main
+from fastmllp.client import MLLPClient
+from fastmllp.hl7 import parse_msa, parse_msh_bytes
+from fastmllp.metrics import ServerMetrics
+from fastmllp.mllp import MLLPDecoder, frame
+from fastmllp.proxy import ForwardingPool, serve_proxy
+
+MESSAGE = "MSH|^~\\&|%s|F|R|RF|||ADT^A01|%s|P|2.5\rPID|1\r"
+
+
+class Upstream:
+    """ACK every frame after `delay` seconds, recording control IDs in arrival order.
+
+    Control IDs ending in "R" are ACKed AR.
+    """
+
+    def __init__(self, delay: float = 0.0) -> None:
+        self.delay = delay
+        self.listener = socket.create_server(("127.0.0.1", 0))
+        self.port = self.listener.getsockname()[1]
+        self.connections = 0
+        self.received: list[str] = []
+        threading.Thread(target=self.accept, daemon=True).start()
+
+    def accept(self) -> None:
+        while True:
+            try:
+                conn, _ = self.listener.accept()
+            except OSError:
+                return
+            self.connections += 1
+            threading.Thread(target=self.handle, args=(conn,), daemon=True).start()
+
+    def handle(self, conn: socket.socket) -> None:
+        decoder = MLLPDecoder()
+        with conn:
+            while chunk := conn.recv(65536):
+                for payload in decoder.feed(chunk):
+                    control_id = parse_msh_bytes(payload)["control_id"]
+                    self.received.append(control_id)
+                    time.sleep(self.delay)
+                    ack_code = "AR" if control_id.endswith("R") else "AA"
+                    conn.sendall(frame(build_ack(payload.decode(), ack_code=ack_code).encode()))
+
+    def close(self) -> None:
+        self.listener.close()
+
+
+@pytest.fixture
+def upstream():
+    upstream = Upstream()
+    yield upstream
+    upstream.close()
+
+
+def closed_port() -> int:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def message(sender: str, control_id: str) -> bytes:
+    return (MESSAGE % (sender, control_id)).encode()
+
+
+def test_pool_pipelines_frames_and_keeps_sender_order(upstream: Upstream) -> None:
+    metrics = ServerMetrics()
+    pool = ForwardingPool([("127.0.0.1", upstream.port)], connections=2, metrics=metrics)
+    try:
+        futures = [
+            pool.submit(message(f"APP{index % 3}", f"{index % 3}-{index}"))
+            for index in range(90)
+        ]
+        acks = [parse_msa(future.result(5).decode()) for future in futures]
+    finally:
+        pool.close()
+    assert upstream.connections == 2
+    assert [ack["control_id"] for ack in acks] == [f"{i % 3}-{i}" for i in range(90)]
+    assert metrics.proxy_forwarded.value() == 90
+    assert metrics.proxy_in_flight.value() == 0
+    received = upstream.received
+    for sender in "012":
+        indexes = [int(c.split("-")[1]) for c in received if c.startswith(sender + "-")]
+        assert indexes == sorted(indexes) and len(indexes) == 30
+
+
+def test_pool_spreads_load_within_in_flight_limit() -> None:
+    upstreams = [Upstream(delay=0.01), Upstream(delay=0.01)]
+    pool = ForwardingPool(
+        [("127.0.0.1", upstream.port) for upstream in upstreams],
+        connections=1,
+        max_in_flight=4,
+        timeout=5.0,
+    )
+    try:
+        futures = [pool.submit(message(f"APP{index}", str(index))) for index in range(40)]
+        assert all(future.result(5) for future in futures)
+    finally:
+        pool.close()
+        for upstream in upstreams:
+            upstream.close()
+    counts = [len(upstream.received) for upstream in upstreams]
+    assert sum(counts) == 40
+    assert min(counts) >= 10
+
+
+def test_pool_skips_unreachable_upstream(upstream: Upstream) -> None:
+    metrics = ServerMetrics()
+    pool = ForwardingPool(
+        [("127.0.0.1", closed_port()), ("127.0.0.1", upstream.port)], timeout=2.0, metrics=metrics
+    )
+    try:
+        for index in range(6):
+            ack = pool.relay(message(f"APP{index}", str(index)))
+            assert parse_msa(ack.decode())["ack_code"] == "AA"
+        nack = pool.relay(message("APP", "9R"))
+        assert parse_msa(nack.decode())["ack_code"] == "AR"
+    finally:
+        pool.close()
+    assert len(upstream.received) == 7
+    assert metrics.proxy_upstream_nacks.value() == 1
+
+    pool = ForwardingPool([("127.0.0.1", closed_port())], timeout=0.2)
+    with pytest.raises(ConnectionError):
+        pool.submit(message("APP", "1"))
+
+
+def run_proxy(port: int, upstream_port: int, ack_mode: str, engine: str) -> None:
+    serve_proxy(
+        "127.0.0.1",
+        port,
+        [("127.0.0.1", upstream_port)],
+        ack_mode=ack_mode,
+        engine=engine,
+        timeout=1.0,
+    )
+
+
+@pytest.mark.parametrize("engine", ["threaded", "asyncio"])
+@pytest.mark.parametrize("ack_mode", ["relay", "local"])
+def test_serve_proxy_forwards_frames(upstream: Upstream, ack_mode: str, engine: str) -> None:
+    port = closed_port()
+    process = multiprocessing.Process(
+        target=run_proxy, args=(port, upstream.port, ack_mode, engine), daemon=True
+    )
+    process.start()
+    try:
+        messages = [MESSAGE % ("APP", f"{index}R" if index == 3 else index) for index in range(8)]
+        deadline = time.time() + 2.0
+        while True:
+            try:
+                with MLLPClient(timeout=2.0) as client:
+                    acks = list(client.send_many(messages, "127.0.0.1", port, window=4))
+                break
+            except OSError:
+                if time.time() > deadline:
+                    raise
+                time.sleep(0.05)
+        codes = [parse_msa(ack)["ack_code"] for ack in acks]
+        # Relay returns the upstream's AR; local mode ACKs once the frame is forwarded.
+        assert codes == ["AA"] * 3 + ["AR" if ack_mode == "relay" else "AA"] + ["AA"] * 4
+        deadline = time.time() + 2.0
+        while len(upstream.received) < 8 and time.time() < deadline:
+            time.sleep(0.01)
+        assert upstream.received == [parse_msa(ack)["control_id"] for ack in acks]
+    finally:
+        process.terminate()
+        process.join(timeout=5)
+
+
+def test_serve_proxy_nacks_when_upstream_is_down() -> None:
+    port = closed_port()
+    process = multiprocessing.Process(
+        target=run_proxy, args=(port, closed_port(), "relay", "threaded"), daemon=True
+    )
+    process.start()
+    try:
+        deadline = time.time() + 2.0
+        while True:
+            try:
+                with MLLPClient(timeout=3.0) as client:
+                    ack = client.send(MESSAGE % ("APP", "1"), "127.0.0.1", port)
+                break
+            except OSError:
+                if time.time() > deadline:
+                    raise
+                time.sleep(0.05)
+        assert parse_msa(ack)["ack_code"] == "AE"
+    finally:
+        process.terminate()
+        process.join(timeout=5)
+
+
+def test_cli_proxy_rejects_invalid_options(capsys: pytest.CaptureFixture[str]) -> None:
+    assert main(["proxy", "--listen", "127.0.0.1:2700"]) == 2
+    assert "--upstream" in capsys.readouterr().err
+    args = ["proxy", "--upstream", "127.0.0.1:2575", "--workers", "2"]
+    assert main(args) == 2
+    assert "--workers" in capsys.readouterr().err
@@ -0,0 +1,112 @@
+import socket
+import threading
+import time
+
+import pytest
+
+from fastmllp.ack import build_ack
+from fastmllp.capture import CaptureRecord, CaptureWriter
+from fastmllp.cli import main
+from fastmllp.hl7 import parse_msh_bytes
+from fastmllp.mllp import MLLPDecoder, frame
+from fastmllp.replay import parse_speed, run_replay
+
+MESSAGE = b"MSH|^~\\&|S|F|R|RF|||ADT^A01|%s|P|2.5\rPID|1\r"
+
+
+class RecordingServer:
+    """ACK every frame, recording control IDs in arrival order per connection."""
+
+    def __init__(self) -> None:
+        self.listener = socket.create_server(("127.0.0.1", 0))
+        self.port = self.listener.getsockname()[1]
+        self.connections: list[list[str]] = []
+        threading.Thread(target=self.accept, daemon=True).start()
+
+    def accept(self) -> None:
+        while True:
+            try:
+                conn, _ = self.listener.accept()
+            except OSError:
+                return
+            received: list[str] = []
+            self.connections.append(received)
+            threading.Thread(target=self.handle, args=(conn, received), daemon=True).start()
+
+    def handle(self, conn: socket.socket, received: list[str]) -> None:
+        decoder = MLLPDecoder()
+        with conn:
+            while chunk := conn.recv(65536):
+                for payload in decoder.feed(chunk):
+                    received.append(parse_msh_bytes(payload)["control_id"])
+                    conn.sendall(frame(build_ack(payload.decode()).encode()))
+
+    def close(self) -> None:
+        self.listener.close()
+
+
+@pytest.fixture
+def server():
+    server = RecordingServer()
+    yield server
+    server.close()
+
+
+def test_replay_keeps_each_captured_connection_in_order(server: RecordingServer) -> None:
+    records = [
+        CaptureRecord(1000.0 + index * 0.001, index % 4, MESSAGE % f"{index % 4}-{index}".encode())
+        for index in range(200)
+    ]
+    report = run_replay(records, "127.0.0.1", server.port, connections=2, speed=0.0, window=8)
+    assert report["sent"] == report["acked"] == 200
+    assert report["errors"] == report["timeouts"] == 0
+    assert len(server.connections) == 2
+    for received in server.connections:
+        # Captured connections 0 and 2 share one replay connection, 1 and 3 the other.
+        origins = {control_id.split("-")[0] for control_id in received}
+        assert len(origins) == 2
+        for origin in origins:
+            indexes = [int(c.split("-")[1]) for c in received if c.startswith(origin + "-")]
+            assert indexes == sorted(indexes) and len(indexes) == 50
+
+
+def test_replay_follows_scaled_capture_timing(server: RecordingServer) -> None:
+    records = [
+        CaptureRecord(50.0 + index * 0.02, 0, MESSAGE % str(index).encode()) for index in range(21)
+    ]
+    start = time.monotonic()
+    report = run_replay(records, "127.0.0.1", server.port, speed=2.0)
+    elapsed = time.monotonic() - start
+    # 400 ms of capture at 2x takes 200 ms.
+    assert 0.19 <= elapsed < 0.5
+    assert report["acked"] == 21
+    assert report["target_rate"] == pytest.approx(100.0)
+    assert report["achieved_rate"] == pytest.approx(100.0, rel=0.2)
+    assert report["latency_ms"]["p50"] > 0
+
+
+def test_parse_speed() -> None:
+    assert parse_speed("max") == 0.0
+    assert parse_speed("10x") == parse_speed("10") == 10.0
+    with pytest.raises(ValueError):
+        parse_speed("0")
+    with pytest.raises(ValueError):
+        parse_speed("fast")
+
+
+def test_cli_replay(server: RecordingServer, tmp_path, capsys: pytest.CaptureFixture[str]) -> None:
+    capture = tmp_path / "traffic.capture"
+    with CaptureWriter(capture) as writer:
+        for index in range(5):
+            payload = MESSAGE % str(index).encode()
+            writer.write(payload, connection=index, timestamp=10.0 + index / 100)
+    args = ["replay", str(capture), "--port", str(server.port), "--connections", "3"]
+    assert main([*args, "--speed", "10x"]) == 0
+    assert "records=5 sent=5 acked=5" in capsys.readouterr().out
+
+    # Plain frame files have no timestamps to follow.
+    plain = tmp_path / "dump.mllp"
+    plain.write_bytes(frame(MESSAGE % b"1"))
+    assert main(["replay", str(plain), "--port", str(server.port)]) == 1
+    assert "no timestamps" in capsys.readouterr().err
+    assert main(["replay", str(plain), "--port", str(server.port), "--rate", "100"]) == 0
@@ -0,0 +1,85 @@
+import multiprocessing
+import socket
+import time
+from pathlib import Path
+
+import pytest
+
+from fastmllp.hl7 import parse_msa
+from fastmllp.metrics import ClientMetrics
+from fastmllp.server import serve
+from fastmllp.spool import SpoolFullError, SpoolingSender, backoff_delay
+
+
+def run_server(port: int) -> None:
+    serve("127.0.0.1", port, timeout=2.0)
+
+
+def get_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def message(index: int) -> str:
+    return f"MSH|^~\\&|S|F|R|RF|||ADT^A01|{index}|P|2.3\rPID|1||{index}"
+
+
+def test_backoff_delay_is_jittered_and_capped() -> None:
+    for attempt in range(8):
+        delay = backoff_delay(attempt, 0.5, 4.0)
+        expected = min(4.0, 0.5 * 2**attempt)
+        assert expected / 2 <= delay <= expected
+    assert backoff_delay(10_000, 0.5, 4.0) <= 4.0
+
+
+def test_spool_delivers_in_order_after_restart_and_outage(tmp_path: Path) -> None:
+    port = get_free_port()
+    metrics = ClientMetrics()
+    options = {"timeout": 1.0, "backoff_initial": 0.05, "backoff_max": 0.2, "metrics": metrics}
+    sender = SpoolingSender(tmp_path, "127.0.0.1", port, segment_size=256, **options)
+    for index in range(5):
+        sender.submit(message(index))
+    sender.submit_many(message(index) for index in range(5, 12))
+    time.sleep(0.3)
+    assert sender.depth() == 12
+    assert sender.lag() > 0
+    assert metrics.spool_retries.value() > 0
+    sender.close()
+
+    acks: list[bytes] = []
+    process = multiprocessing.Process(target=run_server, args=(port,), daemon=True)
+    process.start()
+    try:
+        sender = SpoolingSender(
+            tmp_path,
+            "127.0.0.1",
+            port,
+            on_ack=lambda payload, ack: acks.append(ack),
+            **options,
+        )
+        with sender:
+            assert sender.depth() == 12
+            assert sender.flush(timeout=5.0)
+            assert sender.depth() == 0
+            assert sender.lag() == 0.0
+    finally:
+        process.terminate()
+        process.join(timeout=2)
+    control_ids = [parse_msa(ack.decode())["control_id"] for ack in acks]
+    assert control_ids == [str(index) for index in range(12)]
+    assert metrics.spool_delivered.value() == 12
+    assert metrics.spool_depth.value() == 0
+    # Delivered segments are removed; only the current one remains.
+    assert len(list(tmp_path.glob("*.journal"))) == 1
+
+
+def test_spool_is_bounded(tmp_path: Path) -> None:
+    port = get_free_port()
+    with SpoolingSender(tmp_path, "127.0.0.1", port, max_bytes=200, timeout=0.2) as sender:
+        sender.submit(message(1))
+        with pytest.raises(SpoolFullError):
+            sender.submit_many(message(index) for index in range(10))
+        assert sender.depth() == 1
+    with pytest.raises(ValueError):
+        sender.submit(message(2))
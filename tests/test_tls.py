@@ -0,0 +1,183 @@
+import asyncio
+import multiprocessing
+import os
+import pickle
+import shutil
+import socket
+import ssl
+import subprocess
+import time
+from pathlib import Path
+
+import pytest
+
+from fastmllp.cli import main
+from fastmllp.client import MLLPClient
+from fastmllp.metrics import ClientMetrics
+from fastmllp.server import serve, serve_async
+from fastmllp.tls import ServerTLS, SessionCache, client_context
+
+MESSAGE = "MSH|^~\\&|S|F|R|RF|20240101120000||ADT^A01|{}|P|2.5\rPID|1"
+
+pytestmark = pytest.mark.skipif(shutil.which("openssl") is None, reason="needs openssl")
+
+
+def openssl(*args: str) -> None:
+    subprocess.run(["openssl", *args], check=True, capture_output=True)
+
+
+def issue(directory: Path, name: str, common_name: str) -> None:
+    """Write `name`.pem and `name`.key, signed by the CA in `directory`."""
+    key, csr, cert = (str(directory / f"{name}.{ext}") for ext in ("key", "csr", "pem"))
+    openssl("ecparam", "-name", "prime256v1", "-genkey", "-noout", "-out", key)
+    openssl("req", "-new", "-key", key, "-out", csr, "-subj", f"/CN={common_name}")
+    extensions = directory / f"{name}.ext"
+    extensions.write_text("subjectAltName=DNS:localhost,IP:127.0.0.1\n")
+    signing = ["-CA", str(directory / "ca.pem"), "-CAkey", str(directory / "ca.key")]
+    signing += ["-CAcreateserial", "-days", "3650", "-extfile", str(extensions)]
+    openssl("x509", "-req", "-in", csr, *signing, "-out", cert)
+
+
+@pytest.fixture(scope="module")
+def certs(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    directory = tmp_path_factory.mktemp("certs")
+    ca_key = str(directory / "ca.key")
+    openssl("ecparam", "-name", "prime256v1", "-genkey", "-noout", "-out", ca_key)
+    ca_cert = str(directory / "ca.pem")
+    subject = ["-subj", "/CN=fastmllp test CA"]
+    openssl("req", "-x509", "-new", "-key", ca_key, "-days", "3650", *subject, "-out", ca_cert)
+    issue(directory, "server", "localhost")
+    issue(directory, "renewed", "localhost")
+    issue(directory, "client", "lab-feed")
+    return directory
+
+
+def run_tls_server(port: int, engine: str, handler_mode: str, certs: str, mutual: bool) -> None:
+    tls = ServerTLS(
+        os.path.join(certs, "server.pem"),
+        os.path.join(certs, "server.key"),
+        cafile=os.path.join(certs, "ca.pem") if mutual else None,
+        require_client_cert=mutual,
+    )
+    options = {"timeout": 2.0, "tls": tls}
+    if handler_mode != "inline":
+        options.update(handler=accept_message, handler_mode=handler_mode)
+    if engine == "asyncio":
+        asyncio.run(serve_async("127.0.0.1", port, **options))
+    else:
+        serve("127.0.0.1", port, **options)
+
+
+def accept_message(payload: bytes) -> None:
+    return None
+
+
+def start_server(
+    certs: Path, engine: str = "threaded", handler_mode: str = "inline", mutual: bool = False
+) -> tuple[multiprocessing.Process, int]:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    process = multiprocessing.Process(
+        target=run_tls_server,
+        args=(port, engine, handler_mode, str(certs), mutual),
+        daemon=True,
+    )
+    process.start()
+    deadline = time.time() + 5
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            break
+        except OSError:
+            time.sleep(0.05)
+    return process, port
+
+
+@pytest.mark.parametrize(
+    "engine,handler_mode", [("threaded", "inline"), ("threaded", "thread"), ("asyncio", "inline")]
+)
+def test_tls_round_trip_resumes_sessions(certs: Path, engine: str, handler_mode: str) -> None:
+    process, port = start_server(certs, engine, handler_mode)
+    try:
+        metrics = ClientMetrics()
+        context = client_context(cafile=str(certs / "ca.pem"))
+        # With no idle time every send opens a new connection, like a per-message sender.
+        client = MLLPClient(
+            timeout=2.0,
+            idle_timeout=0.0,
+            metrics=metrics,
+            ssl_context=context,
+            sessions=SessionCache(),
+        )
+        with client:
+            for index in range(3):
+                assert f"MSA|AA|{index}" in client.send(MESSAGE.format(index), "127.0.0.1", port)
+            messages = (MESSAGE.format(index) for index in range(100))
+            acks = list(client.send_many(messages, "127.0.0.1", port, window=16))
+        assert [ack.split("MSA|AA|")[1].split("\r")[0] for ack in acks] == [
+            str(index) for index in range(100)
+        ]
+        assert metrics.tls_handshakes.value() == 4
+        assert metrics.tls_resumed.value() == 3
+    finally:
+        process.terminate()
+        process.join(timeout=2)
+
+
+def test_mutual_tls_requires_client_certificate(certs: Path) -> None:
+    process, port = start_server(certs, mutual=True)
+    try:
+        anonymous = client_context(cafile=str(certs / "ca.pem"))
+        with MLLPClient(timeout=2.0, ssl_context=anonymous) as client:
+            with pytest.raises(ConnectionError):
+                client.send(MESSAGE.format(1), "127.0.0.1", port)
+
+        context = client_context(
+            cafile=str(certs / "ca.pem"),
+            certfile=str(certs / "client.pem"),
+            keyfile=str(certs / "client.key"),
+        )
+        with MLLPClient(timeout=2.0, ssl_context=context) as client:
+            assert "MSA|AA|2" in client.send(MESSAGE.format(2), "127.0.0.1", port)
+    finally:
+        process.terminate()
+        process.join(timeout=2)
+
+
+def test_server_tls_reloads_changed_certificate(certs: Path, tmp_path: Path) -> None:
+    certfile, keyfile = tmp_path / "cert.pem", tmp_path / "cert.key"
+    shutil.copy(certs / "server.pem", certfile)
+    shutil.copy(certs / "server.key", keyfile)
+    tls = ServerTLS(str(certfile), str(keyfile))
+    assert not tls.reload_if_changed()
+    context = tls.context
+
+    # A certificate without its new key fails to load and keeps the old pair.
+    shutil.copy(certs / "renewed.pem", certfile)
+    with pytest.raises(ssl.SSLError):
+        tls.reload_if_changed()
+    shutil.copy(certs / "renewed.key", keyfile)
+    assert tls.reload_if_changed()
+    assert tls.context is context
+    assert not tls.reload_if_changed()
+
+    copy = pickle.loads(pickle.dumps(tls))
+    assert isinstance(copy.context, ssl.SSLContext)
+    assert copy.certfile == str(certfile)
+
+
+def test_server_tls_rejects_client_auth_without_ca(certs: Path) -> None:
+    with pytest.raises(ValueError):
+        ServerTLS(str(certs / "server.pem"), str(certs / "server.key"), require_client_cert=True)
+
+
+def test_cli_send_over_tls(certs: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    process, port = start_server(certs)
+    try:
+        args = ["send", "--port", str(port), "--tls-ca", str(certs / "ca.pem")]
+        assert main([*args, "--message", MESSAGE.format(7)]) == 0
+        assert "MSA|AA|7" in capsys.readouterr().out
+    finally:
+        process.terminate()
+        process.join(timeout=2)